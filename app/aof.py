@@ -0,0 +1,219 @@
+import mmap
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional
+from app import rdb
+from app.commands.base import Waiter
+from app.parser import ProtocolError, RESPParser
+
+if TYPE_CHECKING:
+    from app.commands.handler import RedisCommandHandler
+
+FSYNC_POLICIES = ("always", "everysec", "no")
+
+
+class AOFError(Exception):
+    """The append only file can't be replayed"""
+
+
+def encode_command(argv: List[bytes]) -> bytes:
+    """A command as the RESP array of bulk strings clients send"""
+    parts = [b"*%d\r\n" % len(argv)]
+    for arg in argv:
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class AppendOnlyFile:
+    """The append only file: the RDB preamble written by the last rewrite, followed by
+    every write command executed since, in RESP.
+
+    Executed commands are only appended to an in-memory buffer (`feed`), under a lock
+    that is never held for disk I/O. `flush`, called once per event loop iteration,
+    hands the buffer to a writer thread which writes it and fsyncs according to the
+    policy: after every write (always), at most once a second (everysec), or never,
+    leaving it to the kernel (no). Whatever was buffered when a write starts is
+    covered by one fsync, however many clients it came from (group commit).
+    """
+
+    def __init__(self, path: str, fsync: str = "everysec"):
+        self.path = path
+        self.fsync = fsync
+        self.cond = threading.Condition()
+        self.buffer = bytearray()
+        # bytes fed since startup, and how many of them are known to be on disk
+        self.fed = 0
+        self.synced = 0
+        # commands fed while a rewrite child runs, appended to its output once it's done
+        self.rewrite_buffer: Optional[bytearray] = None
+        # held by the writer thread around its writes, so a finished rewrite can swap files
+        self.file_lock = threading.Lock()
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # written but not fsynced yet
+        self.dirty = False
+        self.last_fsync = time.monotonic()
+        self.thread = threading.Thread(target=self.run, name="aof-writer", daemon=True)
+        self.thread.start()
+
+    def feed(self, data: bytes):
+        """Append encoded commands, see encode_command"""
+        with self.cond:
+            self.buffer += data
+            self.fed += len(data)
+            if self.rewrite_buffer is not None:
+                self.rewrite_buffer += data
+
+    def flush(self):
+        """Hand what was fed so far to the writer thread. With appendfsync always also
+        wait until it is on disk, replies are only sent after this returns"""
+        with self.cond:
+            if self.buffer:
+                self.cond.notify_all()
+            if self.fsync == "always":
+                target = self.fed
+                while self.synced < target:
+                    self.cond.wait()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.buffer:
+                    timeout = None
+                    if self.dirty and self.fsync == "everysec":
+                        timeout = self.last_fsync + 1 - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self.cond.wait(timeout)
+            self.write_buffer()
+
+    def write_buffer(self):
+        """Write out the buffer and fsync when the policy asks for it (writer thread)"""
+        with self.file_lock:
+            with self.cond:
+                data, self.buffer = self.buffer, bytearray()
+                fed = self.fed
+            written = 0
+            try:
+                with memoryview(data) as view:
+                    while written < len(data):
+                        written += os.write(self.fd, view[written:])
+            except OSError as e:
+                print(f"Error writing to the AOF: {e}")
+                with self.cond:
+                    # retried with whatever is fed next
+                    self.buffer[:0] = data[written:]
+                time.sleep(1)
+                return
+            if data:
+                self.dirty = True
+
+            now = time.monotonic()
+            if not self.dirty or self.fsync == "no" or (self.fsync == "everysec" and now - self.last_fsync < 1):
+                return
+            os.fsync(self.fd)
+            self.dirty = False
+            self.last_fsync = now
+        with self.cond:
+            self.synced = fed
+            self.cond.notify_all()
+
+    def start_rewrite(self):
+        """Start collecting the commands the rewrite child's snapshot won't have"""
+        with self.cond:
+            self.rewrite_buffer = bytearray()
+
+    def abort_rewrite(self):
+        with self.cond:
+            self.rewrite_buffer = None
+
+    def finish_rewrite(self, temp: str):
+        """Append the commands fed while the child ran to its output and make it the AOF"""
+        # most of them are copied while clients keep feeding new ones
+        with self.cond:
+            diff, self.rewrite_buffer = self.rewrite_buffer, bytearray()
+        with open(temp, "ab") as file:
+            file.write(diff)
+            with self.file_lock:
+                with self.cond:
+                    diff, self.rewrite_buffer = self.rewrite_buffer, None
+                    # anything still buffered is in the child's snapshot or in the diff
+                    self.buffer.clear()
+                    fed = self.fed
+                file.write(diff)
+                file.flush()
+                os.fsync(file.fileno())
+                os.replace(temp, self.path)
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+                os.close(self.fd)
+                self.fd = fd
+                self.dirty = False
+                self.last_fsync = time.monotonic()
+        with self.cond:
+            self.synced = max(self.synced, fed)
+            self.cond.notify_all()
+
+
+def load(path: str, handler: "RedisCommandHandler") -> Optional[int]:
+    """Replay an AOF through the command handler, returns how many commands were
+    replayed, None when there is no file.
+
+    A command cut short at the end of the file (the server died mid-write) is dropped
+    and the file truncated before it, like redis' aof-load-truncated, and so is a
+    transaction whose EXEC is missing.
+    """
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return 0
+        db = handler.db
+        replayed, pos = 0, 0
+        # commands of a MULTI block, executed once its EXEC is read
+        transaction: Optional[List[List[bytes]]] = None
+        multi_pos = 0
+        db.loading = True
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:5] == b"REDIS":
+                    reader = rdb.RDBReader(data)
+                    reader.load(db)
+                    pos = reader.pos
+                while pos < size:
+                    try:
+                        parsed = RESPParser.parse_command(data, pos)
+                    except ProtocolError as e:
+                        raise AOFError(f"bad file format at offset {pos}: {e}")
+                    if parsed is None:
+                        break
+                    tokens, end = parsed
+                    name = tokens[0].upper() if tokens else b""
+                    if name == b"MULTI":
+                        transaction, multi_pos = [], pos
+                    elif transaction is not None:
+                        if name == b"EXEC":
+                            handler.execute_batch(transaction)
+                            replayed += len(transaction)
+                            transaction = None
+                        else:
+                            transaction.append(tokens)
+                    else:
+                        response = handler.handle_command(tokens)
+                        if isinstance(response, Waiter):
+                            # logged blocking commands were served when they ran
+                            response.expire()
+                        replayed += 1
+                    pos = end
+        finally:
+            db.loading = False
+
+        if transaction is not None:
+            pos = multi_pos
+
+    if pos < size:
+        print(f"AOF ends with an incomplete command or transaction, truncating it at offset {pos}")
+        os.truncate(path, pos)
+    return replayed
@@ -1,15 +1,314 @@
 from abc import ABC, abstractmethod
-from typing import List
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+from app.keyspace import Keyspace, now_ms
+from app.objects import INT64_MAX, INT64_MIN
+from threading import Event, Lock
+import time
+
+# commands logged (AOF) on behalf of the one being executed, see RedisCommandHandler.call
+propagation: ContextVar[Optional[List[List[bytes]]]] = ContextVar("propagation", default=None)
+
+
+def propagate(*argv: bytes):
+    """Log a command as executed by the running one. Used where replaying a command as
+    received would not reproduce its effect: relative TTLs, generated IDs, random picks,
+    and blocked clients served by another client's write"""
+    commands = propagation.get()
+    if commands is not None:
+        commands.append(list(argv))
+
+
+class Waiter:
+    """Parked continuation of a blocking command (BLPOP, XREAD BLOCK ...)
+
+    A blocking command that cannot be served right away returns a Waiter instead of
+    bytes. Write commands later call `wake(...)` on it; the connection owning the
+    waiter then builds the reply with `on_wake`. On timeout `on_timeout` removes the
+    waiter from whatever structure it was registered in and returns the reply.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float],
+        on_wake: Callable[..., bytes],
+        on_timeout: Callable[[], bytes],
+    ):
+        self.deadline = None if not timeout else time.monotonic() + timeout
+        self.on_wake = on_wake
+        self.on_timeout = on_timeout
+        self.done = False
+        self.args: tuple = ()
+        # event loop: callback invoked with the waiter once it has been woken
+        self.resume: Optional[Callable[["Waiter"], None]] = None
+        # threaded mode: the client thread parks on this event
+        self.event = Event()
+
+    def wake(self, *args: Any) -> bool:
+        """Hand the waiter its result. Returns False if it already completed"""
+        if self.done:
+            return False
+        self.done = True
+        self.args = args
+        if self.resume:
+            self.resume(self)
+        else:
+            self.event.set()
+        return True
+
+    def expire(self) -> Optional[bytes]:
+        """Time the waiter out, returns the timeout reply or None if it was already woken"""
+        if self.done:
+            return None
+        self.done = True
+        return self.on_timeout()
+
+    def reply(self) -> bytes:
+        """Build the reply of a woken waiter"""
+        return self.on_wake(*self.args)
+
+    def wait(self, reply: Optional[Callable[["Waiter"], bytes]] = None, lock: Optional[Lock] = None) -> bytes:
+        """Block the calling thread until woken or timed out (threaded mode), the
+        reply of a woken waiter is built by `reply` when given.
+
+        `lock` is the one commands run under: the waiter is woken while the waking
+        command holds it, timing out and building the reply take it as well.
+        """
+        timeout = None if self.deadline is None else max(0, self.deadline - time.monotonic())
+        self.event.wait(timeout)
+        with lock if lock is not None else nullcontext():
+            expired = self.expire()
+            if expired is not None:
+                return expired
+            return reply(self) if reply is not None else self.reply()
+
+
+class BlockedClient:
+    """A waiter blocked on one or more keys.
+
+    `serve(key)` is called by the registry while the pushing command runs, it takes
+    what the client asked for out of the key and returns it, None when the key has
+    nothing left, or raises TypeError when the key holds something this client can't
+    take. Popping and handing off happen in the same step, so a value is never visible
+    to another client in between.
+    """
+
+    __slots__ = ("waiter", "keys", "serve")
+
+    def __init__(self, waiter: Waiter, keys: List[bytes], serve: Callable[[bytes], Any]):
+        self.waiter = waiter
+        self.keys = keys
+        self.serve = serve
+
+
+class BlockingRegistry:
+    """Clients blocked on keys (BLPOP, BRPOP, BLMOVE, BLMPOP ...), FIFO per key.
+
+    Push paths call `signal(key)` after adding data. Served keys can make other
+    keys ready (BLMOVE pushes into its destination), those are queued and served
+    in turn instead of recursing.
+    """
+
+    def __init__(self):
+        self.blocked: Dict[bytes, Deque[BlockedClient]] = {}
+        self.ready: Deque[bytes] = deque()
+        self.serving = False
+
+    def block(self, waiter: Waiter, keys: List[bytes], serve: Callable[[bytes], Any]) -> BlockedClient:
+        client = BlockedClient(waiter, keys, serve)
+        for key in dict.fromkeys(keys):
+            self.blocked.setdefault(key, deque()).append(client)
+        return client
+
+    def unblock(self, client: BlockedClient, skip: Optional[bytes] = None):
+        """Remove a client from the queues of its keys"""
+        for key in dict.fromkeys(client.keys):
+            queue = self.blocked.get(key)
+            if key == skip or not queue:
+                continue
+            try:
+                queue.remove(client)
+            except ValueError:
+                pass
+            if not queue:
+                del self.blocked[key]
+
+    def signal(self, key: bytes):
+        """Serve the clients blocked on `key`, oldest first"""
+        if key not in self.blocked:
+            return
+        self.ready.append(key)
+        if self.serving:
+            return
+        self.serving = True
+        try:
+            while self.ready:
+                self.serve_key(self.ready.popleft())
+        finally:
+            self.serving = False
+
+    def serve_key(self, key: bytes):
+        """Serve the clients blocked on `key` in order until `serve` returns None (the
+        key ran out of data). A client whose `serve` raises TypeError can't take what
+        the key holds (a BLMOVE into a key of another type, a BLPOP on a key turned
+        into a sorted set): it stays blocked and the clients after it are served."""
+        queue = self.blocked.get(key)
+        if not queue:
+            return
+        skipped = []
+        while queue:
+            client = queue[0]
+            if not client.waiter.done:
+                try:
+                    result = client.serve(key)
+                except TypeError:
+                    skipped.append(queue.popleft())
+                    continue
+                if result is None:
+                    break
+                client.waiter.wake(result)
+            queue.popleft()
+            self.unblock(client, skip=key)
+        queue.extendleft(reversed(skipped))
+        if not queue:
+            self.blocked.pop(key, None)
+
+
+# SET and GETEX expire options: (milliseconds per unit, absolute unix time)
+EXPIRE_OPTIONS = {
+    b"EX": (1000, False),
+    b"PX": (1, False),
+    b"EXAT": (1000, True),
+    b"PXAT": (1, True),
+}
+
+
+def parse_deadline(value: bytes, unit_ms: int, absolute: bool, name: str, positive: bool = False) -> float:
+    """Deadline in unix milliseconds of an expire time argument, relative to now unless
+    `absolute`. Like redis the deadline must fit an int64, the snapshot and AOF formats
+    can't store anything larger.
+
+    Raises:
+        ValueError: not an integer, or not a valid expire time (not > 0 when `positive`)
+    """
+    try:
+        amount = int(value)
+    except ValueError:
+        raise ValueError("ERR value is not an integer or out of range")
+    if not INT64_MIN <= amount <= INT64_MAX:
+        raise ValueError("ERR value is not an integer or out of range")
+    deadline = amount * unit_ms + (0 if absolute else now_ms())
+    if (positive and amount <= 0) or not INT64_MIN <= deadline <= INT64_MAX:
+        raise ValueError(f"ERR invalid expire time in '{name}' command")
+    return deadline
+
+
+def parse_scan_args(args: List[bytes], flags: Tuple[bytes, ...] = ()) -> Tuple[int, Optional[bytes], int, set]:
+    """Parse `cursor [MATCH pattern] [COUNT count] [flag ...]` of the SCAN family.
+
+    Returns:
+        (cursor, pattern, count, flags given)
+    """
+    try:
+        cursor = int(args[0])
+    except ValueError:
+        raise ValueError("ERR invalid cursor")
+    if cursor < 0:
+        raise ValueError("ERR invalid cursor")
+    pattern, count, given = None, 10, set()
+    i = 1
+    while i < len(args):
+        option = args[i].upper()
+        if option == b"MATCH" and i + 1 < len(args):
+            pattern = args[i + 1]
+            i += 2
+        elif option == b"COUNT" and i + 1 < len(args):
+            try:
+                count = int(args[i + 1])
+            except ValueError:
+                raise ValueError("ERR value is not an integer or out of range")
+            if count < 1:
+                raise ValueError("ERR syntax error")
+            i += 2
+        elif option in flags:
+            given.add(option)
+            i += 1
+        else:
+            raise ValueError("ERR syntax error")
+    return cursor, pattern, count, given
+
+
+def scan_page(entry, cursor: int, count: int, pattern: Optional[bytes] = None,
+              key: Callable[[Any], bytes] = lambda item: item) -> Tuple[int, List]:
+    """One page of a SCAN style iteration over a hash or set. The cursor is the
+    sequence number of the entry to resume from (see OrderedTable), so entries
+    present for the whole iteration are returned however the value changes in
+    between, and 0 once the end is reached.
+
+    Returns:
+        (next cursor, items of the page matching `pattern`)
+    """
+    next_cursor, page = entry.scan(cursor, count)
+    if pattern is not None and pattern != b"*":
+        page = [item for item in page if fnmatchcase(key(item), pattern)]
+    return next_cursor, page
+
 
 class RedisCommand(ABC):
     """Abstract Base class for Redis commands"""
-    
+
+    # write commands are appended to the AOF as received when they succeed, unless
+    # `verbatim` is off, then they log what they did themselves through propagate()
+    write = False
+    verbatim = True
+
     @abstractmethod
-    def execute(self, args: List[str]) -> bytes:
-        """Execute command and return RESP bytes response"""
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        """Execute command and return RESP bytes response, or a Waiter for blocking commands"""
         pass
-    
+
     @abstractmethod
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         """Validate command arguments"""
-        pass
\ No newline at end of file
+        pass
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        """Keys the command reads or writes, used to route it to the worker owning them.
+        Most commands take a single key as their first argument"""
+        return args[:1]
+
+
+class RedisBlockingCommandBase(RedisCommand):
+    """Base class for commands on types clients can block on (lists, sorted sets)"""
+    
+    def __init__(self, db: Keyspace, blocking_clients: BlockingRegistry):
+        self.db = db
+        self.blocking_clients = blocking_clients
+    
+    def parse_timeout(self, timeout: bytes) -> float:
+        """Blocking timeouts are seconds with decimals, 0 blocks forever"""
+        try:
+            seconds = float(timeout)
+        except ValueError:
+            raise ValueError("ERR timeout is not a float or out of range")
+        if seconds != seconds or seconds in (float("inf"), float("-inf")):
+            raise ValueError("ERR timeout is not a float or out of range")
+        if seconds < 0:
+            raise ValueError("ERR timeout is negative")
+        return seconds
+    
+    def block(
+        self, keys: List[bytes], timeout: float, serve: Callable[[bytes], object],
+        on_wake: Callable[..., bytes], timeout_reply: bytes
+    ) -> Waiter:
+        """Park the client on `keys` until a write lets `serve` produce its result"""
+        def on_timeout() -> bytes:
+            self.blocking_clients.unblock(client)
+            return timeout_reply
+        
+        waiter = Waiter(timeout, on_wake=on_wake, on_timeout=on_timeout)
+        client = self.blocking_clients.block(waiter, keys, serve)
+        return waiter
@@ -1,12 +1,13 @@
-from .base import RedisCommand
-from typing import List, Dict
-import time
+from .base import EXPIRE_OPTIONS, RedisCommand, parse_deadline, propagate
+from typing import List
+from app.keyspace import Keyspace, now_ms
+from app.objects import OBJ_STRING, TYPE_NAMES, encode_string, encoding_of, string_bytes, type_of
 from app.parser import RESPSerializer
 
 class EchoCommand(RedisCommand):
     """Implementation of ECHO command"""
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'echo' command"
@@ -14,14 +15,17 @@ class EchoCommand(RedisCommand):
         
         return RESPSerializer.serialize_bulk_string(args[0])
     
-    def validate_args(self, args:List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 1
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return []
 
 
 class PingCommand(RedisCommand):
     """Implementation of PING command"""
     
-    def execute(self, args:List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'ping' command"
@@ -29,61 +33,75 @@ class PingCommand(RedisCommand):
         
         return RESPSerializer.serialize_simple_string("PONG")
     
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 0
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return []
 
 
 class SetCommand(RedisCommand):
-    """Implementation of SET command"""
+    """Implementation of SET command: SET key value [NX | XX] [EX s | PX ms | EXAT ts | PXAT ts-ms | KEEPTTL]"""
     
-    def __init__(self, db: Dict):
+    write = True
+    verbatim = False
+    
+    def __init__(self, db: Keyspace):
         self.db = db
     
-    def execute(self, args:List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'set' command"
             )
         
-        key, value, options = args[0], args[1], args[2:] if len(args) > 2 else ()
-        
-        # px -> expire option in milliseconds
-        if options and options[0].upper() == "PX":
-            try:
-                expiry_time_ms = int(options[1])
-                if expiry_time_ms <= 0:
-                    raise ValueError
-                
-                self.db[key] = {
-                    "value": value,
-                    "type": "string",
-                    "expiry": (
-                        time.time() * 1000 + expiry_time_ms
-                    )
-                }
-            except ValueError:
-                return RESPSerializer.serialize_error(
-                    "ERR value is not an integer or out of range"
-                )
+        key, value, options = args[0], args[1], args[2:]
+        
+        expiry, keep_ttl, condition = None, False, None
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option in EXPIRE_OPTIONS and expiry is None and not keep_ttl and i + 1 < len(options):
+                try:
+                    expiry = parse_deadline(options[i + 1], *EXPIRE_OPTIONS[option], "set", positive=True)
+                except ValueError as e:
+                    return RESPSerializer.serialize_error(str(e))
+                i += 2
+            elif option == b"KEEPTTL" and expiry is None:
+                keep_ttl = True
+                i += 1
+            elif option in (b"NX", b"XX") and condition is None:
+                condition = option
+                i += 1
+            else:
+                return RESPSerializer.serialize_error("ERR syntax error")
+        
+        if condition is not None and (key in self.db) != (condition == b"XX"):
+            return RESPSerializer.serialize_bulk_string(None)
+        
+        if keep_ttl and key in self.db:
+            expiry = self.db.get_expiry(key)
+        
+        self.db[key] = encode_string(value)
+        if expiry is not None:
+            self.db.set_expiry(key, expiry)
+            # relative TTLs are logged as the deadline they resolved to
+            propagate(b"SET", key, value, b"PXAT", b"%d" % expiry)
         else:
-            self.db[key] = {
-                "value": value,
-                "type": "string",
-                "expiry": None
-            }
+            propagate(b"SET", key, value)
         return RESPSerializer.serialize_simple_string("OK")
     
-    def validate_args(self, args:List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) >= 2
 
 
 class GetCommand(RedisCommand):
     """Implementation of GET command"""
     
-    def __init__(self, db: Dict):
+    def __init__(self, db: Keyspace):
         self.db = db
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'get' command"
@@ -95,28 +113,24 @@ class GetCommand(RedisCommand):
         if entry is None:
             return RESPSerializer.serialize_bulk_string(None)
         
-        if entry["type"] != "string":
+        if type_of(entry) != OBJ_STRING:
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        if entry["expiry"] and (time.time()*1000) >= entry["expiry"]:
-            del self.db[key]
-            return RESPSerializer.serialize_bulk_string(None)
-        
-        return RESPSerializer.serialize_bulk_string(entry["value"])
+        return RESPSerializer.serialize_bulk_string(string_bytes(entry))
     
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 1
 
 
 class TypeCommand(RedisCommand):
     """Implementation of TYPE command"""
     
-    def __init__(self, db: Dict):
+    def __init__(self, db: Keyspace):
         self.db = db
     
-    def execute(self, args:List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'type' command"
@@ -125,10 +139,223 @@ class TypeCommand(RedisCommand):
         key = args[0]
         entry = self.db.get(key)
         
-        if entry:
-            return RESPSerializer.serialize_simple_string(entry["type"])
+        if entry is not None:
+            return RESPSerializer.serialize_simple_string(TYPE_NAMES[type_of(entry)])
         else:
             return RESPSerializer.serialize_simple_string("none")
     
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+
+
+class DelCommand(RedisCommand):
+    """Implementation of DEL command: DEL key [key ...]"""
+    
+    write = True
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 1
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'del' command"
+            )
+        
+        deleted = 0
+        for key in args:
+            if key in self.db:
+                del self.db[key]
+                deleted += 1
+        return RESPSerializer.serialize_integer(deleted)
+
+
+class DBSizeCommand(RedisCommand):
+    """Implementation of DBSIZE command, counts keys that expired but weren't reclaimed yet"""
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 0
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return []
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'dbsize' command"
+            )
+        return RESPSerializer.serialize_integer(len(self.db))
+
+
+class ExpireCommand(RedisCommand):
+    """Implementation of EXPIRE command: EXPIRE key seconds [NX | XX | GT | LT]"""
+    
+    name = "expire"
+    unit_ms = 1000
+    absolute = False
+    write = True
+    verbatim = False
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) in (2, 3)
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key = args[0]
+        try:
+            deadline = parse_deadline(args[1], self.unit_ms, self.absolute, self.name)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        option = args[2].upper() if len(args) == 3 else None
+        if option not in (None, b"NX", b"XX", b"GT", b"LT"):
+            return RESPSerializer.serialize_error(f"ERR Unsupported option {option.decode(errors='replace')}")
+        
+        if key not in self.db:
+            return RESPSerializer.serialize_integer(0)
+        
+        now = now_ms()
+        current = self.db.get_expiry(key)
+        
+        # a key without TTL counts as an infinite TTL for GT/LT
+        if (
+            (option == b"NX" and current is not None)
+            or (option == b"XX" and current is None)
+            or (option == b"GT" and (current is None or deadline <= current))
+            or (option == b"LT" and current is not None and deadline >= current)
+        ):
+            return RESPSerializer.serialize_integer(0)
+        
+        if deadline <= now:
+            del self.db[key]
+        else:
+            self.db.set_expiry(key, deadline)
+        propagate(b"PEXPIREAT", key, b"%d" % deadline)
+        return RESPSerializer.serialize_integer(1)
+
+
+class PExpireCommand(ExpireCommand):
+    """Implementation of PEXPIRE command: PEXPIRE key milliseconds [NX | XX | GT | LT]"""
+    
+    name = "pexpire"
+    unit_ms = 1
+
+
+class ExpireAtCommand(ExpireCommand):
+    """Implementation of EXPIREAT command: EXPIREAT key unix-time-seconds [NX | XX | GT | LT]"""
+    
+    name = "expireat"
+    absolute = True
+
+
+class PExpireAtCommand(ExpireCommand):
+    """Implementation of PEXPIREAT command: PEXPIREAT key unix-time-milliseconds [NX | XX | GT | LT]"""
+    
+    name = "pexpireat"
+    unit_ms = 1
+    absolute = True
+
+
+class TTLCommand(RedisCommand):
+    """Implementation of TTL command"""
+    
+    name = "ttl"
+    unit_ms = 1000
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key = args[0]
+        if key not in self.db:
+            return RESPSerializer.serialize_integer(-2)
+        
+        deadline = self.db.get_expiry(key)
+        if deadline is None:
+            return RESPSerializer.serialize_integer(-1)
+        
+        remaining_ms = max(deadline - now_ms(), 0)
+        # redis rounds the remaining seconds to the nearest integer
+        return RESPSerializer.serialize_integer(int((remaining_ms + self.unit_ms // 2) // self.unit_ms))
+
+
+class PTTLCommand(TTLCommand):
+    """Implementation of PTTL command"""
+    
+    name = "pttl"
+    unit_ms = 1
+
+
+class PersistCommand(RedisCommand):
+    """Implementation of PERSIST command"""
+    
+    write = True
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'persist' command"
+            )
+        
+        key = args[0]
+        if key not in self.db:
+            return RESPSerializer.serialize_integer(0)
+        return RESPSerializer.serialize_integer(int(self.db.persist(key)))
+
+
+class ObjectCommand(RedisCommand):
+    """Implementation of OBJECT ENCODING command"""
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[1:2]
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'object' command"
+            )
+        
+        if args[0].upper() != b"ENCODING":
+            return RESPSerializer.serialize_error(
+                f"ERR unknown subcommand '{args[0].decode(errors='replace')}'. Try OBJECT HELP."
+            )
+        
+        entry = self.db.get(args[1])
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None)
+        return RESPSerializer.serialize_bulk_string(encoding_of(entry))
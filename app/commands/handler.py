@@ -1,16 +1,38 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from app.parser import RESPSerializer
+from app.commands.base import BlockingRegistry, RedisCommand, Waiter, propagation
+from app.aof import encode_command
+from app.persistence import Persistence
+from app.replication import Replication
 from app.commands.general import *
+from app.commands.string import *
 from app.commands.list import *
+from app.commands.hash import *
+from app.commands.set import *
+from app.commands.sorted_set import *
 from app.commands.stream import *
+from app.commands.persistence import *
+from app.commands.replication import *
 
 
 class RedisCommandHandler:
     """Routes to corresponding command class based on command received"""
     
-    def __init__(self, db: Optional[Dict], waiting_clients: Dict):
+    def __init__(
+        self,
+        db: Optional[Dict],
+        waiting_clients: Dict,
+        blocking_clients: BlockingRegistry,
+        persistence: Persistence,
+        replication: Replication,
+    ):
         self.db = db if not None else {}
         self.waiting_clients = waiting_clients
+        self.blocking_clients = blocking_clients
+        self.persistence = persistence
+        self.replication = replication
+        # writes propagated while EXEC runs, logged as one MULTI/EXEC block once it's done
+        self.batch: Optional[List[List[bytes]]] = None
         self.commands = {
             # general commands
             "ECHO": EchoCommand(),
@@ -18,29 +40,209 @@ class RedisCommandHandler:
             "SET": SetCommand(db=self.db),
             "GET": GetCommand(db=self.db),
             "TYPE": TypeCommand(db=self.db),
+            "DEL": DelCommand(db=self.db),
+            "DBSIZE": DBSizeCommand(db=self.db),
+            "EXPIRE": ExpireCommand(db=self.db),
+            "PEXPIRE": PExpireCommand(db=self.db),
+            "EXPIREAT": ExpireAtCommand(db=self.db),
+            "PEXPIREAT": PExpireAtCommand(db=self.db),
+            "TTL": TTLCommand(db=self.db),
+            "PTTL": PTTLCommand(db=self.db),
+            "PERSIST": PersistCommand(db=self.db),
+            "OBJECT": ObjectCommand(db=self.db),
+            # string commands
+            "INCR": IncrCommand(db=self.db),
+            "DECR": DecrCommand(db=self.db),
+            "INCRBY": IncrByCommand(db=self.db),
+            "DECRBY": DecrByCommand(db=self.db),
+            "INCRBYFLOAT": IncrByFloatCommand(db=self.db),
+            "APPEND": AppendCommand(db=self.db),
+            "GETRANGE": GetRangeCommand(db=self.db),
+            "SETRANGE": SetRangeCommand(db=self.db),
+            "STRLEN": StrLenCommand(db=self.db),
+            "GETDEL": GetDelCommand(db=self.db),
+            "GETEX": GetExCommand(db=self.db),
+            "SETNX": SetNxCommand(db=self.db),
+            "MGET": MGetCommand(db=self.db),
+            "MSET": MSetCommand(db=self.db),
+            "MSETNX": MSetNxCommand(db=self.db),
             # list commands
-            "RPUSH": RPushCommand(db=self.db),
-            "LPUSH": LPushCommand(db=self.db),
-            "LRANGE": LRangeCommand(db=self.db),
-            "LLEN": LLenCommand(db=self.db),
-            "LPOP": LPopCommand(db=self.db),
-            "BLPOP": BLPopCommand(db=self.db),
+            "RPUSH": RPushCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LPUSH": LPushCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "RPUSHX": RPushXCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LPUSHX": LPushXCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LRANGE": LRangeCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LINDEX": LIndexCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LSET": LSetCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LINSERT": LInsertCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LTRIM": LTrimCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LLEN": LLenCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LPOP": LPopCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "RPOP": RPopCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LMPOP": LMPopCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LMOVE": LMoveCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LREM": LRemCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "LPOS": LPosCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "BLPOP": BLPopCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "BRPOP": BRPopCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "BLMOVE": BLMoveCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "BLMPOP": BLMPopCommand(db=self.db, blocking_clients=self.blocking_clients),
+            # hash commands
+            "HSET": HSetCommand(db=self.db),
+            "HGET": HGetCommand(db=self.db),
+            "HMGET": HMGetCommand(db=self.db),
+            "HINCRBY": HIncrByCommand(db=self.db),
+            "HDEL": HDelCommand(db=self.db),
+            "HGETALL": HGetAllCommand(db=self.db),
+            "HSCAN": HScanCommand(db=self.db),
+            # set commands
+            "SADD": SAddCommand(db=self.db),
+            "SREM": SRemCommand(db=self.db),
+            "SISMEMBER": SIsMemberCommand(db=self.db),
+            "SMISMEMBER": SMIsMemberCommand(db=self.db),
+            "SCARD": SCardCommand(db=self.db),
+            "SMEMBERS": SMembersCommand(db=self.db),
+            "SINTER": SInterCommand(db=self.db),
+            "SINTERSTORE": SInterStoreCommand(db=self.db),
+            "SUNION": SUnionCommand(db=self.db),
+            "SUNIONSTORE": SUnionStoreCommand(db=self.db),
+            "SDIFF": SDiffCommand(db=self.db),
+            "SDIFFSTORE": SDiffStoreCommand(db=self.db),
+            "SRANDMEMBER": SRandMemberCommand(db=self.db),
+            "SPOP": SPopCommand(db=self.db),
+            "SSCAN": SScanCommand(db=self.db),
+            # sorted set commands
+            "ZADD": ZAddCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZINCRBY": ZIncrByCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZRANGE": ZRangeCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZRANGEBYSCORE": ZRangeByScoreCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZRANK": ZRankCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZREVRANK": ZRevRankCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZSCORE": ZScoreCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZCARD": ZCardCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZREM": ZRemCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZPOPMIN": ZPopMinCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "ZPOPMAX": ZPopMaxCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "BZPOPMIN": BZPopMinCommand(db=self.db, blocking_clients=self.blocking_clients),
+            "BZPOPMAX": BZPopMaxCommand(db=self.db, blocking_clients=self.blocking_clients),
             # stream commands
             "XADD": XAddCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XTRIM": XTrimCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XDEL": XDelCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XLEN": XLenCommand(db=self.db, waiting_clients=self.waiting_clients),
             "XRANGE": XRangeCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XREVRANGE": XRevRangeCommand(db=self.db, waiting_clients=self.waiting_clients),
             "XREAD": XreadStreamsCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XGROUP": XGroupCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XREADGROUP": XReadGroupCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XACK": XAckCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XPENDING": XPendingCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XCLAIM": XClaimCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XAUTOCLAIM": XAutoClaimCommand(db=self.db, waiting_clients=self.waiting_clients),
+            "XINFO": XInfoCommand(db=self.db, waiting_clients=self.waiting_clients),
+            # persistence commands
+            "SAVE": SaveCommand(persistence=self.persistence),
+            "BGSAVE": BGSaveCommand(persistence=self.persistence),
+            "LASTSAVE": LastSaveCommand(persistence=self.persistence),
+            "BGREWRITEAOF": BGRewriteAOFCommand(persistence=self.persistence),
+            # replication commands
+            "WAIT": WaitCommand(replication=self.replication),
+            "ROLE": RoleCommand(replication=self.replication),
         }
     
-    def handle_command(self, tokens: List[str]) -> bytes:
+    def get_keys(self, tokens: List[bytes]) -> List[bytes]:
+        """Keys touched by a command, [] for keyless or unknown commands"""
+        command = self.commands.get(tokens[0].decode(errors="replace").upper()) if tokens else None
+        return command.get_keys(tokens[1:]) if command else []
+    
+    def handle_command(self, tokens: List[bytes]) -> Union[bytes, Waiter]:
         """Identifies mapping from `commands` dict and executes the command"""
         
         if not tokens:
             return RESPSerializer.serialize_error("ERR empty command")
         
-        cmd = tokens[0].upper()
+        # only the command name is decoded, arguments stay raw bytes
+        cmd = tokens[0].decode(errors="replace").upper()
         args = tokens[1:] if len(tokens) > 1 else []
         
         if cmd not in self.commands:
             return RESPSerializer.serialize_error(f"ERR unknown command - {cmd}")
         
-        return self.commands[cmd].execute(args)
\ No newline at end of file
+        command = self.commands[cmd]
+        # a replica only takes writes from its master's stream, applied with the keyspace loading
+        if command.write and self.replication.master is not None and not self.db.loading:
+            return RESPSerializer.serialize_error("READONLY You can't write against a read only replica.")
+        
+        if self.persistence.aof is None and not self.replication.feeding and not self.db.watched.versions:
+            return command.execute(args)
+        return self.call(command, tokens, args)
+    
+    def call(self, command: RedisCommand, tokens: List[bytes], args: List[bytes]) -> Union[bytes, Waiter]:
+        """Execute a command and log its writes: the command as received when a verbatim
+        write command succeeds, followed by whatever it propagate()d"""
+        commands: List[List[bytes]] = []
+        token = propagation.set(commands)
+        try:
+            response = command.execute(args)
+        finally:
+            propagation.reset(token)
+        if command.write and command.verbatim and isinstance(response, bytes) and response[:1] != b"-":
+            commands.insert(0, tokens)
+        if commands:
+            self.propagate(commands)
+        return response
+    
+    def reply(self, waiter: Waiter) -> bytes:
+        """Build the reply of a woken waiter, logging the writes it makes (XREADGROUP reads
+        only once woken)"""
+        if self.persistence.aof is None and not self.replication.feeding and not self.db.watched.versions:
+            return waiter.reply()
+        commands: List[List[bytes]] = []
+        token = propagation.set(commands)
+        try:
+            response = waiter.reply()
+        finally:
+            propagation.reset(token)
+        if commands:
+            self.propagate(commands)
+        return response
+    
+    def execute_batch(self, queued: List[List[bytes]]) -> bytes:
+        """Execute commands back to back (EXEC), replies with the array of their replies.
+        Blocking commands time out right away instead of blocking"""
+        self.batch = []
+        replies = []
+        try:
+            for tokens in queued:
+                response = self.handle_command(tokens)
+                if isinstance(response, Waiter):
+                    response = response.expire()
+                replies.append(response)
+        finally:
+            batch, self.batch = self.batch, None
+        if batch:
+            self.log([[b"MULTI"], *batch, [b"EXEC"]])
+        return b"*%d\r\n%s" % (len(replies), b"".join(replies))
+    
+    def propagate(self, commands: List[List[bytes]]):
+        """Record executed write commands: bump the versions of the WATCHed keys they
+        touch, and append them to the AOF and the replication stream"""
+        watched = self.db.watched
+        if watched.versions:
+            for argv in commands:
+                for key in self.get_keys(argv):
+                    watched.touch(key)
+        if self.batch is not None:
+            self.batch.extend(commands)
+        else:
+            self.log(commands)
+    
+    def log(self, commands: List[List[bytes]]):
+        """Append commands to the AOF and the replication stream"""
+        aof = self.persistence.aof
+        if aof is None and not self.replication.feeding:
+            return
+        data = b"".join(encode_command(argv) for argv in commands)
+        if aof is not None:
+            aof.feed(data)
+        self.replication.feed(data)
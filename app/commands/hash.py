@@ -0,0 +1,246 @@
+from .base import RedisCommand, parse_scan_args, scan_page
+from typing import List
+from app.keyspace import Keyspace
+from app.parser import RESPSerializer
+from app.objects import INT64_MAX, INT64_MIN, OBJ_HASH, HashObject, type_of
+
+class RedisHashCommandBase(RedisCommand):
+    """Base class with common functionality for hash commands"""
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def ensure_hash_type(self, entry) -> bool:
+        """Ensure whether accessed key is hash type"""
+        return type_of(entry) == OBJ_HASH
+    
+    def cleanup_empty_key(self, key: bytes, entry: HashObject):
+        """Cleanup key with empty value"""
+        if not len(entry):
+            del self.db[key]
+
+
+class HSetCommand(RedisHashCommandBase):
+    """Implementation of HSET command: HSET key field value [field value ...]"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3 and len(args) % 2 == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hset' command"
+            )
+        
+        key, pairs = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if entry is None:
+            entry = self.db[key] = HashObject()
+        
+        added = 0
+        for i in range(0, len(pairs), 2):
+            added += entry.set(pairs[i], pairs[i + 1])
+        return RESPSerializer.serialize_integer(added)
+
+
+class HGetCommand(RedisHashCommandBase):
+    """Implementation of HGET command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hget' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None)
+        
+        if not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_bulk_string(entry.get(args[1]))
+
+
+class HMGetCommand(RedisHashCommandBase):
+    """Implementation of HMGET command: HMGET key field [field ...]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hmget' command"
+            )
+        
+        key, fields = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_array([None] * len(fields))
+        
+        if not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_array([entry.get(field) for field in fields])
+
+
+class HIncrByCommand(RedisHashCommandBase):
+    """Implementation of HINCRBY command: HINCRBY key field increment"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hincrby' command"
+            )
+        
+        key, field = args[0], args[1]
+        
+        try:
+            increment = int(args[2])
+        except ValueError:
+            return RESPSerializer.serialize_error(
+                "ERR value is not an integer or out of range"
+            )
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        current = entry.get(field) if entry is not None else None
+        try:
+            value = int(current) if current is not None else 0
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR hash value is not an integer")
+        
+        value += increment
+        if not INT64_MIN <= value <= INT64_MAX:
+            return RESPSerializer.serialize_error("ERR increment or decrement would overflow")
+        
+        if entry is None:
+            entry = self.db[key] = HashObject()
+        entry.set(field, b"%d" % value)
+        return RESPSerializer.serialize_integer(value)
+
+
+class HDelCommand(RedisHashCommandBase):
+    """Implementation of HDEL command: HDEL key field [field ...]"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hdel' command"
+            )
+        
+        key, fields = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        deleted = sum(entry.delete(field) for field in fields)
+        self.cleanup_empty_key(key, entry)
+        return RESPSerializer.serialize_integer(deleted)
+
+
+class HGetAllCommand(RedisHashCommandBase):
+    """Implementation of HGETALL command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hgetall' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_map({})
+        
+        if not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        # a map in RESP3, a flat field/value array in RESP2
+        return RESPSerializer.serialize_map(dict(entry.items()))
+
+
+class HScanCommand(RedisHashCommandBase):
+    """Implementation of HSCAN command: HSCAN key cursor [MATCH pattern] [COUNT count] [NOVALUES]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'hscan' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            cursor, pattern, count, flags = parse_scan_args(args[1:], flags=(b"NOVALUES",))
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_array([b"0", []])
+        
+        if not self.ensure_hash_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        next_cursor, page = scan_page(entry, cursor, count, pattern, key=lambda item: item[0])
+        
+        elements = []
+        for field, value in page:
+            elements.append(field)
+            if b"NOVALUES" not in flags:
+                elements.append(value)
+        return RESPSerializer.serialize_array([b"%d" % next_cursor, elements])
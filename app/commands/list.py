@@ -1,116 +1,342 @@
-from .base import RedisCommand
-from typing import List, Dict
+from .base import RedisBlockingCommandBase, Waiter, propagate
+from typing import List, Optional, Tuple, Union
 from app.parser import RESPSerializer
-from collections import deque
-from threading import Event
+from app.objects import OBJ_LIST, ListObject, type_of
+from itertools import islice
 
-class RedisListCommandBase(RedisCommand):
+class RedisListCommandBase(RedisBlockingCommandBase):
     """Base class with common functionality for list commands"""
     
-    def __init__(self, db: Dict):
-        self.db = db
-    
-    def ensure_list_type(self, entry: Dict) -> bool:
+    def ensure_list_type(self, entry) -> bool:
         """Ensure whether accessed key is list type"""
-        return entry["type"] == "list"
+        return type_of(entry) == OBJ_LIST
     
-    def cleanup_empty_key(self, key: str, entry: Dict):
+    def cleanup_empty_key(self, key: bytes, entry: ListObject):
         """Cleanup key with empty value"""
-        if not entry["value"]:
+        if not entry:
             del self.db[key]
+    
+    def push(self, key: bytes, values: List[bytes], left: bool) -> bytes:
+        """Shared by RPUSH/LPUSH: append, serve blocked clients, reply with the length left"""
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_list_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if entry is None:
+            entry = self.db[key] = ListObject()
+        
+        if left:
+            entry.extendleft(values)
+        else:
+            entry.extend(values)
+        self.blocking_clients.signal(key)
+        
+        # values handed to blocked clients are not counted
+        return RESPSerializer.serialize_integer(len(entry))
+    
+    def pop_from(self, key: bytes, left: bool, count: int = 1) -> Optional[List[bytes]]:
+        """Pop up to `count` values from a list key and drop it once empty, None if there is no list.
+
+        Raises:
+            TypeError: the key holds another type
+        """
+        entry = self.db.get(key)
+        if entry is None or not entry:
+            return None
+        if not self.ensure_list_type(entry):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        pop = entry.popleft if left else entry.pop
+        values = [pop() for _ in range(min(count, len(entry)))]
+        self.cleanup_empty_key(key, entry)
+        return values
+    
+    def move(self, source: bytes, destination: bytes, from_left: bool, to_left: bool) -> Optional[bytes]:
+        """Pop from `source` and push to `destination`, None if there is nothing to move.
+
+        Raises:
+            TypeError: destination holds another type
+        """
+        entry = self.db.get(source)
+        if entry is None or not entry:
+            return None
+        target = self.db.get(destination)
+        if not self.ensure_list_type(entry) or (target is not None and not self.ensure_list_type(target)):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        
+        value = entry.popleft() if from_left else entry.pop()
+        if target is None:
+            target = self.db[destination] = ListObject()
+        if to_left:
+            target.appendleft(value)
+        else:
+            target.append(value)
+        self.cleanup_empty_key(source, entry)
+        # logged before the destination's blocked clients are served, BLMOVE as LMOVE
+        propagate(b"LMOVE", source, destination, b"LEFT" if from_left else b"RIGHT", b"LEFT" if to_left else b"RIGHT")
+        self.blocking_clients.signal(destination)
+        return value
+    
+    def normalize_range(self, length: int, start: int, stop: int) -> Tuple[int, int]:
+        """Turn inclusive, possibly negative LRANGE style indexes into a [start, stop) slice"""
+        if start < 0:
+            start = max(length + start, 0)
+        if stop < 0:
+            stop += length
+        stop = min(stop, length - 1)
+        if start > stop:
+            return 0, 0
+        return start, stop + 1
+    
+    def parse_direction(self, direction: bytes) -> bool:
+        """True for LEFT, False for RIGHT"""
+        direction = direction.upper()
+        if direction not in (b"LEFT", b"RIGHT"):
+            raise ValueError("ERR syntax error")
+        return direction == b"LEFT"
+    
+    def parse_mpop(self, args: List[bytes]) -> Tuple[List[bytes], bool, int]:
+        """Parse `numkeys key [key ...] LEFT|RIGHT [COUNT count]` of LMPOP/BLMPOP"""
+        try:
+            numkeys = int(args[0])
+        except ValueError:
+            raise ValueError("ERR numkeys should be greater than 0")
+        if numkeys <= 0:
+            raise ValueError("ERR numkeys should be greater than 0")
+        if len(args) < numkeys + 2:
+            raise ValueError("ERR syntax error")
+        keys, left, options = args[1:numkeys + 1], self.parse_direction(args[numkeys + 1]), args[numkeys + 2:]
+        
+        count = 1
+        if options:
+            if len(options) != 2 or options[0].upper() != b"COUNT":
+                raise ValueError("ERR syntax error")
+            try:
+                count = int(options[1])
+            except ValueError:
+                count = 0
+            if count <= 0:
+                raise ValueError("ERR count should be greater than 0")
+        return keys, left, count
 
 
 class RPushCommand(RedisListCommandBase):
     """Implementation of RPUSH Command"""
     
-    def validate_args(self, args: List[str]) -> bool:
+    name = "rpush"
+    left = False
+    write = True
+    # RPUSHX/LPUSHX only push to lists that already exist
+    only_existing = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) >= 2
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
-                "ERR wrong number of arguments for 'rpush' command"
+                f"ERR wrong number of arguments for '{self.name}' command"
             )
         
-        key, values = args[0], args[1:]
+        if self.only_existing and args[0] not in self.db:
+            return RESPSerializer.serialize_integer(0)
+        return self.push(args[0], args[1:], left=self.left)
+
+
+class LPushCommand(RPushCommand):
+    """Implementation of LPUSH command"""
+    
+    name = "lpush"
+    left = True
+
+
+class RPushXCommand(RPushCommand):
+    """Implementation of RPUSHX command"""
+    
+    name = "rpushx"
+    only_existing = True
+
+
+class LPushXCommand(RPushCommand):
+    """Implementation of LPUSHX command"""
+    
+    name = "lpushx"
+    left = True
+    only_existing = True
+
+
+class LRangeCommand(RedisListCommandBase):
+    """Implementation of LRANGE command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'lrange' command"
+            )
+        
+        key = args[0]
+        
+        try: 
+            start, stop = int(args[1]), int(args[2])
+        except ValueError:
+            return RESPSerializer.serialize_error(
+                "ERR value is not an integer or out of range"
+            )
         
         entry = self.db.get(key)
         
-        if not entry:
-            self.db[key] = {
-                "value": deque([]),
-                "type": "list",
-                "blocking_clients": deque([])
-            }
-            entry = self.db[key]
+        if entry is None:
+            return RESPSerializer.serialize_array([])
         
         if not self.ensure_list_type(entry):
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        start = 0
-        for val in values:
-            if not entry["blocking_clients"]:
-                break
-            client = entry["blocking_clients"].popleft()
-            client["value"] = val
-            client["event"].set()
-            start += 1
-        if start < len(values):
-            entry["value"].extend(values[start:])
+        start, stop = self.normalize_range(len(entry), start, stop)
+        return RESPSerializer.serialize_array(list(entry.range(start, stop)))
+
+
+class LIndexCommand(RedisListCommandBase):
+    """Implementation of LINDEX command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'lindex' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            index = int(args[1])
+        except ValueError:
+            return RESPSerializer.serialize_error(
+                "ERR value is not an integer or out of range"
+            )
         
-        return RESPSerializer.serialize_integer(len(entry["value"]))
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None)
+        
+        if not self.ensure_list_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if index < 0:
+            index += len(entry)
+        if not 0 <= index < len(entry):
+            return RESPSerializer.serialize_bulk_string(None)
+        return RESPSerializer.serialize_bulk_string(entry[index])
 
 
-class LPushCommand(RedisListCommandBase):
-    """Implementation of LPUSH command"""
+class LSetCommand(RedisListCommandBase):
+    """Implementation of LSET command"""
     
-    def validate_args(self, args: List[str]) -> bool:
-        return len(args) >= 2
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'lset' command"
+            )
+        
+        key, value = args[0], args[2]
+        
+        try:
+            index = int(args[1])
+        except ValueError:
+            return RESPSerializer.serialize_error(
+                "ERR value is not an integer or out of range"
+            )
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_error("ERR no such key")
+        
+        if not self.ensure_list_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if index < 0:
+            index += len(entry)
+        if not 0 <= index < len(entry):
+            return RESPSerializer.serialize_error("ERR index out of range")
+        entry[index] = value
+        return RESPSerializer.serialize_simple_string("OK")
+
+
+class LInsertCommand(RedisListCommandBase):
+    """Implementation of LINSERT command: LINSERT key BEFORE|AFTER pivot element"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 4
     
-    def execute(self, args:List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
-                "ERR wrong number of arguments for 'lpush' command"
+                "ERR wrong number of arguments for 'linsert' command"
             )
         
-        key, values = args[0], args[1:]
+        key, where, pivot, value = args
+        where = where.upper()
+        if where not in (b"BEFORE", b"AFTER"):
+            return RESPSerializer.serialize_error("ERR syntax error")
         
         entry = self.db.get(key)
         
-        if not entry:
-            self.db[key] = {
-                "value": deque([]),
-                "type": "list",
-                "blocking_clients": deque([])
-            }
-            entry = self.db[key]
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
         
         if not self.ensure_list_type(entry):
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        entry["value"].extendleft(values)
-        return RESPSerializer.serialize_integer(len(entry["value"]))
+        for index, element in enumerate(entry):
+            if element == pivot:
+                break
+        else:
+            return RESPSerializer.serialize_integer(-1)
+        
+        entry.insert(index if where == b"BEFORE" else index + 1, value)
+        return RESPSerializer.serialize_integer(len(entry))
 
 
-class LRangeCommand(RedisListCommandBase):
-    """Implementation of LRANGE command"""
+class LTrimCommand(RedisListCommandBase):
+    """Implementation of LTRIM command"""
     
-    def validate_args(self, args: List[str]) -> bool:
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 3
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
-                "ERR wrong number of arguments for 'lrange' command"
+                "ERR wrong number of arguments for 'ltrim' command"
             )
         
         key = args[0]
         
-        try: 
+        try:
             start, stop = int(args[1]), int(args[2])
         except ValueError:
             return RESPSerializer.serialize_error(
@@ -119,27 +345,26 @@ class LRangeCommand(RedisListCommandBase):
         
         entry = self.db.get(key)
         
-        if not entry:
-            return RESPSerializer.serialize_array([])
+        if entry is None:
+            return RESPSerializer.serialize_simple_string("OK")
         
         if not self.ensure_list_type(entry):
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        return RESPSerializer.serialize_array(
-            # -1+1 = 0 -> 0 or None -> None(last element)
-            list(entry["value"])[start:stop+1 or None] 
-        )
+        entry.trim(*self.normalize_range(len(entry), start, stop))
+        self.cleanup_empty_key(key, entry)
+        return RESPSerializer.serialize_simple_string("OK")
 
 
 class LLenCommand(RedisListCommandBase):
     """Implementation of LLEN command"""
     
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 1
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'llen' command"
@@ -149,7 +374,7 @@ class LLenCommand(RedisListCommandBase):
         
         entry = self.db.get(key)
         
-        if not entry:
+        if entry is None:
             return RESPSerializer.serialize_integer(0)
         
         if not self.ensure_list_type(entry):
@@ -157,68 +382,148 @@ class LLenCommand(RedisListCommandBase):
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        return RESPSerializer.serialize_integer(len(entry["value"]))
+        return RESPSerializer.serialize_integer(len(entry))
 
 
 class LPopCommand(RedisListCommandBase):
-    """Implementation of LPOP command"""
+    """Implementation of LPOP command: LPOP key [count]"""
+    
+    name = "lpop"
+    left = True
+    write = True
     
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         return len(args) == 1 or len(args) == 2
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
-                "ERR wrong number of arguments for 'lpop' command"
+                f"ERR wrong number of arguments for '{self.name}' command"
             )
         
         key = args[0]
         
         try:
-            num = int(args[1]) if len(args) == 2 else 1
+            num = int(args[1]) if len(args) == 2 else None
         except ValueError:
             return RESPSerializer.serialize_error(
                 "ERR value is not an integer or out of range"
             )
+        if num is not None and num < 0:
+            return RESPSerializer.serialize_error(
+                "ERR value is out of range, must be positive"
+            )
         
         entry = self.db.get(key)
         
-        if not entry:
-            return RESPSerializer.serialize_bulk_string(None)
+        if entry is None:
+            # with a count the reply is an array, a null one for a missing key
+            return RESPSerializer.serialize_bulk_string(None) if num is None else RESPSerializer.serialize_null_array()
         
         if not self.ensure_list_type(entry):
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        num = min(num, len(entry["value"]))
-        popped_vals = [entry["value"].popleft() for _ in range(num)]
-        
-        self.cleanup_empty_key(key, entry)
+        popped_vals = self.pop_from(key, self.left, 1 if num is None else num) or []
         
         return (
             RESPSerializer.serialize_bulk_string(popped_vals[0])
-            if num == 1
+            if num is None
             else RESPSerializer.serialize_array(popped_vals)
         )
 
 
-class BLPopCommand(RedisListCommandBase):
-    """Implementation of BLPOP command"""
+class RPopCommand(LPopCommand):
+    """Implementation of RPOP command: RPOP key [count]"""
     
-    def validate_args(self, args: List[str]) -> bool:
-        return len(args) == 2
+    name = "rpop"
+    left = False
+
+
+class LMPopCommand(RedisListCommandBase):
+    """Implementation of LMPOP command: LMPOP numkeys key [key ...] LEFT|RIGHT [COUNT count]"""
     
-    def execute(self, args: List[str]) -> bytes:
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        try:
+            return args[1:1 + int(args[0])]
+        except ValueError:
+            return []
+    
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
-                "ERR wrong number of arguments for 'blpop' command"
+                "ERR wrong number of arguments for 'lmpop' command"
             )
         
-        key = args[0]
+        try:
+            keys, left, count = self.parse_mpop(args)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        for key in keys:
+            entry = self.db.get(key)
+            if entry is None:
+                continue
+            if not self.ensure_list_type(entry):
+                return RESPSerializer.serialize_error(
+                    "WRONGTYPE Operation against a key holding the wrong kind of value"
+                )
+            return RESPSerializer.serialize_array([key, self.pop_from(key, left, count)])
+        
+        return RESPSerializer.serialize_null_array()
+
+
+class LMoveCommand(RedisListCommandBase):
+    """Implementation of LMOVE command: LMOVE source destination LEFT|RIGHT LEFT|RIGHT"""
+    
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 4
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[:2]
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'lmove' command"
+            )
+        
+        try:
+            from_left, to_left = self.parse_direction(args[2]), self.parse_direction(args[3])
+            value = self.move(args[0], args[1], from_left, to_left)
+        except (ValueError, TypeError) as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        return RESPSerializer.serialize_bulk_string(value)
+
+
+class LRemCommand(RedisListCommandBase):
+    """Implementation of LREM command: LREM key count element"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'lrem' command"
+            )
+        
+        key, element = args[0], args[2]
         
         try:
-            timeout = int(args[1])
+            count = int(args[1])
         except ValueError:
             return RESPSerializer.serialize_error(
                 "ERR value is not an integer or out of range"
@@ -226,31 +531,249 @@ class BLPopCommand(RedisListCommandBase):
         
         entry = self.db.get(key)
         
-        if not entry:
-            self.db[key] = {
-                "value": deque([]),
-                "type": "list",
-                "blocking_clients": deque([])
-            }
-            entry = self.db[key]
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
         
-        if entry["value"]:
-            return RESPSerializer.serialize_array(
-                [key, entry["value"].popleft()]
+        if not self.ensure_list_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
-        else:
-            waiter = {
-                "event": Event(),
-                "value": None
-            }
-            
-            entry["blocking_clients"].append(waiter)
-            
-            signaled = waiter["event"].wait(None if timeout == 0 else timeout)
-            if not signaled:
-                entry["blocking_clients"].remove(waiter)
-                return RESPSerializer.serialize_bulk_string(None)
+        
+        removed = entry.remove(element, count)
+        self.cleanup_empty_key(key, entry)
+        return RESPSerializer.serialize_integer(removed)
+
+
+class LPosCommand(RedisListCommandBase):
+    """Implementation of LPOS command: LPOS key element [RANK rank] [COUNT num-matches] [MAXLEN len]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2 and len(args) % 2 == 0
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'lpos' command"
+                if len(args) < 2 else "ERR syntax error"
+            )
+        
+        key, element = args[0], args[1]
+        
+        rank, count, maxlen = 1, None, 0
+        for i in range(2, len(args), 2):
+            option = args[i].upper()
+            try:
+                value = int(args[i + 1])
+            except ValueError:
+                return RESPSerializer.serialize_error(
+                    "ERR value is not an integer or out of range"
+                )
+            if option == b"RANK":
+                if value == 0:
+                    return RESPSerializer.serialize_error(
+                        "ERR RANK can't be zero: use 1 to start from the first match, "
+                        "2 from the second ... or use negative to start from the end of the list"
+                    )
+                rank = value
+            elif option == b"COUNT":
+                if value < 0:
+                    return RESPSerializer.serialize_error("ERR COUNT can't be negative")
+                count = value
+            elif option == b"MAXLEN":
+                if value < 0:
+                    return RESPSerializer.serialize_error("ERR MAXLEN can't be negative")
+                maxlen = value
             else:
-                return RESPSerializer.serialize_array(
-                    [key, waiter["value"]]
-                )
\ No newline at end of file
+                return RESPSerializer.serialize_error("ERR syntax error")
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_list_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        matches = []
+        if entry is not None:
+            # COUNT 0 returns every match, no COUNT only the first one
+            wanted = (count or len(entry)) if count is not None else 1
+            skip = abs(rank) - 1
+            length = len(entry)
+            elements = iter(entry) if rank > 0 else reversed(entry)
+            for i, value in enumerate(islice(elements, maxlen or None)):
+                if value != element:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                matches.append(i if rank > 0 else length - 1 - i)
+                if len(matches) >= wanted:
+                    break
+        
+        if count is not None:
+            return RESPSerializer.serialize_array(matches)
+        return RESPSerializer.serialize_integer(matches[0]) if matches else RESPSerializer.serialize_bulk_string(None)
+
+
+class BLPopCommand(RedisListCommandBase):
+    """Implementation of BLPOP command: BLPOP key [key ...] timeout"""
+    
+    name = "blpop"
+    left = True
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[:-1]
+    
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        keys = args[:-1]
+        
+        try:
+            timeout = self.parse_timeout(args[-1])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        for key in keys:
+            entry = self.db.get(key)
+            if entry is not None and not self.ensure_list_type(entry):
+                return RESPSerializer.serialize_error(
+                    "WRONGTYPE Operation against a key holding the wrong kind of value"
+                )
+        
+        def serve(key: bytes) -> Optional[List[bytes]]:
+            values = self.pop_from(key, self.left)
+            if not values:
+                return None
+            # logged as the non blocking pop, whether served now or once woken
+            propagate(b"LPOP" if self.left else b"RPOP", key)
+            return [key, values[0]]
+        
+        # the first non empty key in argument order is served right away
+        for key in keys:
+            result = serve(key)
+            if result:
+                return RESPSerializer.serialize_array(result)
+        
+        return self.block(
+            keys, timeout, serve,
+            on_wake=RESPSerializer.serialize_array,
+            timeout_reply=RESPSerializer.serialize_null_array(),
+        )
+
+
+class BRPopCommand(BLPopCommand):
+    """Implementation of BRPOP command: BRPOP key [key ...] timeout"""
+    
+    name = "brpop"
+    left = False
+
+
+class BLMoveCommand(RedisListCommandBase):
+    """Implementation of BLMOVE command: BLMOVE source destination LEFT|RIGHT LEFT|RIGHT timeout"""
+    
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 5
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[:2]
+    
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'blmove' command"
+            )
+        
+        source, destination = args[0], args[1]
+        try:
+            from_left, to_left = self.parse_direction(args[2]), self.parse_direction(args[3])
+            timeout = self.parse_timeout(args[4])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(source)
+        if entry is not None and not self.ensure_list_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        try:
+            value = self.move(source, destination, from_left, to_left)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        if value is not None:
+            return RESPSerializer.serialize_bulk_string(value)
+        
+        def serve(key: bytes) -> Optional[bytes]:
+            # a TypeError keeps the client blocked until the destination can take the value
+            return self.move(source, destination, from_left, to_left)
+        
+        return self.block(
+            [source], timeout, serve,
+            on_wake=RESPSerializer.serialize_bulk_string,
+            timeout_reply=RESPSerializer.serialize_bulk_string(None),
+        )
+
+
+class BLMPopCommand(RedisListCommandBase):
+    """Implementation of BLMPOP command: BLMPOP timeout numkeys key [key ...] LEFT|RIGHT [COUNT count]"""
+    
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 4
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        try:
+            return args[2:2 + int(args[1])]
+        except (ValueError, IndexError):
+            return []
+    
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'blmpop' command"
+            )
+        
+        try:
+            timeout = self.parse_timeout(args[0])
+            keys, left, count = self.parse_mpop(args[1:])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        for key in keys:
+            entry = self.db.get(key)
+            if entry is not None and not self.ensure_list_type(entry):
+                return RESPSerializer.serialize_error(
+                    "WRONGTYPE Operation against a key holding the wrong kind of value"
+                )
+        
+        def serve(key: bytes) -> Optional[List]:
+            values = self.pop_from(key, left, count)
+            if not values:
+                return None
+            propagate(b"LMPOP", b"1", key, b"LEFT" if left else b"RIGHT", b"COUNT", b"%d" % len(values))
+            return [key, values]
+        
+        for key in keys:
+            result = serve(key)
+            if result:
+                return RESPSerializer.serialize_array(result)
+        
+        return self.block(
+            keys, timeout, serve,
+            on_wake=RESPSerializer.serialize_array,
+            timeout_reply=RESPSerializer.serialize_null_array(),
+        )
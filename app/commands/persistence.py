@@ -0,0 +1,104 @@
+from .base import RedisCommand
+from typing import List
+from app.parser import RESPSerializer
+from app.persistence import Persistence
+from app.rdb import RDBError
+
+class RedisPersistenceCommandBase(RedisCommand):
+    """Base class for commands managing snapshots, none of them take keys"""
+    
+    name = ""
+    
+    def __init__(self, persistence: Persistence):
+        self.persistence = persistence
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 0
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return []
+    
+    def wrong_args(self) -> bytes:
+        return RESPSerializer.serialize_error(f"ERR wrong number of arguments for '{self.name}' command")
+
+
+class SaveCommand(RedisPersistenceCommandBase):
+    """Implementation of SAVE command, writes the snapshot synchronously"""
+    
+    name = "save"
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return self.wrong_args()
+        if self.persistence.child_kind == "rdb":
+            return RESPSerializer.serialize_error("ERR Background save already in progress")
+        try:
+            self.persistence.save()
+        except (OSError, RDBError) as e:
+            print(f"Error saving DB on disk: {e!r}")
+            return RESPSerializer.serialize_error("ERR Error saving DB on disk")
+        return RESPSerializer.serialize_simple_string("OK")
+
+
+class BGSaveCommand(RedisPersistenceCommandBase):
+    """Implementation of BGSAVE command: BGSAVE [SCHEDULE]
+
+    The snapshot is written by a forked child. SCHEDULE starts it once a running AOF
+    rewrite is done instead of failing.
+    """
+    
+    name = "bgsave"
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 0 or (len(args) == 1 and args[0].upper() == b"SCHEDULE")
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error("ERR syntax error")
+        running = self.persistence.child_kind
+        try:
+            started = self.persistence.bgsave(schedule=bool(args))
+        except OSError as e:
+            return RESPSerializer.serialize_error(f"ERR Can't BGSAVE: fork failed: {e.strerror}")
+        if not started:
+            if running == "rdb":
+                return RESPSerializer.serialize_error("ERR Background save already in progress")
+            return RESPSerializer.serialize_error(
+                "ERR Another child process is active (AOF?): can't BGSAVE right now. "
+                "Use BGSAVE SCHEDULE in order to schedule a BGSAVE whenever possible."
+            )
+        if running is not None:
+            return RESPSerializer.serialize_simple_string("Background saving scheduled")
+        return RESPSerializer.serialize_simple_string("Background saving started")
+
+
+class LastSaveCommand(RedisPersistenceCommandBase):
+    """Implementation of LASTSAVE command, unix time of the last successful save"""
+    
+    name = "lastsave"
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return self.wrong_args()
+        return RESPSerializer.serialize_integer(self.persistence.lastsave)
+
+
+class BGRewriteAOFCommand(RedisPersistenceCommandBase):
+    """Implementation of BGREWRITEAOF command, compacts the AOF from a forked child"""
+    
+    name = "bgrewriteaof"
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return self.wrong_args()
+        if self.persistence.aof is None:
+            return RESPSerializer.serialize_error("ERR The append only file is disabled, start with --appendonly yes")
+        if self.persistence.child_kind == "aof":
+            return RESPSerializer.serialize_error("ERR Background append only file rewriting already in progress")
+        try:
+            started = self.persistence.bgrewriteaof()
+        except OSError as e:
+            return RESPSerializer.serialize_error(f"ERR Can't rewrite append only file in background: fork: {e.strerror}")
+        if not started:
+            return RESPSerializer.serialize_simple_string("Background append only file rewriting scheduled")
+        return RESPSerializer.serialize_simple_string("Background append only file rewriting started")
@@ -0,0 +1,50 @@
+from .base import RedisCommand, Waiter
+from typing import List, Union
+from app.parser import RESPSerializer
+from app.replication import Replication
+
+class RedisReplicationCommandBase(RedisCommand):
+    """Base class for commands inspecting replication, none of them take keys"""
+    
+    def __init__(self, replication: Replication):
+        self.replication = replication
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return []
+
+
+class WaitCommand(RedisReplicationCommandBase):
+    """Implementation of WAIT command: WAIT numreplicas timeout
+
+    Blocks until `numreplicas` replicas acknowledged every write made before it, or
+    `timeout` milliseconds passed (0 blocks forever). Replies with how many did.
+    """
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'wait' command")
+        try:
+            numreplicas, timeout = int(args[0]), int(args[1])
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+        if timeout < 0:
+            return RESPSerializer.serialize_error("ERR timeout is negative")
+        if self.replication.master is not None:
+            return RESPSerializer.serialize_error("ERR WAIT cannot be used with replica instances.")
+        return self.replication.wait(numreplicas, timeout / 1000)
+
+
+class RoleCommand(RedisReplicationCommandBase):
+    """Implementation of ROLE command: master with its offset and online replicas, or
+    replica with its master, link state and offset"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 0
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'role' command")
+        return RESPSerializer.serialize_array(self.replication.role())
@@ -0,0 +1,425 @@
+from .base import RedisCommand, parse_scan_args, propagate, scan_page
+from typing import List, Optional
+from app.keyspace import Keyspace
+from app.parser import RESPSerializer
+from app.objects import INT64_MAX, OBJ_SET, SetObject, type_of
+
+class RedisSetCommandBase(RedisCommand):
+    """Base class with common functionality for set commands"""
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def ensure_set_type(self, entry) -> bool:
+        """Ensure whether accessed key is set type"""
+        return type_of(entry) == OBJ_SET
+    
+    def cleanup_empty_key(self, key: bytes, entry: SetObject):
+        """Cleanup key with empty value"""
+        if not len(entry):
+            del self.db[key]
+    
+    def get_sets(self, keys: List[bytes]) -> List[Optional[SetObject]]:
+        """Sets stored at `keys`, None for missing keys.
+
+        Raises:
+            TypeError: a key holds another type
+        """
+        sets = []
+        for key in keys:
+            entry = self.db.get(key)
+            if entry is not None and not self.ensure_set_type(entry):
+                raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+            sets.append(entry)
+        return sets
+
+
+class SAddCommand(RedisSetCommandBase):
+    """Implementation of SADD command: SADD key member [member ...]"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'sadd' command"
+            )
+        
+        key, members = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if entry is None:
+            entry = self.db[key] = SetObject()
+        
+        added = sum(entry.add(member) for member in members)
+        return RESPSerializer.serialize_integer(added)
+
+
+class SRemCommand(RedisSetCommandBase):
+    """Implementation of SREM command: SREM key member [member ...]"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'srem' command"
+            )
+        
+        key, members = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        removed = sum(entry.remove(member) for member in members)
+        self.cleanup_empty_key(key, entry)
+        return RESPSerializer.serialize_integer(removed)
+
+
+class SIsMemberCommand(RedisSetCommandBase):
+    """Implementation of SISMEMBER command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'sismember' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_integer(int(args[1] in entry))
+
+
+class SMIsMemberCommand(RedisSetCommandBase):
+    """Implementation of SMISMEMBER command: SMISMEMBER key member [member ...]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'smismember' command"
+            )
+        
+        key, members = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_array(
+            [int(entry is not None and member in entry) for member in members]
+        )
+
+
+class SCardCommand(RedisSetCommandBase):
+    """Implementation of SCARD command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'scard' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_integer(len(entry))
+
+
+class SMembersCommand(RedisSetCommandBase):
+    """Implementation of SMEMBERS command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'smembers' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_array([])
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_array(list(entry))
+
+
+class SInterCommand(RedisSetCommandBase):
+    """Implementation of SINTER command: SINTER key [key ...]"""
+    
+    name = "sinter"
+    # the *STORE variants take a destination key before the source keys
+    store = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= (2 if self.store else 1)
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args
+    
+    def combine(self, sets: List[Optional[SetObject]]) -> List[bytes]:
+        """Intersection: walk the smallest set and probe the others, O(N * M) with N
+        the size of the smallest set; any missing key makes the result empty"""
+        if any(entry is None for entry in sets):
+            return []
+        smallest, *others = sorted(sets, key=len)
+        others.sort(key=len)
+        return [member for member in smallest if all(member in other for other in others)]
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        destination, keys = (args[0], args[1:]) if self.store else (None, args)
+        
+        try:
+            sets = self.get_sets(keys)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        members = self.combine(sets)
+        if not self.store:
+            return RESPSerializer.serialize_array(members)
+        
+        # the destination is overwritten whatever type it held
+        if members:
+            self.db[destination] = SetObject(members)
+        elif destination in self.db:
+            del self.db[destination]
+        return RESPSerializer.serialize_integer(len(members))
+
+
+class SInterStoreCommand(SInterCommand):
+    """Implementation of SINTERSTORE command: SINTERSTORE destination key [key ...]"""
+    
+    name = "sinterstore"
+    store = True
+    write = True
+
+
+class SUnionCommand(SInterCommand):
+    """Implementation of SUNION command: SUNION key [key ...]"""
+    
+    name = "sunion"
+    
+    def combine(self, sets: List[Optional[SetObject]]) -> List[bytes]:
+        members = {}
+        for entry in sets:
+            if entry is not None:
+                members.update(dict.fromkeys(entry))
+        return list(members)
+
+
+class SUnionStoreCommand(SUnionCommand):
+    """Implementation of SUNIONSTORE command: SUNIONSTORE destination key [key ...]"""
+    
+    name = "sunionstore"
+    store = True
+    write = True
+
+
+class SDiffCommand(SInterCommand):
+    """Implementation of SDIFF command: SDIFF key [key ...]"""
+    
+    name = "sdiff"
+    
+    def combine(self, sets: List[Optional[SetObject]]) -> List[bytes]:
+        first, others = sets[0], [entry for entry in sets[1:] if entry is not None]
+        if first is None:
+            return []
+        return [member for member in first if not any(member in other for other in others)]
+
+
+class SDiffStoreCommand(SDiffCommand):
+    """Implementation of SDIFFSTORE command: SDIFFSTORE destination key [key ...]"""
+    
+    name = "sdiffstore"
+    store = True
+    write = True
+
+
+class SRandMemberCommand(RedisSetCommandBase):
+    """Implementation of SRANDMEMBER command: SRANDMEMBER key [count]"""
+    
+    name = "srandmember"
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) in (1, 2)
+    
+    def parse_count(self, args: List[bytes]) -> Optional[int]:
+        if len(args) == 1:
+            return None
+        try:
+            count = int(args[1])
+        except ValueError:
+            raise ValueError("ERR value is not an integer or out of range")
+        if not -INT64_MAX <= count <= INT64_MAX:
+            raise ValueError("ERR value is out of range")
+        return count
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        try:
+            count = self.parse_count(args)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None) if count is None else RESPSerializer.serialize_array([])
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if count is None:
+            return RESPSerializer.serialize_bulk_string(entry.random_member())
+        # a negative count may return the same member several times, each pick is
+        # encoded right into the reply
+        if count < 0:
+            chunks = [b"*%d\r\n" % -count]
+            chunks.extend(RESPSerializer.serialize_bulk_string(entry.random_member()) for _ in range(-count))
+            return b"".join(chunks)
+        return RESPSerializer.serialize_array(entry.random_members(count))
+
+
+class SPopCommand(SRandMemberCommand):
+    """Implementation of SPOP command: SPOP key [count]"""
+    
+    name = "spop"
+    write = True
+    verbatim = False
+    
+    def parse_count(self, args: List[bytes]) -> Optional[int]:
+        count = super().parse_count(args)
+        if count is not None and count < 0:
+            raise ValueError("ERR value is out of range, must be positive")
+        return count
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            count = self.parse_count(args)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None) if count is None else RESPSerializer.serialize_array([])
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        members = [entry.random_member()] if count is None else entry.random_members(count)
+        for member in members:
+            entry.remove(member)
+        self.cleanup_empty_key(key, entry)
+        # the members are picked at random, log which ones went
+        if members:
+            propagate(b"SREM", key, *members)
+        
+        if count is None:
+            return RESPSerializer.serialize_bulk_string(members[0])
+        return RESPSerializer.serialize_array(members)
+
+
+class SScanCommand(RedisSetCommandBase):
+    """Implementation of SSCAN command: SSCAN key cursor [MATCH pattern] [COUNT count]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'sscan' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            cursor, pattern, count, _ = parse_scan_args(args[1:])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_array([b"0", []])
+        
+        if not self.ensure_set_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        next_cursor, page = scan_page(entry, cursor, count, pattern)
+        return RESPSerializer.serialize_array([b"%d" % next_cursor, page])
@@ -0,0 +1,595 @@
+from .base import RedisBlockingCommandBase, Waiter, propagate
+from typing import Callable, List, Optional, Tuple, Union
+from app.parser import RESPSerializer, protocol
+from app.objects import OBJ_ZSET, SkipListNode, ZSetObject, type_of
+
+Predicate = Callable[[SkipListNode], bool]
+
+class RedisSortedSetCommandBase(RedisBlockingCommandBase):
+    """Base class with common functionality for sorted set commands"""
+    
+    def ensure_zset_type(self, entry) -> bool:
+        """Ensure whether accessed key is sorted set type"""
+        return type_of(entry) == OBJ_ZSET
+    
+    def cleanup_empty_key(self, key: bytes, entry: ZSetObject):
+        """Cleanup key with empty value"""
+        if not len(entry):
+            del self.db[key]
+    
+    def parse_score(self, raw: bytes) -> float:
+        """Scores are doubles, +inf/-inf allowed, nan is not"""
+        try:
+            score = float(raw)
+        except ValueError:
+            raise ValueError("ERR value is not a valid float")
+        if score != score or b"_" in raw:
+            raise ValueError("ERR value is not a valid float")
+        return score
+    
+    def score_range(self, low: bytes, high: bytes) -> Tuple[Predicate, Predicate]:
+        """Predicates of a `min max` score range, `(` makes a bound exclusive"""
+        bounds = []
+        for raw in (low, high):
+            exclusive = raw.startswith(b"(")
+            try:
+                bounds.append((self.parse_score(raw[1:] if exclusive else raw), exclusive))
+            except ValueError:
+                raise ValueError("ERR min or max is not a float")
+        (low, low_exclusive), (high, high_exclusive) = bounds
+        above_min = (lambda node: node.score > low) if low_exclusive else (lambda node: node.score >= low)
+        below_max = (lambda node: node.score < high) if high_exclusive else (lambda node: node.score <= high)
+        return above_min, below_max
+    
+    def lex_range(self, low: bytes, high: bytes) -> Tuple[Predicate, Predicate]:
+        """Predicates of a `min max` lexicographic range: `[x` inclusive, `(x` exclusive, `-` and `+` unbounded"""
+        for raw in (low, high):
+            if raw not in (b"-", b"+") and raw[:1] not in (b"[", b"("):
+                raise ValueError("ERR min or max not valid string range item")
+        
+        if low in (b"-", b"+"):
+            above_min = lambda node, unbounded=low == b"-": unbounded
+        elif low.startswith(b"("):
+            above_min = lambda node, value=low[1:]: node.member > value
+        else:
+            above_min = lambda node, value=low[1:]: node.member >= value
+        
+        if high in (b"-", b"+"):
+            below_max = lambda node, unbounded=high == b"+": unbounded
+        elif high.startswith(b"("):
+            below_max = lambda node, value=high[1:]: node.member < value
+        else:
+            below_max = lambda node, value=high[1:]: node.member <= value
+        return above_min, below_max
+    
+    def range_nodes(
+        self, entry: ZSetObject, above_min: Predicate, below_max: Predicate,
+        reverse: bool = False, offset: int = 0, count: int = -1
+    ) -> List[SkipListNode]:
+        """Nodes in a score or lex range, O(log n + k): the first node is found by a
+        skiplist search and the LIMIT offset skipped by rank instead of walking"""
+        zsl = entry.zsl
+        if reverse:
+            node = zsl.last_in_range(above_min, below_max)
+            in_range = above_min
+        else:
+            node = zsl.first_in_range(above_min, below_max)
+            in_range = below_max
+        
+        if node is not None and offset:
+            rank = zsl.rank(node.score, node.member) + (-offset if reverse else offset)
+            node = zsl.by_rank(rank) if 0 <= rank < zsl.length else None
+        
+        nodes = []
+        while node is not None and count != len(nodes) and in_range(node):
+            nodes.append(node)
+            node = node.backward if reverse else node.forward[0]
+        return nodes
+    
+    def format_members(self, pairs: List[Tuple[bytes, float]], withscores: bool) -> List:
+        """Members, with scores as a flat list in RESP2 and as [member, score] pairs in RESP3"""
+        if not withscores:
+            return [member for member, _ in pairs]
+        if protocol.get() == 3:
+            return [[member, score] for member, score in pairs]
+        return [item for pair in pairs for item in pair]
+    
+    def pop(self, key: bytes, count: int, highest: bool) -> List[Tuple[bytes, float]]:
+        """Pop up to `count` members with the lowest (or highest) scores.
+
+        Raises:
+            TypeError: the key holds another type
+        """
+        entry = self.db.get(key)
+        if entry is None:
+            return []
+        if not self.ensure_zset_type(entry):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        popped = []
+        for _ in range(min(count, len(entry))):
+            node = entry.zsl.tail if highest else entry.zsl.header.forward[0]
+            popped.append((node.member, node.score))
+            entry.remove(node.member)
+        self.cleanup_empty_key(key, entry)
+        return popped
+
+
+class ZAddCommand(RedisSortedSetCommandBase):
+    """Implementation of ZADD command: ZADD key [NX | XX] [GT | LT] [CH] [INCR] score member [score member ...]"""
+    
+    write = True
+    
+    FLAGS = (b"NX", b"XX", b"GT", b"LT", b"CH", b"INCR")
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'zadd' command"
+            )
+        
+        key = args[0]
+        flags = set()
+        i = 1
+        while i < len(args) and args[i].upper() in self.FLAGS:
+            flags.add(args[i].upper())
+            i += 1
+        pairs = args[i:]
+        
+        if not pairs or len(pairs) % 2:
+            return RESPSerializer.serialize_error("ERR syntax error")
+        if {b"NX", b"XX"} <= flags:
+            return RESPSerializer.serialize_error(
+                "ERR XX and NX options at the same time are not compatible"
+            )
+        if len(flags & {b"NX", b"GT", b"LT"}) > 1:
+            return RESPSerializer.serialize_error(
+                "ERR GT, LT, and/or NX options at the same time are not compatible"
+            )
+        incr = b"INCR" in flags
+        if incr and len(pairs) > 2:
+            return RESPSerializer.serialize_error(
+                "ERR INCR option supports a single increment-element pair"
+            )
+        
+        # every score is checked before anything is added
+        try:
+            scores = [self.parse_score(pairs[j]) for j in range(0, len(pairs), 2)]
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        added = changed = 0
+        score = None
+        for score, member in zip(scores, pairs[1::2]):
+            current = entry.score(member) if entry is not None else None
+            if current is None:
+                if b"XX" in flags:
+                    score = None
+                    continue
+                if entry is None:
+                    entry = self.db[key] = ZSetObject()
+                entry.add(member, score)
+                added += 1
+                continue
+            
+            if b"NX" in flags:
+                score = None
+                continue
+            if incr:
+                score += current
+                if score != score:
+                    return RESPSerializer.serialize_error("ERR resulting score is not a number (NaN)")
+            if (b"GT" in flags and score <= current) or (b"LT" in flags and score >= current):
+                score = None
+                continue
+            if score != current:
+                entry.add(member, score)
+                changed += 1
+        
+        if added:
+            self.blocking_clients.signal(key)
+        
+        if incr:
+            # null when NX/XX/GT/LT prevented the update
+            if score is None:
+                return RESPSerializer.serialize_bulk_string(None)
+            return RESPSerializer.serialize_double(score)
+        return RESPSerializer.serialize_integer(added + changed if b"CH" in flags else added)
+
+
+class ZIncrByCommand(RedisSortedSetCommandBase):
+    """Implementation of ZINCRBY command: ZINCRBY key increment member"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'zincrby' command"
+            )
+        
+        key, member = args[0], args[2]
+        
+        try:
+            increment = self.parse_score(args[1])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        current = entry.score(member) if entry is not None else None
+        score = increment + (current or 0.0)
+        if score != score:
+            return RESPSerializer.serialize_error("ERR resulting score is not a number (NaN)")
+        
+        if entry is None:
+            entry = self.db[key] = ZSetObject()
+        if entry.add(member, score):
+            self.blocking_clients.signal(key)
+        return RESPSerializer.serialize_double(score)
+
+
+class ZRangeCommand(RedisSortedSetCommandBase):
+    """Implementation of ZRANGE command: ZRANGE key start stop [BYSCORE | BYLEX] [REV] [LIMIT offset count] [WITHSCORES]"""
+    
+    name = "zrange"
+    # ZRANGEBYSCORE fixes the range type and takes no BYSCORE/BYLEX/REV
+    by: Optional[bytes] = None
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3
+    
+    def parse_options(self, options: List[bytes]) -> Tuple[Optional[bytes], bool, Optional[Tuple[int, int]], bool]:
+        """Returns (range type, reverse, (offset, count) of LIMIT, withscores)"""
+        by, reverse, limit, withscores = self.by, False, None, False
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option in (b"BYSCORE", b"BYLEX") and self.by is None:
+                by = option
+                i += 1
+            elif option == b"REV" and self.by is None:
+                reverse = True
+                i += 1
+            elif option == b"WITHSCORES":
+                withscores = True
+                i += 1
+            elif option == b"LIMIT" and i + 2 < len(options):
+                try:
+                    limit = (int(options[i + 1]), int(options[i + 2]))
+                except ValueError:
+                    raise ValueError("ERR value is not an integer or out of range")
+                i += 3
+            else:
+                raise ValueError("ERR syntax error")
+        
+        if limit is not None and by is None:
+            raise ValueError("ERR syntax error, LIMIT is only supported in combination with either BYSCORE or BYLEX")
+        if withscores and by == b"BYLEX":
+            raise ValueError("ERR syntax error, WITHSCORES not supported in combination with BYLEX")
+        return by, reverse, limit, withscores
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key, start, stop = args[0], args[1], args[2]
+        
+        try:
+            by, reverse, limit, withscores = self.parse_options(args[3:])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        if by is None:
+            try:
+                start, stop = int(start), int(stop)
+            except ValueError:
+                return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+        else:
+            # REV takes the range as `max min`
+            low, high = (stop, start) if reverse else (start, stop)
+            try:
+                above_min, below_max = (self.score_range if by == b"BYSCORE" else self.lex_range)(low, high)
+            except ValueError as e:
+                return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_array([])
+        
+        if not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        if by is None:
+            nodes = self.rank_range(entry, start, stop, reverse)
+        else:
+            offset, count = limit or (0, -1)
+            if offset < 0:
+                return RESPSerializer.serialize_array([])
+            nodes = self.range_nodes(entry, above_min, below_max, reverse, offset, count if count >= 0 else -1)
+        
+        pairs = [(node.member, node.score) for node in nodes]
+        return RESPSerializer.serialize_array(self.format_members(pairs, withscores))
+    
+    def rank_range(self, entry: ZSetObject, start: int, stop: int, reverse: bool) -> List[SkipListNode]:
+        """Nodes between two inclusive, possibly negative ranks"""
+        length = len(entry)
+        if start < 0:
+            start = max(length + start, 0)
+        if stop < 0:
+            stop += length
+        stop = min(stop, length - 1)
+        if start > stop:
+            return []
+        
+        node = entry.zsl.by_rank(length - 1 - start if reverse else start)
+        nodes = []
+        for _ in range(stop - start + 1):
+            nodes.append(node)
+            node = node.backward if reverse else node.forward[0]
+        return nodes
+
+
+class ZRangeByScoreCommand(ZRangeCommand):
+    """Implementation of ZRANGEBYSCORE command: ZRANGEBYSCORE key min max [WITHSCORES] [LIMIT offset count]"""
+    
+    name = "zrangebyscore"
+    by = b"BYSCORE"
+
+
+class ZRankCommand(RedisSortedSetCommandBase):
+    """Implementation of ZRANK command: ZRANK key member [WITHSCORE]"""
+    
+    name = "zrank"
+    reverse = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) in (2, 3)
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key, member = args[0], args[1]
+        withscore = len(args) == 3
+        if withscore and args[2].upper() != b"WITHSCORE":
+            return RESPSerializer.serialize_error("ERR syntax error")
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        rank = entry.rank(member) if entry is not None else None
+        if rank is None:
+            return RESPSerializer.serialize_null_array() if withscore else RESPSerializer.serialize_bulk_string(None)
+        
+        if self.reverse:
+            rank = len(entry) - 1 - rank
+        if withscore:
+            return RESPSerializer.serialize_array([rank, entry.score(member)])
+        return RESPSerializer.serialize_integer(rank)
+
+
+class ZRevRankCommand(ZRankCommand):
+    """Implementation of ZREVRANK command: ZREVRANK key member [WITHSCORE]"""
+    
+    name = "zrevrank"
+    reverse = True
+
+
+class ZScoreCommand(RedisSortedSetCommandBase):
+    """Implementation of ZSCORE command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'zscore' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is not None and not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        score = entry.score(args[1]) if entry is not None else None
+        if score is None:
+            return RESPSerializer.serialize_bulk_string(None)
+        return RESPSerializer.serialize_double(score)
+
+
+class ZCardCommand(RedisSortedSetCommandBase):
+    """Implementation of ZCARD command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'zcard' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_integer(len(entry))
+
+
+class ZRemCommand(RedisSortedSetCommandBase):
+    """Implementation of ZREM command: ZREM key member [member ...]"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'zrem' command"
+            )
+        
+        key, members = args[0], args[1:]
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        removed = sum(entry.remove(member) for member in members)
+        self.cleanup_empty_key(key, entry)
+        return RESPSerializer.serialize_integer(removed)
+
+
+class ZPopMinCommand(RedisSortedSetCommandBase):
+    """Implementation of ZPOPMIN command: ZPOPMIN key [count]"""
+    
+    name = "zpopmin"
+    highest = False
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) in (1, 2)
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key = args[0]
+        
+        count = 1
+        if len(args) == 2:
+            try:
+                count = int(args[1])
+            except ValueError:
+                return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+            if count < 0:
+                return RESPSerializer.serialize_error("ERR value is out of range, must be positive")
+        
+        entry = self.db.get(key)
+        
+        if entry is not None and not self.ensure_zset_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        popped = self.pop(key, count, self.highest)
+        # without a count the reply is a flat [member, score] in both protocols
+        if len(args) == 1:
+            return RESPSerializer.serialize_array([item for pair in popped for item in pair])
+        return RESPSerializer.serialize_array(self.format_members(popped, withscores=True))
+
+
+class ZPopMaxCommand(ZPopMinCommand):
+    """Implementation of ZPOPMAX command: ZPOPMAX key [count]"""
+    
+    name = "zpopmax"
+    highest = True
+
+
+class BZPopMinCommand(RedisSortedSetCommandBase):
+    """Implementation of BZPOPMIN command: BZPOPMIN key [key ...] timeout"""
+    
+    name = "bzpopmin"
+    highest = False
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[:-1]
+    
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        keys = args[:-1]
+        
+        try:
+            timeout = self.parse_timeout(args[-1])
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        for key in keys:
+            entry = self.db.get(key)
+            if entry is not None and not self.ensure_zset_type(entry):
+                return RESPSerializer.serialize_error(
+                    "WRONGTYPE Operation against a key holding the wrong kind of value"
+                )
+        
+        def serve(key: bytes) -> Optional[list]:
+            popped = self.pop(key, 1, self.highest)
+            if not popped:
+                return None
+            # logged as the non blocking pop, whether served now or once woken
+            propagate(b"ZPOPMAX" if self.highest else b"ZPOPMIN", key)
+            return [key, *popped[0]]
+        
+        # the first non empty key in argument order is served right away
+        for key in keys:
+            result = serve(key)
+            if result:
+                return RESPSerializer.serialize_array(result)
+        
+        return self.block(
+            keys, timeout, serve,
+            on_wake=RESPSerializer.serialize_array,
+            timeout_reply=RESPSerializer.serialize_null_array(),
+        )
+
+
+class BZPopMaxCommand(BZPopMinCommand):
+    """Implementation of BZPOPMAX command: BZPOPMAX key [key ...] timeout"""
+    
+    name = "bzpopmax"
+    highest = True
@@ -1,252 +1,1200 @@
-from .base import RedisCommand
-from typing import List, Dict, Optional, Tuple
-from collections import OrderedDict
-from app.parser import RESPSerializer
+from .base import RedisCommand, Waiter, propagate
+from typing import List, Dict, Optional, Tuple, Union
+from app.keyspace import Keyspace, now_ms
+from app.parser import RESPSerializer, protocol
+from app.objects import OBJ_STREAM, STREAM_ID_MAX, Consumer, ConsumerGroup, PendingEntry, StreamID, StreamObject, type_of
+from bisect import bisect_left, insort
+from itertools import count as counter, islice
 import time
-from threading import Event
-import uuid
+
+class InvalidStreamID(ValueError):
+    """Raised for IDs that are not <ms>-<seq>, <ms>, - or +"""
+
 
 class RedisStreamCommandBase(RedisCommand):
     """Base class with common functionality for stream commands"""
     
-    def __init__(self, db: Dict, waiting_clients: Dict):
+    # FIFO order between readers blocked on the same ID
+    block_seq = counter()
+    
+    def __init__(self, db: Keyspace, waiting_clients: Dict):
         self.db = db
+        # stream key -> [(requested ID, seq, waiter)] sorted, so an XADD wakes a prefix
         self.waiting_clients = waiting_clients
     
-    def ensure_stream_type(self, entry: Dict) -> bool:
+    def block(self, waiter: Waiter, thresholds: Dict[bytes, StreamID]) -> int:
+        """Register a waiter to be woken once any stream gets an ID above its threshold"""
+        seq = next(self.block_seq)
+        for key, threshold in thresholds.items():
+            insort(self.waiting_clients.setdefault(key, []), (threshold, seq, waiter))
+        return seq
+    
+    def unblock(self, waiter: Waiter, thresholds: Dict[bytes, StreamID], seq: int):
+        """Remove a waiter from the streams it's still registered on"""
+        for key, threshold in thresholds.items():
+            waiters = self.waiting_clients.get(key)
+            if not waiters:
+                continue
+            i = bisect_left(waiters, (threshold, seq))
+            if i < len(waiters) and waiters[i][2] is waiter:
+                del waiters[i]
+                if not waiters:
+                    del self.waiting_clients[key]
+    
+    def signal_stream(self, key: bytes, id: StreamID):
+        """Wake the readers of `key` blocked on an ID below the new entry's"""
+        waiters = self.waiting_clients.get(key)
+        if not waiters:
+            return
+        n = bisect_left(waiters, (id,))
+        if not n:
+            return
+        woken = waiters[:n]
+        del waiters[:n]
+        if not waiters:
+            del self.waiting_clients[key]
+        for _, _, waiter in woken:
+            waiter.wake()
+    
+    def ensure_stream_type(self, entry) -> bool:
         """Ensure whether accessed key is stream type"""
-        return entry["type"] == "stream"
+        return type_of(entry) == OBJ_STREAM
     
-    def parse_id(self, id: str, is_start: Optional[bool] = None) -> Tuple:
-        """Parses an ID into a tuple in the format (ms, seq) used by XRANGE and XREAD commands"""
-        if id == "-":
-            return (float("-inf"), float("-inf"))
+    def parse_id(self, id: bytes, is_start: Optional[bool] = None) -> StreamID:
+        """Parses an ID into a tuple in the format (ms, seq) used by XRANGE and XREAD commands.
+        A missing sequence is 0 for range starts and the maximum for range ends"""
+        if id == b"-":
+            return (0, 0)
         
-        if id == "+":
-            return (float("inf"), float("inf"))
+        if id == b"+":
+            return (STREAM_ID_MAX, STREAM_ID_MAX)
         
-        parts = id.split("-")
-        if len(parts) == 1:
-            return (int(parts[0]), 0) if is_start else (int(parts[0]), float("inf"))
+        ms, sep, seq = id.partition(b"-")
+        try:
+            if not sep:
+                return (int(ms), 0) if is_start is not False else (int(ms), STREAM_ID_MAX)
+            parsed = (int(ms), int(seq))
+        except ValueError:
+            raise InvalidStreamID("ERR Invalid stream ID specified as stream command argument")
+        if not (0 <= parsed[0] <= STREAM_ID_MAX and 0 <= parsed[1] <= STREAM_ID_MAX):
+            raise InvalidStreamID("ERR Invalid stream ID specified as stream command argument")
+        return parsed
+    
+    def parse_range_id(self, id: bytes, is_start: bool) -> StreamID:
+        """Like parse_id, plus exclusive `(<id>` bounds which become the next/previous ID"""
+        if not id.startswith(b"("):
+            return self.parse_id(id, is_start=is_start)
         
-        return (int(parts[0]), int(parts[1]))
+        if id in (b"(-", b"(+"):
+            raise InvalidStreamID("ERR invalid start ID for the interval" if is_start else "ERR invalid end ID for the interval")
+        ms, seq = self.parse_id(id[1:], is_start=is_start)
+        if is_start:
+            if (ms, seq) == (STREAM_ID_MAX, STREAM_ID_MAX):
+                raise InvalidStreamID("ERR invalid start ID for the interval")
+            return (ms, seq + 1) if seq < STREAM_ID_MAX else (ms + 1, 0)
+        if (ms, seq) == (0, 0):
+            raise InvalidStreamID("ERR invalid end ID for the interval")
+        return (ms, seq - 1) if seq > 0 else (ms - 1, STREAM_ID_MAX)
+    
+    def parse_trim(self, args: List[bytes], i: int) -> Tuple[Dict, int]:
+        """Parse `MAXLEN|MINID [=|~] threshold [LIMIT count]` starting at args[i].
+
+        Returns:
+            (keyword arguments for StreamObject.trim, index after the options)
+        """
+        strategy = args[i].upper()
+        i += 1
+        approx = False
+        if i < len(args) and args[i] in (b"=", b"~"):
+            approx = args[i] == b"~"
+            i += 1
+        if i >= len(args):
+            raise ValueError("ERR syntax error")
+        
+        trim = {"approx": approx}
+        if strategy == b"MAXLEN":
+            try:
+                trim["maxlen"] = int(args[i])
+            except ValueError:
+                raise ValueError("ERR value is not an integer or out of range")
+            if trim["maxlen"] < 0:
+                raise ValueError("ERR The MAXLEN argument must be >= 0.")
+        else:
+            try:
+                trim["minid"] = self.parse_id(args[i], is_start=True)
+            except InvalidStreamID as e:
+                raise ValueError(str(e))
+        i += 1
+        
+        if i < len(args) and args[i].upper() == b"LIMIT":
+            if i + 1 >= len(args):
+                raise ValueError("ERR syntax error")
+            try:
+                limit = int(args[i + 1])
+            except ValueError:
+                raise ValueError("ERR value is not an integer or out of range")
+            if limit < 0:
+                raise ValueError("ERR The LIMIT argument must be >= 0.")
+            if not approx:
+                raise ValueError("ERR syntax error, LIMIT cannot be used without the special ~ option")
+            # LIMIT 0 means no limit
+            trim["limit"] = limit or None
+            i += 2
+        elif approx:
+            # same default as redis: 100 chunks worth of entries per call
+            trim["limit"] = 100 * StreamObject.NODE_MAX_ENTRIES
+        return trim, i
+    
+    def propagated_trim(self, trim: Dict, entry: StreamObject) -> List[bytes]:
+        """Trim options logged for a trim done with `trim`. An approximate trim only
+        drops whole chunks and replicas or a reload don't share the chunk layout,
+        so it's logged as the exact threshold it reached, like redis does"""
+        if "maxlen" in trim:
+            maxlen = len(entry) if trim["approx"] else trim["maxlen"]
+            return [b"MAXLEN", b"=", b"%d" % maxlen]
+        minid = trim["minid"]
+        # an emptied stream had nothing left at or above the threshold either
+        if trim["approx"] and entry.first_ids:
+            minid = entry.first_ids[0]
+        return [b"MINID", b"=", self.format_id(minid)]
+    
+    def format_id(self, id: StreamID) -> bytes:
+        return b"%d-%d" % id
+    
+    def format_entry(self, id: StreamID, fields: Tuple[bytes, ...]) -> List:
+        """[id, field-values], field-values are a map in RESP3 and a flat array in RESP2"""
+        if protocol.get() == 3:
+            return [self.format_id(id), dict(zip(fields[::2], fields[1::2]))]
+        return [self.format_id(id), list(fields)]
     
 
 class XAddCommand(RedisStreamCommandBase):
-    """Implementation of XADD command"""
+    """Implementation of XADD command:
+    XADD key [NOMKSTREAM] [MAXLEN|MINID [=|~] threshold [LIMIT count]] *|id field value [field value ...]
+    """
     
-    def validate_args(self, args: List[str]) -> bool:
-        return len(args) >= 4 and (len(args) - 2) % 2 == 0 # stream_key ID key value... + missing pairs
+    write = True
+    verbatim = False
     
-    def validate_ID(self, last_id: Optional[str], id: str) -> Optional[bytes]:
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 4
+    
+    def validate_ID(self, last_id: StreamID, id: StreamID) -> Optional[bytes]:
         def error(msg:str) -> bytes:
             return RESPSerializer.serialize_error(msg)
         
-        if not last_id and id == "0-0":
+        if id == (0, 0):
             return error("ERR The ID specified in XADD must be greater than 0-0")
         
-        ms, seq = map(int, id.split("-"))
-        
-        if last_id:
-            last_ms, last_seq = map(int, last_id.split("-"))
-            
-            if id == last_id:
-                return error("ERR The ID specified in XADD is equal or smaller than the target stream top item")
-            
-            if ms < last_ms or (ms == last_ms and seq <= last_seq):
-                return error("ERR The ID specified in XADD is equal or smaller than the target stream top item")
+        if id <= last_id:
+            return error("ERR The ID specified in XADD is equal or smaller than the target stream top item")
         
         return None
     
-    def generate_id(self, last_id: Optional[str], id: str) -> str:
-        ms, seq = id.split("-")
-
-        # Case 1: full auto (*-*)
-        if ms == "*" and seq == "*":
+    def generate_id(self, last_id: StreamID, id: bytes) -> StreamID:
+        # Case 1: full auto (*)
+        if id == b"*":
             unix_time_ms = int(time.time() * 1000)
-            # optional: check if last_id has same ms -> bump seq
-            return f"{unix_time_ms}-0"
+            # the clock may be behind the top item, keep IDs increasing
+            if unix_time_ms <= last_id[0]:
+                return (last_id[0], last_id[1] + 1)
+            return (unix_time_ms, 0)
+        
+        ms, _, seq = id.partition(b"-")
 
         # Case 2: partially specified (<ms>-*)
-        if seq == "*":
-            default_seq = 1 if ms == "0" else 0
-
-            if last_id:
-                last_ms, last_seq = last_id.split("-")
-                if last_ms == ms:
-                    return f"{ms}-{int(last_seq) + 1}"
-
-            return f"{ms}-{default_seq}"
+        if seq == b"*":
+            try:
+                ms = int(ms)
+            except ValueError:
+                raise InvalidStreamID("ERR Invalid stream ID specified as stream command argument")
+            if ms == last_id[0]:
+                return (ms, last_id[1] + 1)
+            return (ms, 1 if ms == 0 else 0)
 
         # Case 3: explicit ID
-        return id
+        return self.parse_id(id, is_start=True)
             
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'xadd' command"
             )
         
-        key, id, pairs = args[0], args[1], args[2:]
+        key = args[0]
+        nomkstream, trim = False, None
+        options = []
+        i = 1
+        while i < len(args):
+            option = args[i].upper()
+            if option == b"NOMKSTREAM":
+                nomkstream = True
+                options.append(b"NOMKSTREAM")
+                i += 1
+            elif option in (b"MAXLEN", b"MINID") and trim is None:
+                try:
+                    trim, i = self.parse_trim(args, i)
+                except ValueError as e:
+                    return RESPSerializer.serialize_error(str(e))
+            else:
+                break
         
-        entry = self.db.get(key)
+        id, pairs = args[i] if i < len(args) else b"", args[i + 1:]
+        if not pairs or len(pairs) % 2:
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xadd' command"
+            )
         
-        if not entry:
-            self.db[key] = {
-                "value": OrderedDict(),
-                "type": "stream",
-                "last_id": None
-            }
-            entry = self.db[key]
+        entry = self.db.get(key)
         
-        if not self.ensure_stream_type(entry):
+        if entry is not None and not self.ensure_stream_type(entry):
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        generated_id = self.generate_id(last_id = entry["last_id"], id = id)
-        error = self.validate_ID(last_id = entry["last_id"], id = generated_id)
+        if entry is None and nomkstream:
+            return RESPSerializer.serialize_bulk_string(None)
+        
+        last_id = entry.last_id if entry is not None else (0, 0)
+        try:
+            generated_id = self.generate_id(last_id=last_id, id=id)
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
+        error = self.validate_ID(last_id=last_id, id=generated_id)
         if error:
             return error
-                
-        fields = {
-            pairs[i]: pairs[i + 1]
-            for i in range(0, len(pairs), 2)
-        }
-        entry["value"][generated_id] = fields
-        entry["last_id"] = generated_id
         
-        generated_tuple = self.parse_id(generated_id)
-        for _, values in self.waiting_clients.items():
-            if key in values["streams"] and generated_tuple >= values["streams"][key]:
-                values["event"].set()
+        if entry is None:
+            entry = self.db[key] = StreamObject()
+        entry.append(generated_id, tuple(pairs))
+        if trim is not None:
+            entry.trim(**trim)
+            options += self.propagated_trim(trim, entry)
         
-        return RESPSerializer.serialize_bulk_string(generated_id)
+        self.signal_stream(key, generated_id)
+        # `*` IDs are logged as the ID they resolved to
+        propagate(b"XADD", key, *options, self.format_id(generated_id), *pairs)
+        
+        return RESPSerializer.serialize_bulk_string(self.format_id(generated_id))
 
 
-class XRangeCommand(RedisStreamCommandBase):
-    """Implementation of XRANGE command"""
+class XTrimCommand(RedisStreamCommandBase):
+    """Implementation of XTRIM command: XTRIM key MAXLEN|MINID [=|~] threshold [LIMIT count]"""
     
-    def validate_args(self, args: List[str]) -> bool:
-        return len(args) == 3
+    write = True
+    verbatim = False
     
-    def execute(self, args: List[str]) -> bytes:
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
-                "ERR wrong number of arguments for 'xrange' command"
+                "ERR wrong number of arguments for 'xtrim' command"
             )
         
-        key, start, stop = args
+        key = args[0]
+        if args[1].upper() not in (b"MAXLEN", b"MINID"):
+            return RESPSerializer.serialize_error("ERR syntax error")
+        try:
+            trim, i = self.parse_trim(args, 1)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        if i != len(args):
+            return RESPSerializer.serialize_error("ERR syntax error")
         
         entry = self.db.get(key)
         
-        if not entry:
-            return RESPSerializer.serialize_array([])
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
         
         if not self.ensure_stream_type(entry):
             return RESPSerializer.serialize_error(
                 "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
-        results = []
-        start_tuple, stop_tuple = self.parse_id(start, is_start=True), self.parse_id(stop, is_start=False)
+        removed = entry.trim(**trim)
+        if removed:
+            propagate(b"XTRIM", key, *self.propagated_trim(trim, entry))
+        return RESPSerializer.serialize_integer(removed)
+
+
+class XDelCommand(RedisStreamCommandBase):
+    """Implementation of XDEL command: XDEL key id [id ...]"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xdel' command"
+            )
         
-        for entry_id, field_values in entry["value"].items():
-            entry_tuple = self.parse_id(entry_id)
-            
-            if entry_tuple < start_tuple: 
-                continue
-            elif entry_tuple > stop_tuple:
-                break
-            
-            flat_fields = []
-            for f, v in field_values.items():
-                flat_fields.extend([f, v])
-            
-            results.append(
-                [entry_id, flat_fields]
+        key = args[0]
+        try:
+            ids = [self.parse_id(id, is_start=True) for id in args[1:]]
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_stream_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_integer(sum(entry.delete(id) for id in ids))
+
+
+class XLenCommand(RedisStreamCommandBase):
+    """Implementation of XLEN command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xlen' command"
+            )
+        
+        entry = self.db.get(args[0])
+        
+        if entry is None:
+            return RESPSerializer.serialize_integer(0)
+        
+        if not self.ensure_stream_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        
+        return RESPSerializer.serialize_integer(len(entry))
+
+
+class XRangeCommand(RedisStreamCommandBase):
+    """Implementation of XRANGE command: XRANGE key start end [COUNT count]"""
+    
+    name = "xrange"
+    reverse = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) in (3, 5)
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key = args[0]
+        # XREVRANGE takes the end of the range first
+        start, stop = (args[2], args[1]) if self.reverse else (args[1], args[2])
+        
+        count = None
+        if len(args) == 5:
+            if args[3].upper() != b"COUNT":
+                return RESPSerializer.serialize_error("ERR syntax error")
+            try:
+                count = max(int(args[4]), 0)
+            except ValueError:
+                return RESPSerializer.serialize_error(
+                    "ERR value is not an integer or out of range"
+                )
+        
+        try:
+            start_tuple, stop_tuple = self.parse_range_id(start, is_start=True), self.parse_range_id(stop, is_start=False)
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        entry = self.db.get(key)
+        
+        if entry is None or count == 0:
+            return RESPSerializer.serialize_array([])
+        
+        if not self.ensure_stream_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
             )
         
+        entries = entry.revrange(stop_tuple, start_tuple) if self.reverse else entry.range(start_tuple, stop_tuple)
+        # islice stops pulling from the stream once COUNT entries were read
+        results = [
+            self.format_entry(entry_id, fields)
+            for entry_id, fields in islice(entries, count)
+        ]
         return RESPSerializer.serialize_array(results)
 
 
+class XRevRangeCommand(XRangeCommand):
+    """Implementation of XREVRANGE command: XREVRANGE key end start [COUNT count]"""
+    
+    name = "xrevrange"
+    reverse = True
+
+
 class XreadStreamsCommand(RedisStreamCommandBase):
-    """Implementation of XREAD STREAMS command (non-blocking)"""
+    """Implementation of XREAD command: XREAD [COUNT count] [BLOCK milliseconds] STREAMS key... id..."""
     
-    def validate_args(self, args: List[str]) -> bool:
+    def validate_args(self, args: List[bytes]) -> bool:
         # Must have at least "STREAMS" + one stream + one ID
         return len(args) >= 3 and (len(args) % 2) == 1
     
-    def get_stream_entries(self, entry: Dict, start_id: str) -> List:
-        """Return list of [entry_id, flat_fields] for entries >= start_id"""
-        start_tuple = self.parse_id(start_id)
-        results = []
+    def parse_options(
+        self, args: List[bytes], flags: Tuple[bytes, ...] = ()
+    ) -> Tuple[Optional[int], Optional[int], List[bytes], set]:
+        """Split the options before STREAMS from the keys and IDs, `flags` are
+        options without a value (NOACK).
 
-        for entry_id, field_values in entry["value"].items():
-            if self.parse_id(entry_id) >= start_tuple:
-                flat_fields = [item for pair in field_values.items() for item in pair]
-                results.append([entry_id, flat_fields])
-        
-        return results
+        Returns:
+            (count, block timeout in ms, [keys..., ids...], flags given), count and
+            timeout are None when not given
+        """
+        count, timeout, given = None, None, set()
+        i = 0
+        while i < len(args):
+            option = args[i].upper()
+            if option == b"STREAMS":
+                return count, timeout, args[i + 1:], given
+            if option in (b"COUNT", b"BLOCK") and i + 1 < len(args):
+                try:
+                    value = int(args[i + 1])
+                except ValueError:
+                    raise ValueError("ERR value is not an integer or out of range")
+                if option == b"COUNT":
+                    # COUNT 0 or less reads everything, like no COUNT at all
+                    count = value if value > 0 else None
+                else:
+                    if value < 0:
+                        raise ValueError("ERR timeout is negative")
+                    timeout = value
+                i += 2
+            elif option in flags:
+                given.add(option)
+                i += 1
+            else:
+                raise ValueError("ERR syntax error")
+        raise ValueError("ERR syntax error")
     
-    def get_multi_stream_results(self, stream_keys: List[str], start_ids: List[str]) -> List[List]:
+    def parse_read_id(self, key: bytes, id: bytes) -> StreamID:
+        """`$` stands for the last ID of the stream at the time of the call"""
+        if id == b"$":
+            entry = self.db.get(key)
+            return entry.last_id if type_of(entry) == OBJ_STREAM else (0, 0)
+        return self.parse_id(id, is_start=True)
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        try:
+            _, _, streams_and_ids, _ = self.parse_options(args)
+        except ValueError:
+            return []
+        return streams_and_ids[:len(streams_and_ids) // 2]
+    
+    def get_stream_entries(self, entry: StreamObject, start_id: StreamID, count: Optional[int] = None) -> List:
+        """Return up to `count` [entry_id, field_values] for entries > start_id"""
+        entries = entry.range(start_id, (STREAM_ID_MAX, STREAM_ID_MAX), exclusive=True)
+        return [
+            self.format_entry(entry_id, fields)
+            for entry_id, fields in islice(entries, count)
+        ]
+    
+    def get_multi_stream_results(self, stream_keys: List[bytes], start_ids: List[StreamID], count: Optional[int] = None) -> List[List]:
+        """[key, entries] for every stream with new entries"""
         stream_results = []
         for stream_key, start_id in zip(stream_keys, start_ids):
             entry = self.db.get(stream_key)
 
-            if entry and not self.ensure_stream_type(entry):
+            if entry is not None and not self.ensure_stream_type(entry):
                 raise TypeError(
                     "WRONGTYPE Operation against a key holding the wrong kind of value"
                 )
 
-            entries = self.get_stream_entries(entry, start_id) if entry else []
+            entries = self.get_stream_entries(entry, start_id, count) if entry is not None else []
             stream_results.append([stream_key, entries])
         
         return stream_results
+    def serialize_streams(self, stream_results: List[List]) -> bytes:
+        """Replies key -> entries as a map in RESP3 and as [key, entries] pairs in RESP2"""
+        if protocol.get() == 3:
+            return RESPSerializer.serialize_map(dict(stream_results))
+        return RESPSerializer.serialize_array(stream_results)
     
-    def execute(self, args: List[str]) -> bytes:
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
         if not self.validate_args(args):
             return RESPSerializer.serialize_error(
                 "ERR wrong number of arguments for 'xread streams' command"
             )
 
-        is_block = False
+        try:
+            count, timeout, streams_and_ids, _ = self.parse_options(args)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        is_block = timeout is not None
         
-        if args[0].upper() == "BLOCK":
-            is_block = True
-            timeout = int(args[1])
-            streams_and_ids = args[3:]
-        else:
-            _, *streams_and_ids = args
+        if not streams_and_ids or len(streams_and_ids) % 2:
+            return RESPSerializer.serialize_error(
+                "ERR Unbalanced 'xread' list of streams: for each stream key an ID or '$' must be specified."
+            )
         
         mid = len(streams_and_ids) // 2
         stream_keys = streams_and_ids[:mid]
-        start_ids = streams_and_ids[mid:]
+        try:
+            start_ids = [self.parse_read_id(key, sid) for key, sid in zip(stream_keys, streams_and_ids[mid:])]
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
 
         try:
-            stream_results = self.get_multi_stream_results(stream_keys, start_ids)
+            stream_results = self.get_multi_stream_results(stream_keys, start_ids, count)
             if is_block is False or any(len(entries) > 0 for _, entries in stream_results):
-                return RESPSerializer.serialize_array(stream_results)
+                return self.serialize_streams(stream_results)
         except TypeError as e:
             return RESPSerializer.serialize_error(str(e))
         
-        # `$` id not implemented yet
-        waiter = {
-            "event": Event(), 
-            "streams": {
-                k: self.parse_id(sid) 
-                for k, sid in zip(stream_keys, start_ids)
-            }
-        }
-        client_id = str(uuid.uuid4())
-        self.waiting_clients[client_id] = waiter
+        thresholds = dict(zip(stream_keys, start_ids))
+        
+        def on_wake() -> bytes:
+            self.unblock(waiter, thresholds, seq)
+            try:
+                stream_results = self.get_multi_stream_results(stream_keys, start_ids, count)
+                return self.serialize_streams(stream_results)
+            except TypeError as e:
+                return RESPSerializer.serialize_error(str(e))
+        
+        def on_timeout() -> bytes:
+            self.unblock(waiter, thresholds, seq)
+            return RESPSerializer.serialize_null_array()
+        
+        waiter = Waiter(
+            None if timeout == 0 else timeout / 1000,  # assuming ms -> sec
+            on_wake=on_wake,
+            on_timeout=on_timeout,
+        )
+        seq = self.block(waiter, thresholds)
+        return waiter
+
+
+class RedisStreamGroupCommandBase(RedisStreamCommandBase):
+    """Base class for consumer group commands"""
+    
+    def nogroup_error(self, key: bytes, group: bytes, command: str = "") -> bytes:
+        return RESPSerializer.serialize_error(
+            "NOGROUP No such key '%s' or consumer group '%s'%s" % (
+                key.decode(errors="replace"), group.decode(errors="replace"), command
+            )
+        )
+    
+    def get_group(self, key: bytes, group_name: bytes) -> Tuple[Optional[StreamObject], Optional[ConsumerGroup]]:
+        """(stream, group), either is None when missing; raises TypeError for non-stream keys"""
+        entry = self.db.get(key)
+        if entry is None:
+            return None, None
+        if not self.ensure_stream_type(entry):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        group = entry.groups.get(group_name) if entry.groups else None
+        return entry, group
+    
+    def get_consumer(self, key: bytes, group: ConsumerGroup, name: bytes, now: int) -> Consumer:
+        """Look up a consumer for a claim, logging its creation"""
+        if name not in group.consumers:
+            propagate(b"XGROUP", b"CREATECONSUMER", key, group.name, name)
+        return group.consumer(name, now)
+    
+    def propagate_claim(self, key: bytes, group: ConsumerGroup, consumer: Consumer, id: StreamID, pending: PendingEntry):
+        """Log a claim as an XCLAIM forcing its outcome, so replaying it doesn't depend
+        on idle times measured against the clock"""
+        propagate(
+            b"XCLAIM", key, group.name, consumer.name, b"0", self.format_id(id),
+            b"TIME", b"%d" % pending.delivery_time, b"RETRYCOUNT", b"%d" % pending.delivery_count, b"FORCE", b"JUSTID",
+        )
+    
+    def parse_group_id(self, entry: StreamObject, id: bytes) -> StreamID:
+        """Group start IDs also accept `$`, the last ID of the stream"""
+        if id == b"$":
+            return entry.last_id
+        return self.parse_id(id, is_start=True)
+
+
+class XGroupCommand(RedisStreamGroupCommandBase):
+    """Implementation of XGROUP command: CREATE, SETID, DESTROY, CREATECONSUMER and DELCONSUMER"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[1:2]
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xgroup' command"
+            )
+        
+        subcommand, key, group_name = args[0].upper(), args[1], args[2]
+        options = args[3:]
+        
+        arity = {b"CREATE": (1, 4), b"SETID": (1, 3), b"DESTROY": (0, 0), b"CREATECONSUMER": (1, 1), b"DELCONSUMER": (1, 1)}
+        if subcommand not in arity:
+            return RESPSerializer.serialize_error(
+                f"ERR unknown subcommand '{args[0].decode(errors='replace')}'. Try XGROUP HELP."
+            )
+        min_args, max_args = arity[subcommand]
+        if not min_args <= len(options) <= max_args:
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for 'xgroup|{subcommand.decode().lower()}' command"
+            )
+        
+        try:
+            entry, group = self.get_group(key, group_name)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        if subcommand == b"CREATE":
+            # ENTRIESREAD is accepted for compatibility, lag isn't tracked
+            flags = [option.upper() for option in options[1:]]
+            if flags not in ([], [b"MKSTREAM"]) and not (
+                len(flags) >= 2 and flags[-2] == b"ENTRIESREAD" and flags[:-2] in ([], [b"MKSTREAM"])
+            ):
+                return RESPSerializer.serialize_error("ERR syntax error")
+            if entry is None:
+                if b"MKSTREAM" not in flags:
+                    return RESPSerializer.serialize_error(
+                        "ERR The XGROUP subcommand requires the key to exist. "
+                        "Note that for CREATE you may want to use the MKSTREAM option to create an empty stream automatically."
+                    )
+                entry = self.db[key] = StreamObject()
+            if group is not None:
+                return RESPSerializer.serialize_error("BUSYGROUP Consumer Group name already exists")
+            try:
+                last_id = self.parse_group_id(entry, options[0])
+            except InvalidStreamID as e:
+                return RESPSerializer.serialize_error(str(e))
+            if entry.groups is None:
+                entry.groups = {}
+            entry.groups[group_name] = ConsumerGroup(group_name, last_id)
+            return RESPSerializer.serialize_simple_string("OK")
+        
+        if group is None:
+            return self.nogroup_error(key, group_name)
+        
+        if subcommand == b"SETID":
+            try:
+                group.last_id = self.parse_group_id(entry, options[0])
+            except InvalidStreamID as e:
+                return RESPSerializer.serialize_error(str(e))
+            return RESPSerializer.serialize_simple_string("OK")
+        
+        if subcommand == b"DESTROY":
+            del entry.groups[group_name]
+            return RESPSerializer.serialize_integer(1)
+        
+        if subcommand == b"CREATECONSUMER":
+            created = options[0] not in group.consumers
+            group.consumer(options[0], int(now_ms()))
+            return RESPSerializer.serialize_integer(int(created))
+        
+        # DELCONSUMER
+        return RESPSerializer.serialize_integer(group.delete_consumer(options[0]))
+
+
+class XReadGroupCommand(XreadStreamsCommand, RedisStreamGroupCommandBase):
+    """Implementation of XREADGROUP command:
+    XREADGROUP GROUP group consumer [COUNT count] [BLOCK milliseconds] [NOACK] STREAMS key... id...
+    
+    `>` reads entries never delivered to the group and adds them to the PEL,
+    any other ID re-reads the consumer's own pending entries after it.
+    """
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 6
+    
+    def parse_options(
+        self, args: List[bytes], flags: Tuple[bytes, ...] = (b"NOACK",)
+    ) -> Tuple[Optional[int], Optional[int], List[bytes], set]:
+        if len(args) < 3 or args[0].upper() != b"GROUP":
+            raise ValueError("ERR syntax error")
+        return super().parse_options(args[3:], flags)
+    
+    def read_group(
+        self, entry: StreamObject, group: ConsumerGroup, consumer: Consumer,
+        start: Optional[StreamID], count: Optional[int], noack: bool, now: int
+    ) -> List:
+        """Entries for one stream, `start` None stands for `>`"""
+        results = []
+        if start is None:
+            entries = entry.range(group.last_id, (STREAM_ID_MAX, STREAM_ID_MAX), exclusive=True)
+            for entry_id, fields in islice(entries, count):
+                group.last_id = entry_id
+                if not noack:
+                    pending = group.pel.get(entry_id)
+                    if pending is None:
+                        group.add_pending(entry_id, consumer, now)
+                    else:
+                        # redelivered after XGROUP SETID moved the group backwards
+                        group.claim(entry_id, pending, consumer)
+                        pending.delivery_time = now
+                        pending.delivery_count += 1
+                results.append(self.format_entry(entry_id, fields))
+            if results:
+                consumer.active_time = now
+            return results
+        
+        for entry_id, pending in group.pending_range(start, (STREAM_ID_MAX, STREAM_ID_MAX)):
+            if count is not None and len(results) >= count:
+                break
+            if entry_id == start or pending.consumer is not consumer:
+                continue
+            pending.delivery_time = now
+            pending.delivery_count += 1
+            fields = entry.get(entry_id)
+            # entries deleted from the stream are still reported, without fields
+            results.append(self.format_entry(entry_id, fields) if fields is not None else [self.format_id(entry_id), None])
+        return results
+    
+    def execute(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xreadgroup' command"
+            )
+        
+        try:
+            count, timeout, streams_and_ids, given = self.parse_options(args)
+        except ValueError as e:
+            return RESPSerializer.serialize_error(str(e))
+        group_name, consumer_name, noack = args[1], args[2], b"NOACK" in given
+        
+        if not streams_and_ids or len(streams_and_ids) % 2:
+            return RESPSerializer.serialize_error(
+                "ERR Unbalanced 'xreadgroup' list of streams: for each stream key an ID or '>' must be specified."
+            )
+        
+        mid = len(streams_and_ids) // 2
+        stream_keys = streams_and_ids[:mid]
+        try:
+            start_ids = [None if sid == b">" else self.parse_id(sid, is_start=True) for sid in streams_and_ids[mid:]]
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        def read() -> Union[bytes, List[List]]:
+            """[key, entries] per stream, or an error reply"""
+            now = int(now_ms())
+            targets = []
+            for key in stream_keys:
+                try:
+                    entry, group = self.get_group(key, group_name)
+                except TypeError as e:
+                    return RESPSerializer.serialize_error(str(e))
+                if group is None:
+                    return self.nogroup_error(key, group_name, " in XREADGROUP with GROUP option")
+                targets.append((entry, group))
+            
+            stream_results = []
+            for key, start, (entry, group) in zip(stream_keys, start_ids, targets):
+                consumer = group.consumer(consumer_name, now)
+                entries = self.read_group(entry, group, consumer, start, count, noack, now)
+                # streams read with `>` are left out when there is nothing new
+                if entries or start is not None:
+                    stream_results.append([key, entries])
+            return stream_results
+        
+        stream_results = read()
+        if isinstance(stream_results, bytes):
+            return stream_results
+        if stream_results or timeout is None or any(start is not None for start in start_ids):
+            return self.serialize_streams(stream_results) if stream_results else RESPSerializer.serialize_null_array()
+        
+        thresholds = {key: self.db[key].groups[group_name].last_id for key in stream_keys}
+        
+        def on_wake() -> bytes:
+            self.unblock(waiter, thresholds, seq)
+            stream_results = read()
+            if isinstance(stream_results, bytes):
+                return stream_results
+            # the read happens now, after the command itself was executed
+            propagate(b"XREADGROUP", *args)
+            return self.serialize_streams(stream_results) if stream_results else RESPSerializer.serialize_null_array()
+        
+        def on_timeout() -> bytes:
+            self.unblock(waiter, thresholds, seq)
+            return RESPSerializer.serialize_null_array()
+        
+        waiter = Waiter(
+            None if timeout == 0 else timeout / 1000,
+            on_wake=on_wake,
+            on_timeout=on_timeout,
+        )
+        seq = self.block(waiter, thresholds)
+        return waiter
+
+
+class XAckCommand(RedisStreamGroupCommandBase):
+    """Implementation of XACK command: XACK key group id..."""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xack' command"
+            )
+        
+        key, group_name = args[0], args[1]
+        try:
+            ids = [self.parse_id(id, is_start=True) for id in args[2:]]
+            _, group = self.get_group(key, group_name)
+        except (InvalidStreamID, TypeError) as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        if group is None:
+            return RESPSerializer.serialize_integer(0)
+        return RESPSerializer.serialize_integer(sum(group.ack(id) for id in ids))
+
+
+class XPendingCommand(RedisStreamGroupCommandBase):
+    """Implementation of XPENDING command: XPENDING key group [[IDLE min-idle-time] start end count [consumer]]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xpending' command"
+            )
+        
+        key, group_name, options = args[0], args[1], args[2:]
+        
+        min_idle = None
+        if options and options[0].upper() == b"IDLE":
+            if len(options) < 2:
+                return RESPSerializer.serialize_error("ERR syntax error")
+            try:
+                min_idle = int(options[1])
+            except ValueError:
+                return RESPSerializer.serialize_error(
+                    "ERR value is not an integer or out of range"
+                )
+            options = options[2:]
+            if not options:
+                return RESPSerializer.serialize_error("ERR syntax error")
+        if len(options) not in (0, 3, 4):
+            return RESPSerializer.serialize_error("ERR syntax error")
+        
+        try:
+            _, group = self.get_group(key, group_name)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        if group is None:
+            return self.nogroup_error(key, group_name)
+        
+        if not options:
+            # summary form: count, smallest and greatest ID, pending per consumer
+            if not group.pel:
+                return RESPSerializer.serialize_array([0, None, None, None])
+            ids = list(id for id, _ in group.pending_range((0, 0), (STREAM_ID_MAX, STREAM_ID_MAX)))
+            consumers = [
+                [consumer.name, b"%d" % len(consumer.pending)]
+                for consumer in group.consumers.values()
+                if consumer.pending
+            ]
+            return RESPSerializer.serialize_array([
+                len(group.pel), self.format_id(ids[0]), self.format_id(ids[-1]), consumers
+            ])
+        
+        try:
+            start = self.parse_range_id(options[0], is_start=True)
+            end = self.parse_range_id(options[1], is_start=False)
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
+        try:
+            count = int(options[2])
+        except ValueError:
+            return RESPSerializer.serialize_error(
+                "ERR value is not an integer or out of range"
+            )
+        consumer_name = options[3] if len(options) == 4 else None
+        
+        now = int(now_ms())
+        results = []
+        for entry_id, pending in group.pending_range(start, end):
+            if len(results) >= count:
+                break
+            idle = now - pending.delivery_time
+            if consumer_name is not None and pending.consumer.name != consumer_name:
+                continue
+            if min_idle is not None and idle < min_idle:
+                continue
+            results.append([self.format_id(entry_id), pending.consumer.name, idle, pending.delivery_count])
+        return RESPSerializer.serialize_array(results)
+
+
+class XClaimCommand(RedisStreamGroupCommandBase):
+    """Implementation of XCLAIM command:
+    XCLAIM key group consumer min-idle-time id... [IDLE ms] [TIME unix-time-ms] [RETRYCOUNT count] [FORCE] [JUSTID] [LASTID id]
+    """
+    
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 5
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xclaim' command"
+            )
+        
+        key, group_name, consumer_name = args[0], args[1], args[2]
+        try:
+            min_idle = int(args[3])
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR Invalid min-idle-time argument for XCLAIM")
         
-        timeout_sec = None if timeout == 0 else timeout / 1000  # assuming ms -> sec
-        waiter["event"].wait(timeout_sec)
-        del self.waiting_clients[client_id]
+        # IDs come first, the options start at the first argument that isn't one
+        ids, i = [], 4
+        while i < len(args):
+            try:
+                ids.append(self.parse_id(args[i], is_start=True))
+            except InvalidStreamID:
+                if i == 4:
+                    return RESPSerializer.serialize_error(
+                        "ERR Invalid stream ID specified as stream command argument"
+                    )
+                break
+            i += 1
+        
+        now = int(now_ms())
+        delivery_time, retry_count, force, justid, last_id = now, None, False, False, None
+        while i < len(args):
+            option = args[i].upper()
+            if option in (b"IDLE", b"TIME", b"RETRYCOUNT", b"LASTID") and i + 1 < len(args):
+                try:
+                    if option == b"LASTID":
+                        last_id = self.parse_id(args[i + 1], is_start=True)
+                    else:
+                        value = int(args[i + 1])
+                except (ValueError, InvalidStreamID) as e:
+                    return RESPSerializer.serialize_error(
+                        str(e) if isinstance(e, InvalidStreamID) else "ERR value is not an integer or out of range"
+                    )
+                if option == b"IDLE":
+                    delivery_time = now - value
+                elif option == b"TIME":
+                    delivery_time = value
+                elif option == b"RETRYCOUNT":
+                    retry_count = value
+                i += 2
+            elif option == b"FORCE":
+                force = True
+                i += 1
+            elif option == b"JUSTID":
+                justid = True
+                i += 1
+            else:
+                return RESPSerializer.serialize_error(
+                    f"ERR Unrecognized XCLAIM option '{args[i].decode(errors='replace')}'"
+                )
         
         try:
-            stream_results = self.get_multi_stream_results(stream_keys, start_ids)
-            return RESPSerializer.serialize_array(stream_results)
+            entry, group = self.get_group(key, group_name)
         except TypeError as e:
             return RESPSerializer.serialize_error(str(e))
+        if group is None:
+            return self.nogroup_error(key, group_name)
+        
+        if last_id is not None and last_id > group.last_id:
+            group.last_id = last_id
+            propagate(b"XGROUP", b"SETID", key, group_name, self.format_id(last_id))
+        
+        consumer = self.get_consumer(key, group, consumer_name, now)
+        results = []
+        for entry_id in ids:
+            fields = entry.get(entry_id)
+            pending = group.pel.get(entry_id)
+            if pending is None:
+                if not force or fields is None:
+                    continue
+                pending = group.add_pending(entry_id, consumer, now)
+                pending.delivery_count = 0
+            elif fields is None:
+                # the entry was deleted from the stream, drop it from the PEL too
+                group.ack(entry_id)
+                propagate(b"XACK", key, group_name, self.format_id(entry_id))
+                continue
+            elif min_idle and now - pending.delivery_time < min_idle:
+                continue
+            else:
+                group.claim(entry_id, pending, consumer)
+            
+            pending.delivery_time = delivery_time
+            if retry_count is not None:
+                pending.delivery_count = retry_count
+            elif not justid:
+                pending.delivery_count += 1
+            consumer.active_time = now
+            self.propagate_claim(key, group, consumer, entry_id, pending)
+            results.append(self.format_id(entry_id) if justid else self.format_entry(entry_id, fields))
+        
+        return RESPSerializer.serialize_array(results)
+
+
+class XAutoClaimCommand(RedisStreamGroupCommandBase):
+    """Implementation of XAUTOCLAIM command: XAUTOCLAIM key group consumer min-idle-time start [COUNT count] [JUSTID]"""
+    
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 5
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xautoclaim' command"
+            )
+        
+        key, group_name, consumer_name = args[0], args[1], args[2]
+        try:
+            min_idle = int(args[3])
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR Invalid min-idle-time argument for XAUTOCLAIM")
+        try:
+            start = self.parse_range_id(args[4], is_start=True)
+        except InvalidStreamID as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        count, justid = 100, False
+        i = 5
+        while i < len(args):
+            option = args[i].upper()
+            if option == b"COUNT" and i + 1 < len(args):
+                try:
+                    count = int(args[i + 1])
+                except ValueError:
+                    count = 0
+                if count < 1:
+                    return RESPSerializer.serialize_error("ERR COUNT must be > 0")
+                i += 2
+            elif option == b"JUSTID":
+                justid = True
+                i += 1
+            else:
+                return RESPSerializer.serialize_error("ERR syntax error")
+        
+        try:
+            entry, group = self.get_group(key, group_name)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        if group is None:
+            return self.nogroup_error(key, group_name)
+        
+        now = int(now_ms())
+        consumer = self.get_consumer(key, group, consumer_name, now)
+        claimed, deleted = [], []
+        next_id = (0, 0)
+        for entry_id, pending in group.pending_range(start, (STREAM_ID_MAX, STREAM_ID_MAX)):
+            if len(claimed) + len(deleted) >= count:
+                # cursor for the next call
+                next_id = entry_id
+                break
+            if now - pending.delivery_time < min_idle:
+                continue
+            fields = entry.get(entry_id)
+            if fields is None:
+                group.ack(entry_id)
+                propagate(b"XACK", key, group_name, self.format_id(entry_id))
+                deleted.append(self.format_id(entry_id))
+                continue
+            group.claim(entry_id, pending, consumer)
+            pending.delivery_time = now
+            if not justid:
+                pending.delivery_count += 1
+            consumer.active_time = now
+            self.propagate_claim(key, group, consumer, entry_id, pending)
+            claimed.append(self.format_id(entry_id) if justid else self.format_entry(entry_id, fields))
+        
+        return RESPSerializer.serialize_array([self.format_id(next_id), claimed, deleted])
+
+
+class XInfoCommand(RedisStreamGroupCommandBase):
+    """Implementation of XINFO command: XINFO STREAM key | GROUPS key | CONSUMERS key group"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[1:2]
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'xinfo' command"
+            )
+        
+        subcommand, key = args[0].upper(), args[1]
+        if subcommand not in (b"STREAM", b"GROUPS", b"CONSUMERS"):
+            return RESPSerializer.serialize_error(
+                f"ERR unknown subcommand '{args[0].decode(errors='replace')}'. Try XINFO HELP."
+            )
+        if len(args) != (3 if subcommand == b"CONSUMERS" else 2):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for 'xinfo|{subcommand.decode().lower()}' command"
+            )
+        
+        entry = self.db.get(key)
+        if entry is None:
+            return RESPSerializer.serialize_error("ERR no such key")
+        if not self.ensure_stream_type(entry):
+            return RESPSerializer.serialize_error(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        groups = entry.groups or {}
+        
+        if subcommand == b"STREAM":
+            first, last = entry.first(), entry.last()
+            return RESPSerializer.serialize_map({
+                "length": len(entry),
+                "radix-tree-keys": len(entry.chunks),
+                "radix-tree-nodes": len(entry.chunks),
+                "last-generated-id": self.format_id(entry.last_id),
+                "groups": len(groups),
+                "first-entry": self.format_entry(*first) if first else None,
+                "last-entry": self.format_entry(*last) if last else None,
+            })
+        
+        if subcommand == b"GROUPS":
+            return RESPSerializer.serialize_array([
+                {
+                    "name": group.name,
+                    "consumers": len(group.consumers),
+                    "pending": len(group.pel),
+                    "last-delivered-id": self.format_id(group.last_id),
+                }
+                for group in groups.values()
+            ])
+        
+        group = groups.get(args[2])
+        if group is None:
+            return self.nogroup_error(key, args[2])
+        now = int(now_ms())
+        return RESPSerializer.serialize_array([
+            {
+                "name": consumer.name,
+                "pending": len(consumer.pending),
+                "idle": now - consumer.seen_time,
+                "inactive": now - consumer.active_time if consumer.active_time != -1 else -1,
+            }
+            for consumer in group.consumers.values()
+        ])
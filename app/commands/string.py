@@ -0,0 +1,434 @@
+from .base import EXPIRE_OPTIONS, RedisCommand, parse_deadline, propagate
+from typing import List, Optional, Union
+from app.keyspace import Keyspace
+from app.parser import RESPSerializer
+from app.objects import INT64_MAX, INT64_MIN, OBJ_STRING, as_int64, encode_string, share_int, string_bytes, type_of
+
+# like redis' proto-max-bulk-len, the largest string SETRANGE/APPEND may build
+MAX_STRING_LENGTH = 512 * 1024 * 1024
+
+class RedisStringCommandBase(RedisCommand):
+    """Base class with common functionality for string commands"""
+    
+    def __init__(self, db: Keyspace):
+        self.db = db
+    
+    def get_string(self, key: bytes) -> Optional[Union[bytes, int]]:
+        """String stored at `key` in its keyspace encoding, None if missing.
+
+        Raises:
+            TypeError: the key holds another type
+        """
+        entry = self.db.get(key)
+        if entry is not None and type_of(entry) != OBJ_STRING:
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return entry
+
+
+class IncrByCommand(RedisStringCommandBase):
+    """Implementation of INCRBY command: INCRBY key increment"""
+    
+    name = "incrby"
+    write = True
+    # INCR/DECR take no increment argument
+    step: Optional[int] = None
+    sign = 1
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == (1 if self.step is not None else 2)
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        key = args[0]
+        
+        if self.step is not None:
+            increment = self.step
+        else:
+            increment = as_int64(args[1])
+            if increment is None:
+                return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+            increment *= self.sign
+        
+        try:
+            entry = self.get_string(key)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        # ints are the common case, only raw strings need parsing
+        value = entry if isinstance(entry, int) else 0 if entry is None else as_int64(entry)
+        if value is None:
+            return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+        
+        value += increment
+        if not INT64_MIN <= value <= INT64_MAX:
+            return RESPSerializer.serialize_error("ERR increment or decrement would overflow")
+        
+        if entry is None:
+            self.db[key] = share_int(value)
+        else:
+            self.db.replace(key, share_int(value))
+        return RESPSerializer.serialize_integer(value)
+
+
+class IncrCommand(IncrByCommand):
+    """Implementation of INCR command"""
+    
+    name = "incr"
+    step = 1
+
+
+class DecrCommand(IncrByCommand):
+    """Implementation of DECR command"""
+    
+    name = "decr"
+    step = -1
+
+
+class DecrByCommand(IncrByCommand):
+    """Implementation of DECRBY command: DECRBY key decrement"""
+    
+    name = "decrby"
+    sign = -1
+
+
+class IncrByFloatCommand(RedisStringCommandBase):
+    """Implementation of INCRBYFLOAT command: INCRBYFLOAT key increment"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def parse_float(self, raw: Union[bytes, int]) -> float:
+        if isinstance(raw, int):
+            return float(raw)
+        try:
+            value = float(raw)
+        except ValueError:
+            raise ValueError("ERR value is not a valid float")
+        if value != value or b"_" in raw or raw != raw.strip():
+            raise ValueError("ERR value is not a valid float")
+        return value
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'incrbyfloat' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            entry = self.get_string(key)
+            increment = self.parse_float(args[1])
+            value = self.parse_float(entry) if entry is not None else 0.0
+        except (TypeError, ValueError) as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        value += increment
+        if value != value or value in (float("inf"), float("-inf")):
+            return RESPSerializer.serialize_error("ERR increment would produce NaN or Infinity")
+        
+        text = RESPSerializer.format_double(value)
+        if entry is None:
+            self.db[key] = encode_string(text)
+        else:
+            self.db.replace(key, encode_string(text))
+        return RESPSerializer.serialize_bulk_string(text)
+
+
+class AppendCommand(RedisStringCommandBase):
+    """Implementation of APPEND command: APPEND key value"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'append' command"
+            )
+        
+        key, suffix = args[0], args[1]
+        
+        try:
+            entry = self.get_string(key)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        if entry is None:
+            self.db[key] = encode_string(suffix)
+            return RESPSerializer.serialize_integer(len(suffix))
+        
+        value = string_bytes(entry)
+        if len(value) + len(suffix) > MAX_STRING_LENGTH:
+            return RESPSerializer.serialize_error("ERR string exceeds maximum allowed size (proto-max-bulk-len)")
+        value += suffix
+        self.db.replace(key, value)
+        return RESPSerializer.serialize_integer(len(value))
+
+
+class GetRangeCommand(RedisStringCommandBase):
+    """Implementation of GETRANGE command: GETRANGE key start end"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'getrange' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            start, end = int(args[1]), int(args[2])
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+        
+        try:
+            entry = self.get_string(key)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        value = string_bytes(entry) if entry is not None else b""
+        length = len(value)
+        # inclusive, negative indexes count from the end
+        if start < 0 and end < 0 and start > end:
+            return RESPSerializer.serialize_bulk_string(b"")
+        if start < 0:
+            start = max(length + start, 0)
+        if end < 0:
+            end = max(length + end, 0)
+        end = min(end, length - 1)
+        if start > end or not length:
+            return RESPSerializer.serialize_bulk_string(b"")
+        return RESPSerializer.serialize_bulk_string(value[start:end + 1])
+
+
+class SetRangeCommand(RedisStringCommandBase):
+    """Implementation of SETRANGE command: SETRANGE key offset value"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'setrange' command"
+            )
+        
+        key, patch = args[0], args[2]
+        
+        try:
+            offset = int(args[1])
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+        if offset < 0:
+            return RESPSerializer.serialize_error("ERR offset is out of range")
+        
+        try:
+            entry = self.get_string(key)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        value = string_bytes(entry) if entry is not None else b""
+        if not patch:
+            return RESPSerializer.serialize_integer(len(value))
+        if offset + len(patch) > MAX_STRING_LENGTH:
+            return RESPSerializer.serialize_error("ERR string exceeds maximum allowed size (proto-max-bulk-len)")
+        
+        # the gap up to the offset is zero padded
+        value = value[:offset].ljust(offset, b"\x00") + patch + value[offset + len(patch):]
+        if entry is None:
+            self.db[key] = value
+        else:
+            self.db.replace(key, value)
+        return RESPSerializer.serialize_integer(len(value))
+
+
+class StrLenCommand(RedisStringCommandBase):
+    """Implementation of STRLEN command"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'strlen' command"
+            )
+        
+        try:
+            entry = self.get_string(args[0])
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        return RESPSerializer.serialize_integer(len(string_bytes(entry)) if entry is not None else 0)
+
+
+class GetDelCommand(RedisStringCommandBase):
+    """Implementation of GETDEL command"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 1
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'getdel' command"
+            )
+        
+        key = args[0]
+        
+        try:
+            entry = self.get_string(key)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None)
+        
+        del self.db[key]
+        return RESPSerializer.serialize_bulk_string(string_bytes(entry))
+
+
+class GetExCommand(RedisStringCommandBase):
+    """Implementation of GETEX command: GETEX key [EX s | PX ms | EXAT ts | PXAT ts-ms | PERSIST]"""
+    
+    write = True
+    verbatim = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return 1 <= len(args) <= 3
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'getex' command"
+            )
+        
+        key, options = args[0], args[1:]
+        
+        expiry, persist = None, False
+        option = options[0].upper() if options else None
+        if option in EXPIRE_OPTIONS and len(options) == 2:
+            try:
+                expiry = parse_deadline(options[1], *EXPIRE_OPTIONS[option], "getex", positive=True)
+            except ValueError as e:
+                return RESPSerializer.serialize_error(str(e))
+        elif option == b"PERSIST" and len(options) == 1:
+            persist = True
+        elif options:
+            return RESPSerializer.serialize_error("ERR syntax error")
+        
+        try:
+            entry = self.get_string(key)
+        except TypeError as e:
+            return RESPSerializer.serialize_error(str(e))
+        
+        if entry is None:
+            return RESPSerializer.serialize_bulk_string(None)
+        
+        if expiry is not None:
+            self.db.set_expiry(key, expiry)
+            propagate(b"PEXPIREAT", key, b"%d" % expiry)
+        elif persist:
+            self.db.persist(key)
+            propagate(b"PERSIST", key)
+        return RESPSerializer.serialize_bulk_string(string_bytes(entry))
+
+
+class SetNxCommand(RedisStringCommandBase):
+    """Implementation of SETNX command"""
+    
+    write = True
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) == 2
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'setnx' command"
+            )
+        
+        key, value = args[0], args[1]
+        
+        if key in self.db:
+            return RESPSerializer.serialize_integer(0)
+        
+        self.db[key] = encode_string(value)
+        return RESPSerializer.serialize_integer(1)
+
+
+class MGetCommand(RedisStringCommandBase):
+    """Implementation of MGET command: MGET key [key ...]"""
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 1
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                "ERR wrong number of arguments for 'mget' command"
+            )
+        
+        # keys holding other types read as null instead of failing the whole call
+        values = []
+        for key in args:
+            entry = self.db.get(key)
+            values.append(string_bytes(entry) if entry is not None and type_of(entry) == OBJ_STRING else None)
+        return RESPSerializer.serialize_array(values)
+
+
+class MSetCommand(RedisStringCommandBase):
+    """Implementation of MSET command: MSET key value [key value ...]"""
+    
+    name = "mset"
+    write = True
+    # MSETNX sets nothing when any of the keys exists
+    only_new = False
+    
+    def validate_args(self, args: List[bytes]) -> bool:
+        return len(args) >= 2 and len(args) % 2 == 0
+    
+    def get_keys(self, args: List[bytes]) -> List[bytes]:
+        return args[::2]
+    
+    def execute(self, args: List[bytes]) -> bytes:
+        if not self.validate_args(args):
+            return RESPSerializer.serialize_error(
+                f"ERR wrong number of arguments for '{self.name}' command"
+            )
+        
+        if self.only_new and any(key in self.db for key in args[::2]):
+            return RESPSerializer.serialize_integer(0)
+        
+        for i in range(0, len(args), 2):
+            self.db[args[i]] = encode_string(args[i + 1])
+        
+        if self.only_new:
+            return RESPSerializer.serialize_integer(1)
+        return RESPSerializer.serialize_simple_string("OK")
+
+
+class MSetNxCommand(MSetCommand):
+    """Implementation of MSETNX command: MSETNX key value [key value ...]"""
+    
+    name = "msetnx"
+    only_new = True
@@ -0,0 +1,420 @@
+import selectors
+import socket
+import traceback
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING, Union
+from app.parser import PartialCommand, ProtocolError, RESPParser, RESPSerializer, protocol
+from app.commands.base import Waiter
+from app.replication import Replica
+from app.sharding import CrossSlotError, PeerLink
+
+if TYPE_CHECKING:
+    from app.main import Server
+
+# run right away inside MULTI instead of being queued
+TRANSACTION_COMMANDS = ("MULTI", "EXEC", "DISCARD", "WATCH", "UNWATCH")
+
+
+class ClientSession:
+    """Per-client protocol state, shared by the event loop and the threaded server.
+
+    Connection-scoped commands (HELLO, transactions) are answered here since they
+    change the session itself, everything else is routed to the server's command
+    handler, or forwarded to the worker owning its keys when the server runs sharded
+    workers.
+
+    Between MULTI and EXEC commands are only queued, EXEC runs them back to back
+    through RedisCommandHandler.execute_batch, so no other client's command runs in
+    between. It aborts if a key the client WATCHed was written since.
+    """
+
+    def __init__(self, server: "Server", route: bool = True):
+        self.server = server
+        self.id = next(server.client_ids)
+        self.protocol = 2
+        self.name: Optional[bytes] = None
+        self.session_commands: Dict[str, Callable[[List[bytes]], Union[bytes, Waiter]]] = {
+            "HELLO": self.hello,
+            "MULTI": self.multi,
+            "EXEC": self.exec,
+            "DISCARD": self.discard,
+            "WATCH": self.watch,
+            "UNWATCH": self.unwatch,
+        }
+        # commands queued since MULTI, None outside a transaction
+        self.queued: Optional[List[List[bytes]]] = None
+        # a command was rejected while queuing, EXEC discards the transaction
+        self.queue_error = False
+        # WATCHed key -> its version at WATCH time
+        self.watched: Dict[bytes, int] = {}
+        # sharded workers: the worker the keys were WATCHed on, when it's a peer
+        self.watch_owner: Optional[int] = None
+        # commands forwarded by a peer worker are always executed locally
+        self.route = route and server.router is not None
+        self.peer_links: Dict[int, PeerLink] = {}
+
+    def execute(self, tokens: List[bytes]) -> Union[bytes, Waiter]:
+        protocol.set(self.protocol)
+        if tokens:
+            cmd = tokens[0].decode(errors="replace").upper()
+            if self.queued is not None and cmd not in TRANSACTION_COMMANDS:
+                return self.queue(cmd, tokens)
+            if cmd in self.session_commands:
+                return self.session_commands[cmd](tokens[1:])
+        if self.route:
+            return self.route_command(tokens)
+        return self.server.cmd_handler.handle_command(tokens)
+
+    def route_command(self, tokens: List[bytes]) -> Union[bytes, Waiter]:
+        """Execute locally if this worker owns the keys, else relay to the owner"""
+        router = self.server.router
+        try:
+            owner = router.owner(self.server.cmd_handler.get_keys(tokens))
+        except CrossSlotError as e:
+            return RESPSerializer.serialize_error(str(e))
+
+        if owner is None or owner == router.worker_id:
+            return self.server.cmd_handler.handle_command(tokens)
+
+        return self.forward([tokens], owner)
+
+    def forward(self, commands: List[List[bytes]], owner: int) -> Union[bytes, Waiter]:
+        """Relay commands to a peer worker, only the last one's reply comes back"""
+        link = self.peer_links.get(owner)
+        if link is None or link.closed:
+            try:
+                link = self.peer_links[owner] = PeerLink(self.server, owner)
+            except OSError:
+                return RESPSerializer.serialize_error(f"TRYAGAIN worker {owner} is not reachable")
+        return link.forward_all(commands, self.protocol)
+
+    def reply(self, waiter: Waiter) -> bytes:
+        """Build a woken waiter's reply in this client's protocol"""
+        protocol.set(self.protocol)
+        return self.server.cmd_handler.reply(waiter)
+
+    def expire(self, waiter: Waiter) -> Optional[bytes]:
+        protocol.set(self.protocol)
+        return waiter.expire()
+
+    def multi(self, args: List[bytes]) -> bytes:
+        if args:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'multi' command")
+        if self.queued is not None:
+            return RESPSerializer.serialize_error("ERR MULTI calls can not be nested")
+        self.queued = []
+        return RESPSerializer.serialize_simple_string("OK")
+
+    def queue(self, cmd: str, tokens: List[bytes]) -> bytes:
+        """Queue a command of a transaction, rejecting the ones that can't run"""
+        command = self.server.cmd_handler.commands.get(cmd)
+        if cmd in self.session_commands:
+            error = "ERR Command not allowed inside a transaction"
+        elif command is None:
+            error = f"ERR unknown command - {cmd}"
+        elif not command.validate_args(tokens[1:]):
+            error = f"ERR wrong number of arguments for '{cmd.lower()}' command"
+        else:
+            self.queued.append(tokens)
+            return RESPSerializer.serialize_simple_string("QUEUED")
+        self.queue_error = True
+        return RESPSerializer.serialize_error(error)
+
+    def exec(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        if args:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'exec' command")
+        if self.queued is None:
+            return RESPSerializer.serialize_error("ERR EXEC without MULTI")
+        queued, self.queued = self.queued, None
+        queue_error, self.queue_error = self.queue_error, False
+        try:
+            if queue_error:
+                return RESPSerializer.serialize_error("EXECABORT Transaction discarded because of previous errors.")
+            if self.watch_changed():
+                return RESPSerializer.serialize_null_array()
+            if self.route:
+                return self.route_transaction(queued)
+            return self.server.cmd_handler.execute_batch(queued)
+        finally:
+            self.unwatch_all()
+
+    def route_transaction(self, queued: List[List[bytes]]) -> Union[bytes, Waiter]:
+        """Run a transaction on the worker owning all its keys, as one MULTI/EXEC there"""
+        handler, router = self.server.cmd_handler, self.server.router
+        try:
+            owner = router.owner([key for tokens in queued for key in handler.get_keys(tokens)])
+        except CrossSlotError as e:
+            return RESPSerializer.serialize_error(str(e))
+        if self.watch_owner is not None:
+            if owner not in (None, self.watch_owner):
+                return RESPSerializer.serialize_error("CROSSSLOT Keys in request don't hash to the same slot")
+            owner = self.watch_owner
+            # the peer session unwatches on EXEC
+            self.watch_owner = None
+        if owner is None or owner == router.worker_id:
+            return handler.execute_batch(queued)
+        return self.forward([[b"MULTI"], *queued, [b"EXEC"]], owner)
+
+    def discard(self, args: List[bytes]) -> bytes:
+        if args:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'discard' command")
+        if self.queued is None:
+            return RESPSerializer.serialize_error("ERR DISCARD without MULTI")
+        self.queued, self.queue_error = None, False
+        self.unwatch_all()
+        return RESPSerializer.serialize_simple_string("OK")
+
+    def watch(self, args: List[bytes]) -> Union[bytes, Waiter]:
+        """WATCH key [key ...]: the next EXEC aborts if any of them is written meanwhile"""
+        if not args:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'watch' command")
+        if self.queued is not None:
+            return RESPSerializer.serialize_error("ERR WATCH inside MULTI is not allowed")
+        if self.route:
+            router = self.server.router
+            try:
+                owner = router.owner(args)
+            except CrossSlotError as e:
+                return RESPSerializer.serialize_error(str(e))
+            if owner != router.worker_id:
+                if self.watched or self.watch_owner not in (None, owner):
+                    return RESPSerializer.serialize_error("CROSSSLOT Keys in request don't hash to the same slot")
+                self.watch_owner = owner
+                return self.forward([[b"WATCH", *args]], owner)
+            if self.watch_owner is not None:
+                return RESPSerializer.serialize_error("CROSSSLOT Keys in request don't hash to the same slot")
+
+        db = self.server.db
+        for key in args:
+            if key not in self.watched:
+                # a key that already expired must not count as written later on
+                db.get(key)
+                self.watched[key] = db.watched.watch(key)
+        return RESPSerializer.serialize_simple_string("OK")
+
+    def unwatch(self, args: List[bytes]) -> bytes:
+        if args:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'unwatch' command")
+        self.unwatch_all()
+        return RESPSerializer.serialize_simple_string("OK")
+
+    def watch_changed(self) -> bool:
+        """Whether a WATCHed key was written (or expired) since it was watched"""
+        db = self.server.db
+        versions = db.watched.versions
+        for key, version in self.watched.items():
+            # an expired key is deleted, and its version bumped, by looking it up
+            db.get(key)
+            if versions[key] != version:
+                return True
+        return False
+
+    def unwatch_all(self):
+        watched = self.server.db.watched
+        for key in self.watched:
+            watched.unwatch(key)
+        self.watched.clear()
+        if self.watch_owner is not None:
+            # the reply is dropped, nobody waits on it
+            self.forward([[b"UNWATCH"]], self.watch_owner)
+            self.watch_owner = None
+
+    def hello(self, args: List[bytes]) -> bytes:
+        """HELLO [protover [AUTH username password] [SETNAME clientname]]"""
+        version = self.protocol
+        if args:
+            try:
+                version = int(args[0])
+            except ValueError:
+                return RESPSerializer.serialize_error("ERR Protocol version is not an integer or out of range")
+            if version not in (2, 3):
+                return RESPSerializer.serialize_error("NOPROTO unsupported protocol version")
+
+        name = self.name
+        options = args[1:]
+        i = 0
+        while i < len(options):
+            option = options[i].upper()
+            if option == b"SETNAME" and i + 1 < len(options):
+                name = options[i + 1]
+                i += 2
+            elif option == b"AUTH" and i + 2 < len(options):
+                return RESPSerializer.serialize_error(
+                    "ERR AUTH <password> called without any password configured for the default user"
+                )
+            else:
+                return RESPSerializer.serialize_error("ERR syntax error in HELLO option")
+
+        self.protocol, self.name = version, name
+        protocol.set(version)  # the reply is already in the negotiated protocol
+        return RESPSerializer.serialize_map({
+            b"server": b"redis",
+            b"version": b"7.4.0",
+            b"proto": version,
+            b"id": self.id,
+            b"mode": b"standalone",
+            b"role": b"master" if self.server.replication.master is None else b"replica",
+            b"modules": [],
+        })
+
+
+class ClientConnection(ClientSession):
+    """State of a single client connection multiplexed on the server event loop"""
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, server: "Server", sock: socket.socket, addr, route: bool = True):
+        super().__init__(server, route)
+        self.sock = sock
+        self.addr = addr
+        self.inbuf = bytearray()
+        # a large command arriving over several reads isn't re-parsed from its start
+        self.partial = PartialCommand()
+        self.outbuf = bytearray()
+        self.waiter: Optional[Waiter] = None
+        self.events = 0
+        self.closed = False
+        self.close_after_flush = False
+        # set by PSYNC, the connection receives the replication stream from then on
+        self.replica: Optional[Replica] = None
+        self.listening_port = 0
+        self.session_commands["REPLCONF"] = lambda args: server.replication.replconf(self, args)
+        self.session_commands["PSYNC"] = lambda args: server.replication.psync(self, args)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def update_interest(self):
+        """Register for the selector events the connection currently needs"""
+        events = selectors.EVENT_READ
+        if self.outbuf:
+            events |= selectors.EVENT_WRITE
+        if events != self.events:
+            self.server.selector.modify(self.sock, events, self)
+            self.events = events
+
+    def on_readable(self):
+        try:
+            raw = self.sock.recv(self.READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ConnectionError:
+            raw = b""
+
+        if not raw:
+            self.close()
+            return
+
+        self.inbuf += raw
+        self.process_input()
+        self.send_replies()
+
+    def on_writable(self):
+        self.flush()
+
+    def process_input(self):
+        """Execute every complete command in the read buffer (a pipeline batch).
+
+        Replies are only appended to the write buffer, the caller flushes them with
+        a single send. Parsing stops at a partial frame, which stays buffered until
+        the next read, or at a blocking command, which resumes the batch once woken.
+        """
+        pos = 0
+        try:
+            while self.waiter is None and not self.close_after_flush:
+                parsed = RESPParser.parse_command(self.inbuf, pos, self.partial)
+                if parsed is None:
+                    break
+                tokens, pos = parsed
+                self.dispatch(tokens)
+        except ProtocolError as e:
+            # the stream can't be resynchronized after a framing error
+            self.outbuf += RESPSerializer.serialize_error(f"ERR Protocol error: {e}")
+            self.close_after_flush = True
+            pos = len(self.inbuf)
+        except Exception:
+            # a bug in a command drops its client, not the whole event loop
+            traceback.print_exc()
+            self.close_after_flush = True
+            pos = len(self.inbuf)
+
+        if pos:
+            del self.inbuf[:pos]
+
+    def dispatch(self, tokens: List[bytes]):
+        response = self.execute(tokens)
+        if isinstance(response, Waiter):
+            self.block(response)
+        else:
+            self.outbuf += response
+
+    def block(self, waiter: Waiter):
+        """Park the connection until the waiter is woken or times out"""
+        self.waiter = waiter
+        waiter.resume = self.on_wake
+        if waiter.deadline is not None:
+            self.server.add_timer(waiter.deadline, lambda: self.on_timeout(waiter))
+
+    def on_wake(self, waiter: Waiter):
+        # runs while the waking command is still executing, defer the reply to the loop
+        self.server.ready.append(self)
+
+    def resume(self):
+        """Deliver the reply of a woken waiter and continue with buffered input"""
+        waiter = self.waiter
+        if waiter is None or self.closed:
+            return
+        self.waiter = None
+        self.outbuf += self.reply(waiter)
+        self.process_input()
+        self.send_replies()
+
+    def on_timeout(self, waiter: Waiter):
+        if self.waiter is not waiter or self.closed:
+            return
+        reply = self.expire(waiter)
+        if reply is None:
+            return  # woken in the meantime, resume() delivers the reply
+        self.waiter = None
+        self.outbuf += reply
+        self.process_input()
+        self.send_replies()
+
+    def send_replies(self):
+        """Send the replies of the commands just executed, with appendfsync always
+        only once the AOF has them on disk (Server.before_sleep)"""
+        if self.server.sync_replies:
+            self.server.pending_replies[self] = None
+        else:
+            self.flush()
+
+    def flush(self):
+        if self.closed:
+            return
+        try:
+            while self.outbuf:
+                sent = self.sock.send(self.outbuf)
+                del self.outbuf[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except ConnectionError:
+            self.close()
+            return
+        if self.close_after_flush and not self.outbuf:
+            self.close()
+            return
+        self.update_interest()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.waiter is not None:
+            self.waiter.expire()  # unregister from the blocked key, nobody reads the reply
+            self.waiter = None
+        self.unwatch_all()
+        for link in self.peer_links.values():
+            link.close()
+        if self.replica is not None:
+            self.server.replication.remove(self.replica)
+        self.server.selector.unregister(self.sock)
+        self.sock.close()
@@ -0,0 +1,164 @@
+import heapq
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def now_ms() -> float:
+    """Current unix time in milliseconds, the unit deadlines are stored in"""
+    return time.time() * 1000
+
+
+class WatchedKeys:
+    """Version counters of the keys clients WATCH.
+
+    A key's version is bumped whenever a write to it is propagated (see
+    RedisCommandHandler.propagate), EXEC aborts when a version recorded at WATCH time
+    changed. Only watched keys have a counter, dropped with their last watcher.
+    """
+
+    def __init__(self):
+        self.versions: Dict[bytes, int] = {}
+        self.watchers: Dict[bytes, int] = {}
+
+    def watch(self, key: bytes) -> int:
+        """Register a watcher of `key`, returns the key's current version"""
+        self.watchers[key] = self.watchers.get(key, 0) + 1
+        return self.versions.setdefault(key, 0)
+
+    def unwatch(self, key: bytes):
+        count = self.watchers[key] - 1
+        if count:
+            self.watchers[key] = count
+        else:
+            del self.watchers[key]
+            del self.versions[key]
+
+    def touch(self, key: bytes):
+        if key in self.versions:
+            self.versions[key] += 1
+
+    def touch_all(self):
+        for key in self.versions:
+            self.versions[key] += 1
+
+
+class Keyspace(dict):
+    """The server's key -> entry dict with redis style key expiration.
+
+    Deadlines (unix ms) live in a separate `expires` dict, like redis' db->expires,
+    so keys without a TTL pay nothing for it. Expired keys are removed lazily when
+    they are looked up, and actively by `active_expire_cycle`, which pops due
+    deadlines from a min-heap so memory is reclaimed for keys nobody reads again.
+    """
+
+    # an active expire cycle stops after this share of its tick, like redis' 25% budget
+    ACTIVE_EXPIRE_BUDGET = 0.25
+
+    def __init__(self):
+        super().__init__()
+        self.expires: Dict[bytes, float] = {}
+        # (deadline, key) pairs, stale once the key's TTL changed or was removed
+        self.ttl_heap: List[Tuple[float, bytes]] = []
+        # replaying the AOF: commands must see the keys they saw when they were logged,
+        # expired ones included, so nothing expires until loading is done
+        self.loading = False
+        # called with every key removed because its TTL passed, logs it as a DEL
+        self.on_expire: Optional[Callable[[bytes], None]] = None
+        # a replica's keys are only removed by the DELs of its master, until they arrive
+        # expired keys are hidden from reads but kept
+        self.replica = False
+        self.watched = WatchedKeys()
+
+    def is_expired(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        return deadline is not None and now_ms() >= deadline and not self.loading
+
+    def get(self, key: bytes, default=None):
+        entry = dict.get(self, key)
+        if entry is None:
+            return default
+        if self.expires and self.is_expired(key):
+            if not self.replica:
+                self.expire(key)
+            return default
+        return entry
+
+    def __getitem__(self, key: bytes):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: bytes, entry):
+        # storing a new value under a key discards its old TTL (SET semantics)
+        if self.expires:
+            self.expires.pop(key, None)
+        dict.__setitem__(self, key, entry)
+
+    def clear(self):
+        self.watched.touch_all()
+        dict.clear(self)
+        self.expires.clear()
+        self.ttl_heap.clear()
+
+    def replace(self, key: bytes, entry):
+        """Store a new value under a key keeping its TTL (INCR, APPEND ...)"""
+        dict.__setitem__(self, key, entry)
+
+    def __delitem__(self, key: bytes):
+        dict.__delitem__(self, key)
+        if self.expires:
+            self.expires.pop(key, None)
+
+    def pop(self, key: bytes, *default):
+        if self.expires:
+            self.expires.pop(key, None)
+        return dict.pop(self, key, *default)
+
+    def expire(self, key: bytes):
+        """Remove a key whose TTL passed"""
+        del self[key]
+        if self.on_expire is not None:
+            self.on_expire(key)
+
+    def get_expiry(self, key: bytes) -> Optional[float]:
+        """Deadline of a key in unix ms, None when it doesn't expire"""
+        return self.expires.get(key)
+
+    def set_expiry(self, key: bytes, deadline: float):
+        """Expire an existing key at `deadline` (unix ms)"""
+        self.expires[key] = deadline
+        heapq.heappush(self.ttl_heap, (deadline, key))
+        if len(self.ttl_heap) > 2 * len(self.expires) + 1024:
+            # TTLs rewritten over and over leave stale heap entries behind
+            self.ttl_heap = [(d, k) for k, d in self.expires.items()]
+            heapq.heapify(self.ttl_heap)
+
+    def persist(self, key: bytes) -> bool:
+        """Remove the TTL of a key, returns whether it had one"""
+        return self.expires.pop(key, None) is not None
+
+    def active_expire_cycle(self, budget_ms: float) -> int:
+        """Delete keys whose deadline passed, spending at most `budget_ms`.
+
+        Returns:
+            int: number of keys deleted
+        """
+        if self.replica:
+            return 0
+        heap, expires = self.ttl_heap, self.expires
+        start = now_ms()
+        stop_at = start + budget_ms
+        deleted = 0
+        while heap and heap[0][0] <= start:
+            deadline, key = heapq.heappop(heap)
+            if expires.get(key) == deadline:
+                self.expire(key)
+                deleted += 1
+                # checking the clock is not free, only do it every few keys
+                if deleted % 32 == 0 and now_ms() >= stop_at:
+                    break
+        return deleted
@@ -1,51 +1,350 @@
+import argparse
+import heapq
+import itertools
+import os
+import selectors
+import signal
 import socket  # noqa: F401
-from threading import Thread
-from typing import Dict
-from app.parser import RESPParser, RESPSerializer
+import time
+from collections import deque
+from threading import Lock, Thread
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from app.parser import PartialCommand, ProtocolError, RESPParser, RESPSerializer
+from app.commands.base import BlockingRegistry, Waiter
 from app.commands.handler import RedisCommandHandler
+from app.connection import ClientConnection, ClientSession
+from app.keyspace import Keyspace
+from app.aof import FSYNC_POLICIES
+from app.persistence import Persistence
+from app.replication import Replication
+from app.objects import HashObject, SetObject
+from app.sharding import ShardRouter
 
 
 class Server:
-    def __init__(self):
-        self.server_socket: socket = socket.create_server(("localhost", 6379), reuse_port=True)
-        self.db: Dict = {}
+    # background tasks (active key expiration) run this many times per second
+    HZ = 10
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        threaded: bool = False,
+        worker_id: int = 0,
+        workers: int = 1,
+        dir: str = ".",
+        dbfilename: str = "dump.rdb",
+        appendonly: bool = False,
+        appendfilename: str = "appendonly.aof",
+        appendfsync: str = "everysec",
+        replicaof: Optional[Tuple[str, int]] = None,
+        repl_backlog_size: int = 1024 * 1024,
+    ):
+        # with --workers every worker process binds the same port, the kernel
+        # (SO_REUSEPORT) spreads accepted connections across them
+        self.server_socket: socket = socket.create_server((host, port), reuse_port=True)
+        self.port = port
+        self.db: Keyspace = Keyspace()
+        # blocked stream readers by key, see RedisStreamCommandBase.block
         self.waiting_clients: Dict = {}
-        self.cmd_handler: RedisCommandHandler = RedisCommandHandler(db=self.db, waiting_clients=self.waiting_clients)
-    
+        # clients blocked on list keys (BLPOP, BLMOVE ...)
+        self.blocking_clients = BlockingRegistry()
+        # every worker persists its own shard of the keys
+        if workers > 1:
+            root, ext = os.path.splitext(dbfilename)
+            dbfilename = f"{root}-{worker_id}{ext}"
+            root, ext = os.path.splitext(appendfilename)
+            appendfilename = f"{root}-{worker_id}{ext}"
+        self.persistence = Persistence(self.db, dir, dbfilename, appendonly, appendfilename, appendfsync)
+        self.replication = Replication(self, repl_backlog_size)
+        if replicaof is not None:
+            self.replication.replicaof(*replicaof)
+        self.cmd_handler: RedisCommandHandler = RedisCommandHandler(
+            db=self.db, waiting_clients=self.waiting_clients, blocking_clients=self.blocking_clients,
+            persistence=self.persistence, replication=self.replication,
+        )
+        self.persistence.load(self.cmd_handler)
+        # keys removed by their TTL are logged as DELs, so replaying the AOF later doesn't
+        # resurrect them
+        self.db.on_expire = lambda key: self.cmd_handler.propagate([[b"DEL", key]])
+        # with appendfsync always replies wait for the fsync of the writes they acknowledge
+        self.sync_replies = appendonly and appendfsync == "always"
+        self.threaded = threaded
+        # threaded mode: every command, woken reply and cron step runs holding it, so
+        # commands execute one at a time like on the event loop
+        self.command_lock = Lock()
+        self.client_ids = itertools.count(1)
+
+        # sharded workers: keys are owned by one worker, peers forward over unix sockets
+        self.router: Optional[ShardRouter] = None
+        self.peer_socket: Optional[socket.socket] = None
+        if workers > 1:
+            self.router = ShardRouter(port, worker_id, workers)
+            path = self.router.socket_path(worker_id)
+            if os.path.exists(path):
+                os.unlink(path)
+            self.peer_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.peer_socket.bind(path)
+            self.peer_socket.listen()
+
+        # event loop state
+        self.selector = selectors.DefaultSelector()
+        self.timers: List[Tuple[float, int, Callable[[], None]]] = []
+        self.timer_seq = itertools.count()
+        self.ready: Deque[ClientConnection] = deque()
+        # connections with output to send before the loop sleeps: replies held back until
+        # the AOF is fsynced, and the replication stream written to replicas
+        self.pending_replies: Dict[ClientConnection, None] = {}
+
     def start(self):
+        if self.threaded:
+            self.serve_threaded()
+        else:
+            self.serve_forever()
+
+    def add_timer(self, deadline: float, callback: Callable[[], None]):
+        """Run `callback` from the event loop once `time.monotonic()` reaches `deadline`"""
+        heapq.heappush(self.timers, (deadline, next(self.timer_seq), callback))
+
+    def cron(self):
+        """Periodic background work, reschedules itself every 1/HZ seconds"""
+        self.db.active_expire_cycle(budget_ms=1000 / self.HZ * Keyspace.ACTIVE_EXPIRE_BUDGET)
+        self.persistence.poll()
+        self.replication.cron()
+        self.add_timer(time.monotonic() + 1 / self.HZ, self.cron)
+
+    def serve_forever(self):
+        """Single-threaded event loop multiplexing every client connection"""
+        self.add_timer(time.monotonic() + 1 / self.HZ, self.cron)
+        for listener in (self.server_socket, self.peer_socket):
+            if listener is not None:
+                listener.setblocking(False)
+                self.selector.register(listener, selectors.EVENT_READ)
+
+        while True:
+            self.before_sleep()
+            timeout = None
+            if self.timers:
+                timeout = max(0, self.timers[0][0] - time.monotonic())
+
+            for key, mask in self.selector.select(timeout):
+                if key.data is None:
+                    self.accept(key.fileobj)
+                    continue
+                conn: ClientConnection = key.data
+                if mask & selectors.EVENT_READ:
+                    conn.on_readable()
+                if mask & selectors.EVENT_WRITE and not conn.closed:
+                    conn.on_writable()
+                self.run_ready()
+
+            now = time.monotonic()
+            while self.timers and self.timers[0][0] <= now:
+                _, _, callback = heapq.heappop(self.timers)
+                callback()
+                self.run_ready()
+
+    def before_sleep(self):
+        """Runs before waiting for events: hand the AOF its writes, then send the replies
+        that were waiting for them to be on disk and the replication stream"""
+        self.persistence.flush_aof()
+        self.replication.before_sleep()
+        if self.pending_replies:
+            connections = list(self.pending_replies)
+            self.pending_replies.clear()
+            for conn in connections:
+                conn.flush()
+
+    def accept(self, listener: socket.socket):
+        try:
+            client_socket, addr = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        client_socket.setblocking(False)
+        if listener is self.peer_socket:
+            conn = ClientConnection(self, client_socket, addr, route=False)
+        else:
+            print(f"New connection from: {addr}")
+            conn = ClientConnection(self, client_socket, addr)
+        self.selector.register(client_socket, selectors.EVENT_READ, conn)
+        conn.events = selectors.EVENT_READ
+
+    def run_ready(self):
+        """Resume connections whose parked commands were woken by the last command"""
+        while self.ready:
+            self.ready.popleft().resume()
+
+    def serve_threaded(self):
+        """Legacy mode: one OS thread per accepted connection.
+
+        Client threads only overlap on socket I/O and while blocked, commands are
+        serialized by `command_lock`, which makes them linearizable: every command
+        sees the effects of the ones before it in full, multi-step commands (LPOP
+        COUNT, XADD *, a push handing its value to a blocked client) included.
+        """
+        def run_cron():
+            while True:
+                time.sleep(1 / self.HZ)
+                with self.command_lock:
+                    self.db.active_expire_cycle(budget_ms=1000 / self.HZ * Keyspace.ACTIVE_EXPIRE_BUDGET)
+                    self.persistence.poll()
+
+        Thread(target=run_cron, daemon=True).start()
         while True:
             client_socket, addr = self.server_socket.accept()
             print(f"New connection from: {addr}")
-            thread = Thread(target=self.handle_client, args=(client_socket,))
+            thread = Thread(target=self.handle_client, args=(client_socket,), daemon=True)
             thread.start()
-    
+
     def handle_client(self, client_socket: socket):
-        # try:
+        session = ClientSession(self)
+        buffer, partial = bytearray(), PartialCommand()
+        try:
             while True:
-                raw = client_socket.recv(1024)
-            
+                raw = client_socket.recv(ClientConnection.READ_SIZE)
+
                 if not raw:
                     break
-            
-                tokens = RESPParser.parse_request(raw)
-                if tokens is None:
-                    error_response = RESPSerializer.serialize_error("ERR Invalid command format")
-                    client_socket.sendall(error_response)
-                else:
-                    response = self.cmd_handler.handle_command(tokens)
-                    client_socket.sendall(response)
-        # except Exception as e:
-        #     print("\n Unexpected Error:", str(e))
-        # finally:
-        #     client_socket.close()
-                
+
+                buffer += raw
+                replies, pos = [], 0
+                try:
+                    while True:
+                        parsed = RESPParser.parse_command(buffer, pos, partial)
+                        if parsed is None:
+                            break
+                        tokens, pos = parsed
+                        with self.command_lock:
+                            response = session.execute(tokens)
+                        if isinstance(response, Waiter):
+                            if replies:
+                                self.persistence.flush_aof()
+                                client_socket.sendall(b"".join(replies))
+                                replies.clear()
+                            response = response.wait(session.reply, self.command_lock)
+                        replies.append(response)
+                except ProtocolError as e:
+                    replies.append(RESPSerializer.serialize_error(f"ERR Protocol error: {e}"))
+                    self.persistence.flush_aof()
+                    client_socket.sendall(b"".join(replies))
+                    break
+                del buffer[:pos]
+
+                if replies:
+                    self.persistence.flush_aof()
+                    client_socket.sendall(b"".join(replies))
+        except ConnectionError:
+            pass
+        finally:
+            with self.command_lock:
+                session.unwatch_all()
+            client_socket.close()
+
+
+def run_workers(port: int, workers: int, **persistence):
+    """Fork `workers` event loop processes sharing the port, each owning a shard of the keys"""
+    pids = []
+    for worker_id in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                Server(port=port, worker_id=worker_id, workers=workers, **persistence).start()
+            finally:
+                os._exit(1)
+        pids.append(pid)
+
+    def stop(signum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
 
 def main():
     print("Logs from your program will appear here!")
-    
-    redis_server = Server()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument(
+        "--threaded", action="store_true",
+        help="serve every connection on its own thread instead of the event loop"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of worker processes, keys are hash-partitioned across them"
+    )
+    parser.add_argument("--dir", default=".", help="directory the snapshot is saved to and loaded from")
+    parser.add_argument(
+        "--dbfilename", default="dump.rdb",
+        help="snapshot file name, with --workers each worker uses <name>-<worker id>.rdb"
+    )
+    parser.add_argument(
+        "--appendonly", choices=("yes", "no"), default="no",
+        help="log every write to the append only file, it is loaded instead of the snapshot on startup"
+    )
+    parser.add_argument("--appendfilename", default="appendonly.aof")
+    parser.add_argument(
+        "--appendfsync", choices=FSYNC_POLICIES, default="everysec",
+        help="fsync the AOF after every write, once a second, or leave it to the OS"
+    )
+    parser.add_argument(
+        "--replicaof", nargs="+", metavar="HOST PORT",
+        help="replicate the given master: full resync on the first connection, then its write stream"
+    )
+    parser.add_argument(
+        "--repl-backlog-size", type=int, default=1024 * 1024,
+        help="bytes of the replication stream kept for replicas resuming after a disconnect"
+    )
+    parser.add_argument(
+        "--hash-max-listpack-entries", type=int, default=HashObject.MAX_LISTPACK_ENTRIES,
+        help="hashes with more fields are converted from the compact encoding to a dict"
+    )
+    parser.add_argument(
+        "--hash-max-listpack-value", type=int, default=HashObject.MAX_LISTPACK_VALUE,
+        help="hashes with a longer field or value are converted to a dict"
+    )
+    parser.add_argument(
+        "--set-max-intset-entries", type=int, default=SetObject.MAX_INTSET_ENTRIES,
+        help="integer sets with more members are converted from the sorted array to a set"
+    )
+    args = parser.parse_args()
+
+    HashObject.MAX_LISTPACK_ENTRIES = args.hash_max_listpack_entries
+    HashObject.MAX_LISTPACK_VALUE = args.hash_max_listpack_value
+    SetObject.MAX_INTSET_ENTRIES = args.set_max_intset_entries
+
+    persistence = dict(
+        dir=args.dir, dbfilename=args.dbfilename, appendonly=args.appendonly == "yes",
+        appendfilename=args.appendfilename, appendfsync=args.appendfsync,
+    )
+    replicaof = None
+    if args.replicaof:
+        # both `--replicaof host port` and redis' `--replicaof "host port"`
+        parts = " ".join(args.replicaof).split()
+        if len(parts) != 2 or not parts[1].isdigit():
+            parser.error("--replicaof expects a host and a port")
+        if args.threaded or args.workers > 1:
+            parser.error("--replicaof requires the single process event loop server")
+        replicaof = (parts[0], int(parts[1]))
+
+    if args.workers > 1:
+        if args.threaded:
+            parser.error("--workers requires the event loop server")
+        run_workers(args.port, args.workers, **persistence)
+        return
+
+    redis_server = Server(
+        port=args.port, threaded=args.threaded, replicaof=replicaof, repl_backlog_size=args.repl_backlog_size,
+        **persistence
+    )
     redis_server.start()
-    
+
 
 if __name__ == "__main__":
     main()
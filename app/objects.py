@@ -0,0 +1,1021 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from random import random, randrange, sample
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# type tags, indexes into TYPE_NAMES
+OBJ_STRING = 0
+OBJ_LIST = 1
+OBJ_STREAM = 2
+OBJ_HASH = 3
+OBJ_ZSET = 4
+OBJ_SET = 5
+
+TYPE_NAMES = ("string", "list", "stream", "hash", "zset", "set")
+
+
+class RedisObject:
+    """Base of the values stored for container types.
+
+    Strings are stored in the keyspace as plain `bytes` with no wrapper at all,
+    so the most common keys cost nothing beyond the key and value themselves.
+    Containers use `__slots__` objects instead of per-key dicts.
+    """
+
+    __slots__ = ()
+    type = -1
+    encoding = "raw"
+
+
+class ListObject(RedisObject):
+    """A list value stored quicklist style: a chain of packed chunks of at most
+    CHUNK_SIZE values.
+
+    `starts` caches the position of every chunk's first value. Positions are
+    relative to a base that only moves when the head chunk grows or shrinks, so
+    pushing and popping at either end updates one number. Index lookups bisect
+    `starts` and only touch the chunks in range. A list shorter than CHUNK_SIZE
+    is a single plain list, the compact encoding small lists get.
+    """
+
+    __slots__ = ("chunks", "starts", "length")
+    type = OBJ_LIST
+
+    # like redis' list-max-listpack-size 128
+    CHUNK_SIZE = 128
+
+    def __init__(self, values: Iterable[bytes] = ()):
+        self.chunks: List[List[bytes]] = []
+        self.starts: List[int] = []
+        self.length = 0
+        self.extend(values)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.chunks:
+            yield from chunk
+
+    def __reversed__(self) -> Iterator[bytes]:
+        for chunk in reversed(self.chunks):
+            yield from reversed(chunk)
+
+    @property
+    def encoding(self) -> str:
+        return "listpack" if len(self.chunks) <= 1 else "quicklist"
+
+    def append(self, value: bytes):
+        chunks = self.chunks
+        if chunks and len(chunks[-1]) < self.CHUNK_SIZE:
+            chunks[-1].append(value)
+        else:
+            self.starts.append(self.starts[-1] + len(chunks[-1]) if chunks else 0)
+            chunks.append([value])
+        self.length += 1
+
+    def appendleft(self, value: bytes):
+        chunks = self.chunks
+        if chunks and len(chunks[0]) < self.CHUNK_SIZE:
+            chunks[0].insert(0, value)
+            self.starts[0] -= 1
+        else:
+            self.starts.insert(0, self.starts[0] - 1 if chunks else 0)
+            chunks.insert(0, [value])
+        self.length += 1
+
+    def extend(self, values: Iterable[bytes]):
+        for value in values:
+            self.append(value)
+
+    def extendleft(self, values: Iterable[bytes]):
+        """Push every value to the head in turn, so they end up reversed (like deque)"""
+        for value in values:
+            self.appendleft(value)
+
+    def pop(self) -> bytes:
+        chunk = self.chunks[-1]
+        value = chunk.pop()
+        if not chunk:
+            del self.chunks[-1]
+            del self.starts[-1]
+        self.length -= 1
+        return value
+
+    def popleft(self) -> bytes:
+        chunk = self.chunks[0]
+        value = chunk.pop(0)
+        if chunk:
+            self.starts[0] += 1
+        else:
+            del self.chunks[0]
+            del self.starts[0]
+        self.length -= 1
+        return value
+
+    def locate(self, index: int) -> Tuple[int, int]:
+        """(chunk, offset in chunk) of a position, 0 <= index < len"""
+        position = self.starts[0] + index
+        c = bisect_right(self.starts, position) - 1
+        return c, position - self.starts[c]
+
+    def __getitem__(self, index: int) -> bytes:
+        c, offset = self.locate(index)
+        return self.chunks[c][offset]
+
+    def __setitem__(self, index: int, value: bytes):
+        c, offset = self.locate(index)
+        self.chunks[c][offset] = value
+
+    def range(self, start: int, stop: int) -> Iterator[bytes]:
+        """Values at positions start <= i < stop, reading only the chunks in range"""
+        if start >= stop:
+            return
+        c, offset = self.locate(start)
+        remaining = stop - start
+        chunks = self.chunks
+        while remaining > 0 and c < len(chunks):
+            chunk = chunks[c]
+            part = chunk[offset:offset + remaining]
+            yield from part
+            remaining -= len(part)
+            c += 1
+            offset = 0
+
+    def insert(self, index: int, value: bytes):
+        """Insert before position `index`, a chunk that gets too big is split in two"""
+        if index >= self.length:
+            return self.append(value)
+        if index <= 0:
+            return self.appendleft(value)
+        c, offset = self.locate(index)
+        chunk = self.chunks[c]
+        chunk.insert(offset, value)
+        starts = self.starts
+        for i in range(c + 1, len(starts)):
+            starts[i] += 1
+        if len(chunk) > self.CHUNK_SIZE:
+            half = len(chunk) // 2
+            self.chunks.insert(c + 1, chunk[half:])
+            starts.insert(c + 1, starts[c] + half)
+            del chunk[half:]
+        self.length += 1
+
+    def delete(self, index: int):
+        """Remove the value at a position"""
+        c, offset = self.locate(index)
+        chunk = self.chunks[c]
+        del chunk[offset]
+        starts = self.starts
+        for i in range(c + 1, len(starts)):
+            starts[i] -= 1
+        if not chunk:
+            del self.chunks[c]
+            del starts[c]
+        self.length -= 1
+
+    def remove(self, value: bytes, count: int = 0) -> int:
+        """Remove the first `count` occurrences of value (the last ones if count < 0, all if 0).
+        Chunks without a match are skipped with a single C level scan. Returns how many were removed"""
+        limit = abs(count) or self.length
+        removed = 0
+        chunks = self.chunks
+        order = range(len(chunks)) if count >= 0 else range(len(chunks) - 1, -1, -1)
+        for c in order:
+            chunk = chunks[c]
+            if value not in chunk:
+                continue
+            budget = limit - removed
+            if count < 0:
+                kept = []
+                for element in reversed(chunk):
+                    if element == value and budget:
+                        budget -= 1
+                    else:
+                        kept.append(element)
+                kept.reverse()
+            else:
+                kept = []
+                for element in chunk:
+                    if element == value and budget:
+                        budget -= 1
+                    else:
+                        kept.append(element)
+            removed += len(chunk) - len(kept)
+            chunk[:] = kept
+            if removed >= limit:
+                break
+        if removed:
+            base = self.starts[0]
+            self.chunks = [chunk for chunk in chunks if chunk]
+            self.starts = []
+            for chunk in self.chunks:
+                self.starts.append(base)
+                base += len(chunk)
+            self.length -= removed
+        return removed
+
+    def trim(self, start: int, stop: int):
+        """Keep only positions start <= i < stop, dropping whole chunks where possible"""
+        start, stop = max(start, 0), min(stop, self.length)
+        if start >= stop:
+            self.chunks, self.starts, self.length = [], [], 0
+            return
+        # tail first, it doesn't move the positions of the head
+        c, offset = self.locate(stop - 1)
+        del self.chunks[c + 1:]
+        del self.starts[c + 1:]
+        del self.chunks[c][offset + 1:]
+        c, offset = self.locate(start)
+        del self.chunks[:c]
+        del self.starts[:c]
+        del self.chunks[0][:offset]
+        self.starts[0] += offset
+        self.length = stop - start
+
+
+class OrderedTable:
+    """The hashtable encoding of hashes and sets: keys in insertion order, with a
+    value each when `values` is kept.
+
+    `positions` maps a key to its slot in the parallel `keys`/`values`/`seqs`
+    arrays. Deleting leaves a tombstone (None) in the slot, the arrays are
+    compacted once tombstones outnumber live keys. Every key gets a sequence
+    number when inserted that never changes, so a SCAN cursor (the sequence
+    number to resume from) stays valid across writes and compactions, and seeking
+    to it is a bisect of `seqs`.
+    """
+
+    __slots__ = ("positions", "keys", "values", "seqs", "next_seq")
+
+    def __init__(self, with_values: bool = False):
+        self.positions: Dict[bytes, int] = {}
+        self.keys: List[Optional[bytes]] = []
+        self.values: Optional[List[Optional[bytes]]] = [] if with_values else None
+        self.seqs = array("Q")
+        # 0 is the cursor starting a scan, sequence numbers start at 1
+        self.next_seq = 1
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.positions)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.positions
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        i = self.positions.get(key)
+        return None if i is None else self.values[i]
+
+    def set(self, key: bytes, value: Optional[bytes] = None) -> bool:
+        """Returns True when the key is new"""
+        i = self.positions.get(key)
+        if i is not None:
+            if self.values is not None:
+                self.values[i] = value
+            return False
+        self.positions[key] = len(self.keys)
+        self.keys.append(key)
+        if self.values is not None:
+            self.values.append(value)
+        self.seqs.append(self.next_seq)
+        self.next_seq += 1
+        return True
+
+    def delete(self, key: bytes) -> bool:
+        i = self.positions.pop(key, None)
+        if i is None:
+            return False
+        self.keys[i] = None
+        if self.values is not None:
+            self.values[i] = None
+        if len(self.keys) > 2 * len(self.positions) + 16:
+            self.compact()
+        return True
+
+    def compact(self):
+        live = [i for i, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[i] for i in live]
+        if self.values is not None:
+            self.values = [self.values[i] for i in live]
+        self.seqs = array("Q", [self.seqs[i] for i in live])
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        values = self.values
+        return ((key, values[i]) for key, i in self.positions.items())
+
+    def random_key(self) -> bytes:
+        # tombstones are at most about half the slots, a couple of draws on average
+        while True:
+            key = self.keys[randrange(len(self.keys))]
+            if key is not None:
+                return key
+
+    def random_keys(self, count: int) -> List[bytes]:
+        """Up to `count` distinct keys picked at random"""
+        if count * 3 >= len(self.positions):
+            # a large share of the table, walking the slots costs about the reply
+            keys = self.keys
+            live = [i for i in range(len(keys)) if keys[i] is not None]
+            return [keys[i] for i in sample(live, min(count, len(live)))]
+        # few keys out of many, random draws rarely repeat
+        picked: Dict[bytes, None] = {}
+        while len(picked) < count:
+            picked[self.random_key()] = None
+        return list(picked)
+
+    def scan(self, cursor: int, count: int) -> Tuple[int, List[int]]:
+        """The slots of the live keys among `count` slots from `cursor` on, and the
+        cursor to resume from, 0 once the end is reached"""
+        start = bisect_left(self.seqs, cursor)
+        stop = min(start + count, len(self.keys))
+        keys = self.keys
+        next_cursor = self.seqs[stop] if stop < len(keys) else 0
+        return next_cursor, [i for i in range(start, stop) if keys[i] is not None]
+
+
+class HashObject(RedisObject):
+    """A hash value.
+
+    Small hashes are a flat [field, value, field, value ...] list (the listpack
+    encoding): no per-entry hashing overhead, lookups are a C level scan of at most
+    MAX_LISTPACK_ENTRIES fields. Past either threshold the hash is promoted to an
+    OrderedTable for O(1) access and stays one.
+    """
+
+    __slots__ = ("value",)
+    type = OBJ_HASH
+
+    # like redis' hash-max-listpack-entries / hash-max-listpack-value, set from the command line
+    MAX_LISTPACK_ENTRIES = 128
+    MAX_LISTPACK_VALUE = 64
+
+    def __init__(self):
+        self.value: Union[List[bytes], OrderedTable] = []
+
+    def __len__(self) -> int:
+        return len(self.value) if isinstance(self.value, OrderedTable) else len(self.value) // 2
+
+    @property
+    def encoding(self) -> str:
+        return "hashtable" if isinstance(self.value, OrderedTable) else "listpack"
+
+    def find(self, field: bytes) -> int:
+        """Position of a field in the listpack, -1 if missing"""
+        packed = self.value
+        i = 0
+        while True:
+            try:
+                i = packed.index(field, i)
+            except ValueError:
+                return -1
+            if i % 2 == 0:
+                return i
+            # matched a value, keep looking from the next field
+            i += 1
+
+    def get(self, field: bytes) -> Optional[bytes]:
+        if isinstance(self.value, OrderedTable):
+            return self.value.get(field)
+        i = self.find(field)
+        return self.value[i + 1] if i != -1 else None
+
+    def set(self, field: bytes, value: bytes) -> bool:
+        """Returns True when the field is new"""
+        if not isinstance(self.value, OrderedTable):
+            i = self.find(field)
+            if i != -1 and len(value) <= self.MAX_LISTPACK_VALUE:
+                self.value[i + 1] = value
+                return False
+            if i == -1 and (
+                len(self.value) // 2 < self.MAX_LISTPACK_ENTRIES
+                and len(field) <= self.MAX_LISTPACK_VALUE
+                and len(value) <= self.MAX_LISTPACK_VALUE
+            ):
+                self.value += (field, value)
+                return True
+            table = OrderedTable(with_values=True)
+            for item in self.items():
+                table.set(*item)
+            self.value = table
+        return self.value.set(field, value)
+
+    def delete(self, field: bytes) -> bool:
+        if isinstance(self.value, OrderedTable):
+            return self.value.delete(field)
+        i = self.find(field)
+        if i == -1:
+            return False
+        del self.value[i:i + 2]
+        return True
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        if isinstance(self.value, OrderedTable):
+            return self.value.items()
+        packed = self.value
+        return zip(packed[::2], packed[1::2])
+
+    def scan(self, cursor: int, count: int) -> Tuple[int, List[Tuple[bytes, bytes]]]:
+        """A page of HSCAN: (next cursor, (field, value) pairs). A listpack is
+        returned in one go, like redis does"""
+        if not isinstance(self.value, OrderedTable):
+            return 0, list(self.items())
+        table = self.value
+        next_cursor, slots = table.scan(cursor, count)
+        return next_cursor, [(table.keys[i], table.values[i]) for i in slots]
+
+
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+
+
+def as_int64(value: bytes) -> Optional[int]:
+    """The integer a member is the canonical text of (no sign, spaces or zero padding tricks), else None"""
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    if b"%d" % number != value or not INT64_MIN <= number <= INT64_MAX:
+        return None
+    return number
+
+
+class SetObject(RedisObject):
+    """A set value.
+
+    Sets of integers are a sorted array of int64 (the intset encoding): 8 bytes a
+    member and a bisect per lookup. The first non integer member, or growing past
+    MAX_INTSET_ENTRIES, converts it to a python set of bytes for good.
+    """
+
+    __slots__ = ("value",)
+    type = OBJ_SET
+
+    # like redis' set-max-intset-entries, set from the command line
+    MAX_INTSET_ENTRIES = 512
+
+    def __init__(self, members: Iterable[bytes] = ()):
+        self.value: Union[array, OrderedTable] = array("q")
+        for member in members:
+            self.add(member)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def __iter__(self) -> Iterator[bytes]:
+        if isinstance(self.value, OrderedTable):
+            return iter(self.value)
+        return (b"%d" % number for number in self.value)
+
+    def __contains__(self, member: bytes) -> bool:
+        if isinstance(self.value, OrderedTable):
+            return member in self.value
+        number = as_int64(member)
+        if number is None:
+            return False
+        i = bisect_left(self.value, number)
+        return i < len(self.value) and self.value[i] == number
+
+    @property
+    def encoding(self) -> str:
+        return "hashtable" if isinstance(self.value, OrderedTable) else "intset"
+
+    def add(self, member: bytes) -> bool:
+        """Returns True when the member is new"""
+        if not isinstance(self.value, OrderedTable):
+            number = as_int64(member)
+            if number is not None:
+                i = bisect_left(self.value, number)
+                if i < len(self.value) and self.value[i] == number:
+                    return False
+                if len(self.value) < self.MAX_INTSET_ENTRIES:
+                    self.value.insert(i, number)
+                    return True
+            table = OrderedTable()
+            for existing in self:
+                table.set(existing)
+            self.value = table
+        return self.value.set(member)
+
+    def remove(self, member: bytes) -> bool:
+        if isinstance(self.value, OrderedTable):
+            return self.value.delete(member)
+        number = as_int64(member)
+        if number is None:
+            return False
+        i = bisect_left(self.value, number)
+        if i == len(self.value) or self.value[i] != number:
+            return False
+        del self.value[i]
+        return True
+
+    def random_members(self, count: int) -> List[bytes]:
+        """Up to `count` distinct members picked at random"""
+        if isinstance(self.value, OrderedTable):
+            return self.value.random_keys(count)
+        count = min(count, len(self.value))
+        return [b"%d" % self.value[i] for i in sample(range(len(self.value)), count)]
+
+    def random_member(self) -> bytes:
+        if isinstance(self.value, OrderedTable):
+            return self.value.random_key()
+        return b"%d" % self.value[randrange(len(self.value))]
+
+    def scan(self, cursor: int, count: int) -> Tuple[int, List[bytes]]:
+        """A page of SSCAN: (next cursor, members). An intset is returned in one
+        go, like redis does"""
+        if not isinstance(self.value, OrderedTable):
+            return 0, list(self)
+        table = self.value
+        next_cursor, slots = table.scan(cursor, count)
+        return next_cursor, [table.keys[i] for i in slots]
+
+
+class SkipListNode:
+    __slots__ = ("member", "score", "backward", "forward", "span")
+
+    def __init__(self, member: Optional[bytes], score: float, level: int):
+        self.member = member
+        self.score = score
+        self.backward: Optional[SkipListNode] = None
+        self.forward: List[Optional[SkipListNode]] = [None] * level
+        # number of level 0 nodes each forward link jumps over, for ranks
+        self.span: List[int] = [0] * level
+
+
+class SkipList:
+    """Redis' zskiplist: nodes ordered by (score, member) with spans on every link,
+    so inserts, deletes, rank lookups and seeking to a rank or a score are O(log n)."""
+
+    __slots__ = ("header", "tail", "length", "level")
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self.header = SkipListNode(None, 0, self.MAX_LEVEL)
+        self.tail: Optional[SkipListNode] = None
+        self.length = 0
+        self.level = 1
+
+    def random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and random() < self.P:
+            level += 1
+        return level
+
+    def insert(self, score: float, member: bytes) -> SkipListNode:
+        """Insert a member that is not in the list yet"""
+        update = [self.header] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        x = self.header
+        for i in range(self.level - 1, -1, -1):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while x.forward[i] is not None and (
+                x.forward[i].score < score or (x.forward[i].score == score and x.forward[i].member < member)
+            ):
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+        level = self.random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                self.header.span[i] = self.length
+            self.level = level
+        x = SkipListNode(member, score, level)
+        for i in range(level):
+            x.forward[i] = update[i].forward[i]
+            update[i].forward[i] = x
+            x.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        x.backward = None if update[0] is self.header else update[0]
+        if x.forward[0] is not None:
+            x.forward[0].backward = x
+        else:
+            self.tail = x
+        self.length += 1
+        return x
+
+    def delete(self, score: float, member: bytes) -> bool:
+        update = [self.header] * self.MAX_LEVEL
+        x = self.header
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and (
+                x.forward[i].score < score or (x.forward[i].score == score and x.forward[i].member < member)
+            ):
+                x = x.forward[i]
+            update[i] = x
+        x = x.forward[0]
+        if x is None or x.score != score or x.member != member:
+            return False
+        for i in range(self.level):
+            if update[i].forward[i] is x:
+                update[i].span[i] += x.span[i] - 1
+                update[i].forward[i] = x.forward[i]
+            else:
+                update[i].span[i] -= 1
+        if x.forward[0] is not None:
+            x.forward[0].backward = x.backward
+        else:
+            self.tail = x.backward
+        while self.level > 1 and self.header.forward[self.level - 1] is None:
+            self.level -= 1
+        self.length -= 1
+        return True
+
+    def rank(self, score: float, member: bytes) -> int:
+        """0 based rank of an element that is in the list"""
+        rank = 0
+        x = self.header
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and (
+                x.forward[i].score < score or (x.forward[i].score == score and x.forward[i].member <= member)
+            ):
+                rank += x.span[i]
+                x = x.forward[i]
+            if x.member == member and x is not self.header:
+                return rank - 1
+        raise KeyError(member)
+
+    def by_rank(self, rank: int) -> Optional[SkipListNode]:
+        """Node at a 0 based rank"""
+        traversed, target = 0, rank + 1
+        x = self.header
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and traversed + x.span[i] <= target:
+                traversed += x.span[i]
+                x = x.forward[i]
+            if traversed == target:
+                return x
+        return None
+
+    def first_in_range(self, above_min: Callable[[SkipListNode], bool],
+                       below_max: Callable[[SkipListNode], bool]) -> Optional[SkipListNode]:
+        """First node inside a range, the range is given as two predicates so score
+        and lexicographic ranges share the search"""
+        x = self.header
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and not above_min(x.forward[i]):
+                x = x.forward[i]
+        x = x.forward[0]
+        return x if x is not None and below_max(x) else None
+
+    def last_in_range(self, above_min: Callable[[SkipListNode], bool],
+                      below_max: Callable[[SkipListNode], bool]) -> Optional[SkipListNode]:
+        x = self.header
+        for i in range(self.level - 1, -1, -1):
+            while x.forward[i] is not None and below_max(x.forward[i]):
+                x = x.forward[i]
+        return x if x is not self.header and above_min(x) else None
+
+
+class ZSetObject(RedisObject):
+    """A sorted set: member -> score dict for O(1) score lookups plus a skiplist
+    ordered by (score, member) for ranks and ranges"""
+
+    __slots__ = ("dict", "zsl")
+    type = OBJ_ZSET
+    encoding = "skiplist"
+
+    def __init__(self):
+        self.dict: Dict[bytes, float] = {}
+        self.zsl = SkipList()
+
+    def __len__(self) -> int:
+        return len(self.dict)
+
+    def score(self, member: bytes) -> Optional[float]:
+        return self.dict.get(member)
+
+    def add(self, member: bytes, score: float) -> bool:
+        """Set the score of a member, returns True when it was added"""
+        current = self.dict.get(member)
+        if current is not None:
+            if current != score:
+                self.zsl.delete(current, member)
+                self.zsl.insert(score, member)
+                self.dict[member] = score
+            return False
+        self.zsl.insert(score, member)
+        self.dict[member] = score
+        return True
+
+    def remove(self, member: bytes) -> bool:
+        score = self.dict.pop(member, None)
+        if score is None:
+            return False
+        self.zsl.delete(score, member)
+        return True
+
+    def rank(self, member: bytes) -> Optional[int]:
+        score = self.dict.get(member)
+        return self.zsl.rank(score, member) if score is not None else None
+
+
+StreamID = Tuple[int, int]
+StreamEntry = Tuple[StreamID, Tuple[bytes, ...]]
+
+STREAM_ID_MAX = 2**64 - 1
+
+
+class StreamChunk:
+    """A run of consecutive stream entries: parsed IDs and packed field-value tuples"""
+
+    __slots__ = ("ids", "fields")
+
+    def __init__(self):
+        self.ids: List[StreamID] = []
+        self.fields: List[Tuple[bytes, ...]] = []
+
+
+class StreamObject(RedisObject):
+    """A stream value: entries in append-only chunks of at most NODE_MAX_ENTRIES,
+    indexed by the first ID of every chunk.
+
+    IDs are stored pre-parsed as (ms, seq) integer tuples, so finding where a range
+    starts is a binary search over the chunk index and then inside one chunk,
+    O(log n), and reading k entries from there is O(k).
+    """
+
+    __slots__ = ("chunks", "first_ids", "length", "last_id", "groups")
+    type = OBJ_STREAM
+    encoding = "stream"
+
+    # same default as redis' stream-node-max-entries
+    NODE_MAX_ENTRIES = 100
+
+    def __init__(self):
+        self.chunks: List[StreamChunk] = []
+        self.first_ids: List[StreamID] = []
+        self.length = 0
+        self.last_id: StreamID = (0, 0)
+        # consumer groups by name, allocated with the first group
+        self.groups: Optional[Dict[bytes, "ConsumerGroup"]] = None
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, id: StreamID, fields: Tuple[bytes, ...]):
+        """Add an entry, `id` must be greater than `last_id`"""
+        if not self.chunks or len(self.chunks[-1].ids) >= self.NODE_MAX_ENTRIES:
+            self.chunks.append(StreamChunk())
+            self.first_ids.append(id)
+        chunk = self.chunks[-1]
+        chunk.ids.append(id)
+        chunk.fields.append(fields)
+        self.length += 1
+        self.last_id = id
+
+    def seek(self, id: StreamID, exclusive: bool = False) -> Tuple[int, int]:
+        """(chunk index, index in chunk) of the first entry >= id, or > id if exclusive"""
+        c = max(bisect_right(self.first_ids, id) - 1, 0)
+        if c >= len(self.chunks):
+            return c, 0
+        ids = self.chunks[c].ids
+        pos = bisect_right(ids, id) if exclusive else bisect_left(ids, id)
+        if pos == len(ids):
+            return c + 1, 0
+        return c, pos
+
+    def get(self, id: StreamID) -> Optional[Tuple[bytes, ...]]:
+        """Field-values of the entry with this exact ID"""
+        c, pos = self.seek(id)
+        if c < len(self.chunks) and self.chunks[c].ids[pos] == id:
+            return self.chunks[c].fields[pos]
+        return None
+
+    def delete(self, id: StreamID) -> bool:
+        """Remove one entry, dropping its chunk when it was the last one in it"""
+        c, pos = self.seek(id)
+        if c >= len(self.chunks) or self.chunks[c].ids[pos] != id:
+            return False
+        chunk = self.chunks[c]
+        del chunk.ids[pos]
+        del chunk.fields[pos]
+        if not chunk.ids:
+            del self.chunks[c]
+            del self.first_ids[c]
+        elif pos == 0:
+            self.first_ids[c] = chunk.ids[0]
+        self.length -= 1
+        return True
+
+    def trim(self, maxlen: Optional[int] = None, minid: Optional[StreamID] = None,
+             approx: bool = False, limit: Optional[int] = None) -> int:
+        """Evict the oldest entries until at most `maxlen` remain / none is below `minid`.
+
+        With `approx` only whole chunks are dropped, so trimming costs O(1) per chunk
+        and the stream may keep up to one chunk more than asked for. `limit` caps the
+        number of entries evicted in approx mode. Returns how many entries were removed.
+        """
+        removed = 0
+        chunks = self.chunks
+        while chunks:
+            chunk = chunks[0]
+            if maxlen is not None:
+                excess = self.length - maxlen
+            else:
+                excess = bisect_left(chunk.ids, minid)
+            if excess <= 0:
+                break
+            if excess >= len(chunk.ids):
+                if limit is not None and removed + len(chunk.ids) > limit:
+                    break
+                # the whole chunk goes
+                removed += len(chunk.ids)
+                self.length -= len(chunk.ids)
+                del chunks[0]
+                del self.first_ids[0]
+                continue
+            if approx:
+                break
+            del chunk.ids[:excess]
+            del chunk.fields[:excess]
+            self.first_ids[0] = chunk.ids[0]
+            removed += excess
+            self.length -= excess
+            break
+        return removed
+
+    def first(self) -> Optional[StreamEntry]:
+        for entry in self.range((0, 0), (STREAM_ID_MAX, STREAM_ID_MAX)):
+            return entry
+        return None
+
+    def last(self) -> Optional[StreamEntry]:
+        for entry in self.revrange((STREAM_ID_MAX, STREAM_ID_MAX), (0, 0)):
+            return entry
+        return None
+
+    def range(self, start: StreamID, end: StreamID, exclusive: bool = False) -> Iterator[StreamEntry]:
+        """Entries with start <= ID <= end (start < ID if exclusive), in ID order"""
+        c, pos = self.seek(start, exclusive)
+        chunks = self.chunks
+        while c < len(chunks):
+            chunk = chunks[c]
+            ids, fields = chunk.ids, chunk.fields
+            for i in range(pos, len(ids)):
+                if ids[i] > end:
+                    return
+                yield ids[i], fields[i]
+            c += 1
+            pos = 0
+
+    def revrange(self, end: StreamID, start: StreamID) -> Iterator[StreamEntry]:
+        """Entries with start <= ID <= end, newest first"""
+        c = bisect_right(self.first_ids, end) - 1
+        if c < 0:
+            return
+        chunks = self.chunks
+        pos = bisect_right(chunks[c].ids, end) - 1
+        while c >= 0:
+            chunk = chunks[c]
+            ids, fields = chunk.ids, chunk.fields
+            for i in range(pos, -1, -1):
+                if ids[i] < start:
+                    return
+                yield ids[i], fields[i]
+            c -= 1
+            if c >= 0:
+                pos = len(chunks[c].ids) - 1
+
+
+class PendingEntry:
+    """A delivered but not yet acknowledged entry of a consumer group"""
+
+    __slots__ = ("consumer", "delivery_time", "delivery_count")
+
+    def __init__(self, consumer: "Consumer", delivery_time: int):
+        self.consumer = consumer
+        self.delivery_time = delivery_time
+        self.delivery_count = 1
+
+
+class Consumer:
+    """A consumer of a group, `pending` holds the entries delivered to it"""
+
+    __slots__ = ("name", "seen_time", "active_time", "pending")
+
+    def __init__(self, name: bytes, now: int):
+        self.name = name
+        self.seen_time = now
+        self.active_time = -1
+        self.pending: Dict[StreamID, PendingEntry] = {}
+
+
+class ConsumerGroup:
+    """A consumer group: last delivered ID, consumers and the pending entries list.
+
+    The PEL is a dict by ID, so acknowledging is O(1), plus a sorted list of IDs
+    for XPENDING/XAUTOCLAIM range scans. Deliveries of new entries always have the
+    highest ID so adding to the index is an append; acknowledged IDs are skipped
+    in scans and dropped from the index once they make up half of it.
+    """
+
+    __slots__ = ("name", "last_id", "consumers", "pel", "pel_index")
+
+    def __init__(self, name: bytes, last_id: StreamID):
+        self.name = name
+        self.last_id = last_id
+        self.consumers: Dict[bytes, Consumer] = {}
+        self.pel: Dict[StreamID, PendingEntry] = {}
+        self.pel_index: List[StreamID] = []
+
+    def consumer(self, name: bytes, now: int) -> Consumer:
+        """Look up a consumer, creating it on first use"""
+        consumer = self.consumers.get(name)
+        if consumer is None:
+            consumer = self.consumers[name] = Consumer(name, now)
+        consumer.seen_time = now
+        return consumer
+
+    def add_pending(self, id: StreamID, consumer: Consumer, now: int) -> PendingEntry:
+        pending = self.pel[id] = PendingEntry(consumer, now)
+        consumer.pending[id] = pending
+        index = self.pel_index
+        if not index or index[-1] < id:
+            index.append(id)
+        else:
+            pos = bisect_left(index, id)
+            if pos == len(index) or index[pos] != id:
+                index.insert(pos, id)
+        return pending
+
+    def claim(self, id: StreamID, pending: PendingEntry, consumer: Consumer):
+        """Move a pending entry to another consumer"""
+        del pending.consumer.pending[id]
+        pending.consumer = consumer
+        consumer.pending[id] = pending
+
+    def ack(self, id: StreamID) -> bool:
+        pending = self.pel.pop(id, None)
+        if pending is None:
+            return False
+        del pending.consumer.pending[id]
+        if len(self.pel_index) > 2 * len(self.pel) + 64:
+            self.pel_index = [i for i in self.pel_index if i in self.pel]
+        return True
+
+    def pending_range(self, start: StreamID, end: StreamID) -> Iterator[Tuple[StreamID, PendingEntry]]:
+        """Pending entries with start <= ID <= end, in ID order"""
+        index, pel = self.pel_index, self.pel
+        for i in range(bisect_left(index, start), len(index)):
+            id = index[i]
+            if id > end:
+                return
+            pending = pel.get(id)
+            if pending is not None:
+                yield id, pending
+
+    def delete_consumer(self, name: bytes) -> int:
+        """Remove a consumer and its pending entries, returns how many were pending"""
+        consumer = self.consumers.pop(name, None)
+        if consumer is None:
+            return 0
+        for id in consumer.pending:
+            del self.pel[id]
+        return len(consumer.pending)
+
+
+# like redis' shared integers: small counters all point at the same int objects
+# instead of every key keeping its own copy
+SHARED_INTEGERS = 10000
+_SHARED_INTEGERS = tuple(range(SHARED_INTEGERS))
+
+
+def share_int(number: int) -> int:
+    return _SHARED_INTEGERS[number] if 0 <= number < SHARED_INTEGERS else number
+
+
+def encode_string(value: bytes) -> Union[bytes, int]:
+    """Keyspace form of a string value: the canonical text of an int64 is stored as
+    an int (redis' int encoding), anything else as the bytes themselves"""
+    if value and len(value) <= 20 and value[:1] in b"-0123456789":
+        number = as_int64(value)
+        if number is not None:
+            return share_int(number)
+    return value
+
+
+def string_bytes(entry: Union[bytes, int]) -> bytes:
+    """Bytes of a string value, whatever its encoding"""
+    return b"%d" % entry if isinstance(entry, int) else entry
+
+
+def type_of(entry) -> int:
+    """Type tag of a keyspace value"""
+    return entry.type if isinstance(entry, RedisObject) else OBJ_STRING
+
+
+def encoding_of(entry) -> str:
+    """Internal representation of a keyspace value, as reported by OBJECT ENCODING"""
+    if isinstance(entry, RedisObject):
+        return entry.encoding
+    if isinstance(entry, int):
+        return "int"
+    # redis keeps strings up to 44 bytes in the same allocation as their header
+    return "embstr" if len(entry) <= 44 else "raw"
@@ -1,10 +1,54 @@
-from typing import List, Optional
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Union
+
+CRLF = b"\r\n"
+
+# RESP version negotiated (HELLO) by the client whose command is being executed
+protocol: ContextVar[int] = ContextVar("protocol", default=2)
+
+# replies are pre-encoded up to these sizes, like redis' shared objects
+SHARED_INTEGERS = 10000
+SHARED_HEADERS = 1024
+CACHED_MESSAGES = 1024
+
+_INTEGERS = [b":%d\r\n" % i for i in range(SHARED_INTEGERS)]
+_BULK_HEADERS = [b"$%d\r\n" % i for i in range(SHARED_HEADERS)]
+_ARRAY_HEADERS = [b"*%d\r\n" % i for i in range(SHARED_HEADERS)]
+
 
 class RESPSerializer:
     """
-    Handles Redis RESP(Redis Serialization Protocol) serialization: python obj -> bytes
+    Handles Redis RESP(Redis Serialization Protocol) serialization: python obj -> bytes.
+    Nulls, maps and pushes are written as RESP2 or RESP3 depending on `protocol`.
     """
     
+    OK = b"+OK\r\n"
+    PONG = b"+PONG\r\n"
+    NULL = b"_\r\n"
+    NULL_BULK = b"$-1\r\n"
+    NULL_ARRAY = b"*-1\r\n"
+    EMPTY_ARRAY = b"*0\r\n"
+    WRONGTYPE = b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n"
+    NOT_INTEGER = b"-ERR value is not an integer or out of range\r\n"
+    SYNTAX_ERROR = b"-ERR syntax error\r\n"
+    
+    # simple strings and errors come from a small, fixed set of server messages
+    _simple_strings = {"OK": OK, "PONG": PONG}
+    _errors = {
+        WRONGTYPE[1:-2].decode(): WRONGTYPE,
+        NOT_INTEGER[1:-2].decode(): NOT_INTEGER,
+        SYNTAX_ERROR[1:-2].decode(): SYNTAX_ERROR,
+    }
+    
+    @staticmethod
+    def _cached(cache: dict, prefix: bytes, message: str) -> bytes:
+        encoded = cache.get(message)
+        if encoded is None:
+            encoded = prefix + message.encode("utf-8") + CRLF
+            if len(cache) < CACHED_MESSAGES:
+                cache[message] = encoded
+        return encoded
+    
     @staticmethod
     def serialize_simple_string(message: str) -> bytes:
         """
@@ -16,7 +60,7 @@ class RESPSerializer:
         Returns:
             bytes
         """
-        return f"+{message}\r\n".encode("utf-8")
+        return RESPSerializer._cached(RESPSerializer._simple_strings, b"+", message)
     
     @staticmethod
     def serialize_error(message: str) -> bytes:
@@ -28,7 +72,7 @@ class RESPSerializer:
         Returns:
             bytes
         """
-        return f"-{message}\r\n".encode("utf-8")
+        return RESPSerializer._cached(RESPSerializer._errors, b"-", message)
     
     @staticmethod
     def serialize_integer(value: int) -> bytes:
@@ -40,91 +84,324 @@ class RESPSerializer:
         Returns:
             bytes
         """
-        return f":{value}\r\n".encode("utf-8")
+        if 0 <= value < SHARED_INTEGERS:
+            return _INTEGERS[value]
+        return b":%d\r\n" % value
+    
+    @staticmethod
+    def format_double(value: float) -> bytes:
+        """Shortest text of a double that reads back the same, integral values without a fraction (like redis)"""
+        if value != value:
+            return b"nan"
+        if value in (float("inf"), float("-inf")):
+            return b"inf" if value > 0 else b"-inf"
+        if value.is_integer() and abs(value) < 1e17:
+            return b"%d" % value
+        return repr(value).encode()
+    
+    @staticmethod
+    def serialize_double(value: float) -> bytes:
+        """Serialize a double: ,<value>\r\n in RESP3, a bulk string in RESP2
+
+        Args:
+            value (float)
+
+        Returns:
+            bytes
+        """
+        text = RESPSerializer.format_double(value)
+        if protocol.get() == 3:
+            return b",%s\r\n" % text
+        return RESPSerializer.serialize_bulk_string(text)
     
     @staticmethod
-    def serialize_bulk_string(data: Optional[str]) -> bytes:
-        """Serialize a bulk string: $<length>\r\n<data>\r\n or _\r\n for null
+    def serialize_bulk_string(data: Optional[Union[str, bytes]]) -> bytes:
+        """Serialize a bulk string: $<length>\r\n<data>\r\n, null is $-1\r\n (RESP2) or _\r\n (RESP3).
+        The length is the byte length, so binary and non-ASCII values round-trip.
 
         Args:
-            data (Optional[str])
+            data (Optional[str | bytes])
 
         Returns:
             bytes
         """
-        if not data:
-            return b"_\r\n"
-        return f"${len(data)}\r\n{data}\r\n".encode("utf-8")
+        if data is None:
+            return RESPSerializer.NULL if protocol.get() == 3 else RESPSerializer.NULL_BULK
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(data), data)
     
     @staticmethod
-    def serialize_array(items: List[Optional[str]]) -> bytes:
+    def serialize_null_array() -> bytes:
+        """Serialize a null array (e.g. a blocking command timing out): *-1\r\n or _\r\n
+
+        Returns:
+            bytes
+        """
+        return RESPSerializer.NULL if protocol.get() == 3 else RESPSerializer.NULL_ARRAY
+    
+    @staticmethod
+    def serialize_array(items: List[Optional[Union[str, bytes, int, list, dict]]]) -> bytes:
         """Serialize an array: *<num-of-elements>\r\n<element-1>\r\n...
+        Nested items are written as chunks into one list and joined once, so the
+        cost is linear in the reply size.
 
         Args:
-            items (List[str])
+            items (List[str | bytes | int | list | dict])
 
         Returns:
             bytes
         """
         if not items:
-            return b"*0\r\n"
+            return RESPSerializer.EMPTY_ARRAY
         
-        result = f"*{len(items)}\r\n".encode("utf-8")
+        chunks: List[bytes] = []
+        RESPSerializer.write_array(chunks, items, protocol.get())
+        return b"".join(chunks)
+    
+    @staticmethod
+    def serialize_map(mapping: Dict) -> bytes:
+        """Serialize a map: %<num-of-pairs>\r\n<key-1><value-1>... in RESP3,
+        a flat *<2 * num-of-pairs> array of keys and values in RESP2
+
+        Args:
+            mapping (Dict)
+
+        Returns:
+            bytes
+        """
+        chunks: List[bytes] = []
+        RESPSerializer.write_map(chunks, mapping, protocol.get())
+        return b"".join(chunks)
+    
+    @staticmethod
+    def serialize_push(items: List) -> bytes:
+        """Serialize an out-of-band push: ><num-of-elements>\r\n... in RESP3,
+        a plain array in RESP2 where clients can't tell pushes from replies
+
+        Args:
+            items (List)
+
+        Returns:
+            bytes
+        """
+        chunks: List[bytes] = []
+        version = protocol.get()
+        RESPSerializer.write_array(chunks, items, version)
+        if version == 3:
+            chunks[0] = b">" + chunks[0][1:]
+        return b"".join(chunks)
+    
+    @staticmethod
+    def write_array(chunks: List[bytes], items: List, version: int):
+        """Append the encoding of `items` to `chunks` (writelines-style output)"""
+        n = len(items)
+        chunks.append(_ARRAY_HEADERS[n] if n < SHARED_HEADERS else b"*%d\r\n" % n)
         for item in items:
-            if item is None:
-                result += b"_\r\n"
-            elif isinstance(item, list):
-                result += RESPSerializer.serialize_array(item)
+            RESPSerializer.write_item(chunks, item, version)
+    
+    @staticmethod
+    def write_map(chunks: List[bytes], mapping: Dict, version: int):
+        """Append the encoding of `mapping` to `chunks`"""
+        n = len(mapping)
+        if version == 3:
+            chunks.append(b"%%%d\r\n" % n)
+        else:
+            chunks.append(_ARRAY_HEADERS[2 * n] if 2 * n < SHARED_HEADERS else b"*%d\r\n" % (2 * n))
+        for key, value in mapping.items():
+            RESPSerializer.write_item(chunks, key, version)
+            RESPSerializer.write_item(chunks, value, version)
+    
+    @staticmethod
+    def write_item(chunks: List[bytes], item, version: int):
+        """Append one array/map element: bulk string, integer, double, null, nested array or map"""
+        if isinstance(item, bytes):
+            n = len(item)
+            chunks.append(_BULK_HEADERS[n] if n < SHARED_HEADERS else b"$%d\r\n" % n)
+            chunks.append(item)
+            chunks.append(CRLF)
+        elif item is None:
+            chunks.append(RESPSerializer.NULL if version == 3 else RESPSerializer.NULL_BULK)
+        elif isinstance(item, list):
+            RESPSerializer.write_array(chunks, item, version)
+        elif isinstance(item, dict):
+            RESPSerializer.write_map(chunks, item, version)
+        elif isinstance(item, int):
+            chunks.append(RESPSerializer.serialize_integer(item))
+        elif isinstance(item, float):
+            text = RESPSerializer.format_double(item)
+            if version == 3:
+                chunks.append(b",%s\r\n" % text)
             else:
-                result += RESPSerializer.serialize_bulk_string(item)
-        return result
+                chunks.append(b"$%d\r\n%s\r\n" % (len(text), text))
+        else:
+            chunks.append(RESPSerializer.serialize_bulk_string(item))
+
+
+class ProtocolError(Exception):
+    """Raised when the client sent bytes that are not a valid RESP request"""
+
+
+class PartialCommand:
+    """Arguments parsed so far of a command frame split across reads, so each read
+    resumes at the next argument instead of re-walking the frame from its start"""
+    
+    __slots__ = ("tokens", "remaining", "offset")
+    
+    def __init__(self):
+        self.tokens: Optional[List[bytes]] = None
+        # arguments still to parse, and where the next one starts from the frame start
+        self.remaining = 0
+        self.offset = 0
 
 
 class RESPParser:
     """Handles Redis RESP(Redis Serialization Protocol) parsing: bytes -> python list
     """
     
+    # same limits as redis: proto-max-bulk-len and the inline/header line length
+    MAX_BULK_LENGTH = 512 * 1024 * 1024
+    MAX_LINE_LENGTH = 64 * 1024
+    
     @staticmethod
-    def parse_request(data: bytes) -> Optional[List[str]]:
+    def parse_request(data: bytes) -> Optional[List[bytes]]:
         """
-        Parse a Redis command from bytes -> command and list of strings. 
+        Parse a single Redis command from bytes -> command and list of bulk strings. 
         Handles RESP array format: *<number-of-elements>\r\n<element-1>\r\n<element-2>\r\n...
 
         Args:
             data (bytes)
 
         Returns:
-            Optional[Tuple[str, List[str]]]
+            Optional[List[bytes]]: None if the data is not one complete, valid command
         """
         try:
-            lines = data.decode().split("\r\n")
-            if not lines or not lines[0].startswith("*"):
+            parsed = RESPParser.parse_command(data)
+        except ProtocolError as e:
+            print(f"Error parsing command: {e}")
+            return None
+        return parsed[0] if parsed else None
+    
+    @staticmethod
+    def parse_command(
+        buf: Union[bytes, bytearray], pos: int = 0, partial: Optional["PartialCommand"] = None
+    ) -> Optional[Tuple[List[bytes], int]]:
+        """
+        Incrementally parse one command starting at `pos` in a read buffer.
+        Lengths are taken from the `*<n>`/`$<len>` headers, so a frame may be split
+        across several reads and several frames may share one read (pipelining).
+        Payloads are sliced by length and never decoded, so arguments are binary safe
+        and each one is copied exactly once out of the buffer.
+
+        Args:
+            buf (bytes | bytearray): per-connection read buffer
+            pos (int): offset of the first unparsed byte
+            partial (PartialCommand): per-connection progress on a frame split across
+                reads. An incomplete frame leaves its parsed arguments there, the next
+                call for the same frame resumes after them instead of from `pos`
+
+        Raises:
+            ProtocolError: the buffer does not hold a valid RESP array of bulk strings
+
+        Returns:
+            Optional[Tuple[List[bytes], int]]: (tokens, offset after the command) or None
+            if the buffer does not hold a complete command yet
+        """
+        if partial is not None and partial.tokens is not None:
+            tokens, remaining = partial.tokens, partial.remaining
+            frame, pos = pos, pos + partial.offset
+        else:
+            end = RESPParser._find_line(buf, pos)
+            if end < 0:
                 return None
+            if buf[pos] != 42:  # "*"
+                raise ProtocolError(f"expected '*', got '{chr(buf[pos])}'")
             
-            num_elements = int(lines[0][1:])
-            if num_elements <= 0:
-                return []
-            
-            tokens = []
+            tokens, remaining = [], RESPParser._parse_length(buf, pos + 1, end, "multibulk")
+            frame, pos = pos, end + 2
+        size = len(buf)
+        
+        with memoryview(buf) as view:
+            while remaining:
+                end = RESPParser._find_line(buf, pos)
+                if end < 0:
+                    break
+                if buf[pos] != 36:  # "$"
+                    raise ProtocolError(f"expected '$', got '{chr(buf[pos])}'")
+                
+                length = RESPParser._parse_length(buf, pos + 1, end, "bulk")
+                start = end + 2
+                if size < start + length + 2:
+                    break
+                
+                tokens.append(view[start:start + length].tobytes())
+                pos = start + length + 2
+                remaining -= 1
+            else:
+                if partial is not None:
+                    partial.tokens = None
+                return tokens, pos
+        
+        if partial is not None:
+            partial.tokens, partial.remaining, partial.offset = tokens, remaining, pos - frame
+        return None
+    
+    @staticmethod
+    def reply_end(buf: Union[bytes, bytearray], pos: int = 0) -> Optional[int]:
+        """
+        Offset just past the complete RESP2/RESP3 reply starting at `pos`, or None if
+        the buffer doesn't hold all of it yet. Used to relay replies without decoding them.
+
+        Args:
+            buf (bytes | bytearray)
+            pos (int)
+
+        Returns:
+            Optional[int]
+        """
+        size = len(buf)
+        remaining = 1
+        while remaining:
+            end = buf.find(b"\r\n", pos)
+            if end < 0:
+                return None
+            kind = buf[pos]
+            remaining -= 1
             
-            i = 1
-            while i < len(lines) and len(tokens) < num_elements:
-                # bulk string
-                if lines[i].startswith("$"):
-                    length = int(lines[i][1:])
-                    i += 1
-                    if length >= 0:
-                        tokens.append(lines[i])
-                    else:
-                        tokens.append("")
-                    i += 1
-                # simple string 
-                else:
-                    tokens.append(lines[i])
-                    i += 1
+            if kind in b"$!=":  # blob string, blob error, verbatim string
+                length = int(buf[pos + 1:end])
+                pos = end + 2
+                if length >= 0:
+                    pos += length + 2
+            elif kind in b"*~>":  # array, set, push
+                remaining += max(int(buf[pos + 1:end]), 0)
+                pos = end + 2
+            elif kind == 37:  # "%" map
+                remaining += 2 * max(int(buf[pos + 1:end]), 0)
+                pos = end + 2
+            elif kind == 124:  # "|" attributes come before the reply they annotate
+                remaining += 2 * int(buf[pos + 1:end]) + 1
+                pos = end + 2
+            else:  # single line: + - : _ , # (
+                pos = end + 2
             
-            return tokens
-        
-        except (ValueError, IndexError, UnicodeDecodeError) as e:
-            print(f"Error parsing command: {e}")
-            return None
\ No newline at end of file
+            if pos > size:
+                return None
+        return pos
+    
+    @staticmethod
+    def _find_line(buf: Union[bytes, bytearray], pos: int) -> int:
+        end = buf.find(b"\r\n", pos)
+        if end < 0 and len(buf) - pos > RESPParser.MAX_LINE_LENGTH:
+            raise ProtocolError("too big header line")
+        return end
+    
+    @staticmethod
+    def _parse_length(buf: Union[bytes, bytearray], start: int, end: int, kind: str) -> int:
+        try:
+            length = int(buf[start:end])
+        except ValueError:
+            raise ProtocolError(f"invalid {kind} length")
+        if length > RESPParser.MAX_BULK_LENGTH or (kind == "bulk" and length < 0):
+            raise ProtocolError(f"invalid {kind} length")
+        return max(length, 0)
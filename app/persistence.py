@@ -0,0 +1,165 @@
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+from app import aof, rdb
+from app.aof import AppendOnlyFile
+from app.keyspace import Keyspace
+
+if TYPE_CHECKING:
+    from app.commands.handler import RedisCommandHandler
+
+
+class Persistence:
+    """Snapshots and the append only file of a server's keyspace, and the state of the
+    background child writing either of them.
+
+    BGSAVE and BGREWRITEAOF fork, the child writes from its copy-on-write view of the
+    keyspace while the parent keeps serving, and `poll` reaps it from the server cron.
+    Only one child runs at a time, a request arriving while the other kind runs is
+    scheduled for when it exits.
+    """
+
+    def __init__(
+        self,
+        db: Keyspace,
+        dir: str = ".",
+        dbfilename: str = "dump.rdb",
+        appendonly: bool = False,
+        appendfilename: str = "appendonly.aof",
+        appendfsync: str = "everysec",
+    ):
+        self.db = db
+        self.path = os.path.join(dir, dbfilename)
+        self.aof_path = os.path.join(dir, appendfilename) if appendonly else None
+        self.appendfsync = appendfsync
+        # opened once the dataset is loaded, commands replayed from it aren't logged again
+        self.aof: Optional[AppendOnlyFile] = None
+        self.lastsave = int(time.time())
+        self.last_bgsave_ok = True
+        self.child_pid: Optional[int] = None
+        # "rdb" or "aof"
+        self.child_kind: Optional[str] = None
+        self.bgsave_scheduled = False
+        self.rewrite_scheduled = False
+        # called with the outcome of every background snapshot, sends it to replicas
+        self.on_bgsave_done: Optional[Callable[[bool], None]] = None
+
+    def load(self, handler: "RedisCommandHandler") -> Optional[int]:
+        """Restore the dataset, from the AOF when it is enabled and from the snapshot
+        otherwise. Returns the number of keys loaded, None when there was nothing to load"""
+        start = time.monotonic()
+        if self.aof_path is None:
+            loaded = rdb.load(self.db, self.path)
+        else:
+            loaded = aof.load(self.aof_path, handler)
+            if loaded is None:
+                # first start with the AOF enabled: it begins with the current snapshot
+                loaded = rdb.load(self.db, self.path)
+                rdb.save(self.db, self.aof_path)
+            self.aof = AppendOnlyFile(self.aof_path, self.appendfsync)
+        if loaded is not None:
+            print(f"DB loaded from disk: {len(self.db)} keys in {time.monotonic() - start:.3f} seconds")
+        return loaded
+
+    def flush_aof(self):
+        """Hand the commands executed since the last call to the AOF writer, see
+        AppendOnlyFile.flush"""
+        if self.aof is not None:
+            self.aof.flush()
+
+    def save(self):
+        """Write the snapshot from this process, blocking every client until it's done"""
+        rdb.save(self.db, self.path)
+        self.lastsave = int(time.time())
+
+    def fork(self, kind: str, write: Callable[[], None]):
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                write()
+                status = 0
+            except Exception as e:
+                print(f"Background {kind} child failed: {e!r}", flush=True)
+            finally:
+                # skip the parent's cleanup handlers and buffered output
+                os._exit(status)
+        self.child_pid, self.child_kind = pid, kind
+
+    def bgsave(self, schedule: bool = False) -> bool:
+        """Fork a child writing the snapshot. False if a child is already running, unless
+        it's an AOF rewrite and `schedule` asks to start once it's done"""
+        if self.child_pid is not None:
+            if self.child_kind == "aof" and schedule:
+                self.bgsave_scheduled = True
+                return True
+            return False
+        self.fork("rdb", lambda: rdb.save(self.db, self.path))
+        return True
+
+    def rewrite_temp(self, pid: int) -> str:
+        return os.path.join(os.path.dirname(self.aof_path) or ".", f"temp-rewriteaof-bg-{pid}.aof")
+
+    def bgrewriteaof(self) -> bool:
+        """Fork a child writing a compact AOF: a snapshot as its RDB preamble, the commands
+        executed meanwhile are appended by the parent once it's done. Returns False when
+        the rewrite is scheduled behind a running BGSAVE"""
+        if self.child_pid is not None:
+            self.rewrite_scheduled = True
+            return False
+        self.aof.start_rewrite()
+        try:
+            self.fork("aof", lambda: rdb.save(self.db, self.rewrite_temp(os.getpid())))
+        except OSError:
+            self.aof.abort_rewrite()
+            raise
+        return True
+
+    def poll(self):
+        """Reap a finished background child and start what was scheduled behind it"""
+        if self.child_pid is None:
+            return
+        pid, status = os.waitpid(self.child_pid, os.WNOHANG)
+        if pid == 0:
+            return
+        kind = self.child_kind
+        self.child_pid = self.child_kind = None
+        ok = os.waitstatus_to_exitcode(status) == 0
+        if kind == "rdb":
+            self.last_bgsave_ok = ok
+            if ok:
+                self.lastsave = int(time.time())
+                print("Background saving terminated with success")
+            else:
+                print("Background saving error")
+            if self.on_bgsave_done is not None:
+                self.on_bgsave_done(ok)
+        else:
+            self.finish_rewrite(pid, ok)
+
+        try:
+            if self.rewrite_scheduled:
+                self.rewrite_scheduled = False
+                self.bgrewriteaof()
+            elif self.bgsave_scheduled:
+                self.bgsave_scheduled = False
+                self.bgsave()
+        except OSError as e:
+            print(f"Can't fork the scheduled background child: {e}")
+
+    def finish_rewrite(self, pid: int, ok: bool):
+        temp = self.rewrite_temp(pid)
+        if ok:
+            try:
+                self.aof.finish_rewrite(temp)
+                print("Background AOF rewrite finished successfully")
+                return
+            except OSError as e:
+                print(f"Error finishing the AOF rewrite: {e}")
+        else:
+            print("Background AOF rewrite terminated with error")
+        self.aof.abort_rewrite()
+        try:
+            os.unlink(temp)
+        except FileNotFoundError:
+            pass
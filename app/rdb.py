@@ -0,0 +1,636 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import List, Optional, Tuple, Union
+from app.keyspace import Keyspace, now_ms
+from app.objects import (
+    ConsumerGroup, Consumer, HashObject, ListObject, PendingEntry, SetObject, StreamObject, ZSetObject,
+    as_int64, encode_string, share_int, string_bytes,
+)
+
+# RDB version 11 is what redis 7.2 writes, it is the first with the v3 stream type
+RDB_VERSION = 11
+
+RDB_TYPE_STRING = 0
+RDB_TYPE_LIST = 1
+RDB_TYPE_SET = 2
+RDB_TYPE_ZSET = 3
+RDB_TYPE_HASH = 4
+RDB_TYPE_ZSET_2 = 5
+RDB_TYPE_SET_INTSET = 11
+RDB_TYPE_STREAM_LISTPACKS = 15
+RDB_TYPE_HASH_LISTPACK = 16
+RDB_TYPE_ZSET_LISTPACK = 17
+RDB_TYPE_LIST_QUICKLIST_2 = 18
+RDB_TYPE_STREAM_LISTPACKS_2 = 19
+RDB_TYPE_SET_LISTPACK = 20
+RDB_TYPE_STREAM_LISTPACKS_3 = 21
+
+RDB_OPCODE_SLOT_INFO = 244
+RDB_OPCODE_IDLE = 248
+RDB_OPCODE_FREQ = 249
+RDB_OPCODE_AUX = 250
+RDB_OPCODE_RESIZEDB = 251
+RDB_OPCODE_EXPIRETIME_MS = 252
+RDB_OPCODE_EXPIRETIME = 253
+RDB_OPCODE_SELECTDB = 254
+RDB_OPCODE_EOF = 255
+
+RDB_ENC_INT8 = 0
+RDB_ENC_INT16 = 1
+RDB_ENC_INT32 = 2
+RDB_ENC_LZF = 3
+
+QUICKLIST_NODE_CONTAINER_PLAIN = 1
+
+STREAM_ITEM_FLAG_DELETED = 1
+STREAM_ITEM_FLAG_SAMEFIELDS = 2
+
+# flush the write buffer to the file every this many bytes
+WRITE_CHUNK = 1 << 20
+
+_EXPIRETIME_MS = bytes((RDB_OPCODE_EXPIRETIME_MS,))
+_DIGITS = b"-0123456789"
+
+_pack_u64 = struct.Struct("<Q").pack
+_pack_double = struct.Struct("<d").pack
+_unpack_double = struct.Struct("<d").unpack_from
+_pack_stream_id = struct.Struct(">QQ").pack
+_unpack_stream_id = struct.Struct(">QQ").unpack_from
+
+
+class RDBError(Exception):
+    """The file is not a valid RDB snapshot, uses a feature we can't load, or a value
+    can't be encoded in one"""
+
+
+def dump_length(length: int) -> bytes:
+    if length < 64:
+        return bytes((length,))
+    if length < 16384:
+        return bytes((0x40 | (length >> 8), length & 0xFF))
+    if length <= 0xFFFFFFFF:
+        return b"\x80" + length.to_bytes(4, "big")
+    return b"\x81" + length.to_bytes(8, "big")
+
+
+def dump_string(value: Union[bytes, int]) -> bytes:
+    """A string: integers that fit 32 bits get the compact int encodings, like
+    redis' rdbTryIntegerEncoding, everything else is length prefixed"""
+    if isinstance(value, int):
+        number = value
+    else:
+        if not value or len(value) > 11 or value[0] not in _DIGITS:
+            return dump_length(len(value)) + value
+        number = as_int64(value)
+    if number is not None:
+        if -128 <= number <= 127:
+            return b"\xc0" + number.to_bytes(1, "little", signed=True)
+        if -32768 <= number <= 32767:
+            return b"\xc1" + number.to_bytes(2, "little", signed=True)
+        if -2**31 <= number < 2**31:
+            return b"\xc2" + number.to_bytes(4, "little", signed=True)
+        value = b"%d" % number
+    return dump_length(len(value)) + value
+
+
+def encode_listpack(items: List[Union[bytes, int]]) -> bytes:
+    """Serialize values as a listpack, integer strings are stored as integers like lpAppend does"""
+    parts = []
+    for item in items:
+        if not isinstance(item, int):
+            number = as_int64(item) if len(item) <= 20 else None
+            if number is not None:
+                item = number
+        if isinstance(item, int):
+            if 0 <= item <= 127:
+                entry = bytes((item,))
+            elif -4096 <= item <= 4095:
+                item &= 0x1FFF
+                entry = bytes((0xC0 | (item >> 8), item & 0xFF))
+            elif -32768 <= item <= 32767:
+                entry = b"\xf1" + item.to_bytes(2, "little", signed=True)
+            elif -2**23 <= item < 2**23:
+                entry = b"\xf2" + item.to_bytes(3, "little", signed=True)
+            elif -2**31 <= item < 2**31:
+                entry = b"\xf3" + item.to_bytes(4, "little", signed=True)
+            else:
+                entry = b"\xf4" + item.to_bytes(8, "little", signed=True)
+        elif len(item) < 64:
+            entry = bytes((0x80 | len(item),)) + item
+        elif len(item) < 4096:
+            entry = bytes((0xE0 | (len(item) >> 8), len(item) & 0xFF)) + item
+        else:
+            entry = b"\xf0" + len(item).to_bytes(4, "little") + item
+        parts.append(entry)
+        parts.append(_encode_backlen(len(entry)))
+    body = b"".join(parts)
+    count = min(len(items), 65535)
+    return (len(body) + 7).to_bytes(4, "little") + count.to_bytes(2, "little") + body + b"\xff"
+
+
+def _encode_backlen(length: int) -> bytes:
+    """Entry length written so it can be read right to left, 7 bits a byte, which is
+    how listpacks are walked backwards"""
+    if length <= 127:
+        return bytes((length,))
+    if length < 16383:
+        return bytes((length >> 7, (length & 127) | 128))
+    if length < 2097151:
+        return bytes((length >> 14, ((length >> 7) & 127) | 128, (length & 127) | 128))
+    if length < 268435455:
+        return bytes((length >> 21, ((length >> 14) & 127) | 128, ((length >> 7) & 127) | 128, (length & 127) | 128))
+    return bytes((
+        length >> 28, ((length >> 21) & 127) | 128, ((length >> 14) & 127) | 128,
+        ((length >> 7) & 127) | 128, (length & 127) | 128,
+    ))
+
+
+def decode_listpack(blob: bytes) -> List[Union[bytes, int]]:
+    """Values of a listpack, integers as ints"""
+    items = []
+    p, end = 6, len(blob) - 1
+    while p < end:
+        b = blob[p]
+        if b < 0x80:
+            items.append(b)
+            size = 1
+        elif b < 0xC0:
+            size = 1 + (b & 0x3F)
+            items.append(bytes(blob[p + 1:p + size]))
+        elif b < 0xE0:
+            number = ((b & 0x1F) << 8) | blob[p + 1]
+            items.append(number - 8192 if number >= 4096 else number)
+            size = 2
+        elif b < 0xF0:
+            size = 2 + (((b & 0x0F) << 8) | blob[p + 1])
+            items.append(bytes(blob[p + 2:p + size]))
+        elif b == 0xF0:
+            size = 5 + int.from_bytes(blob[p + 1:p + 5], "little")
+            items.append(bytes(blob[p + 5:p + size]))
+        elif 0xF1 <= b <= 0xF4:
+            width = (2, 3, 4, 8)[b - 0xF1]
+            size = 1 + width
+            items.append(int.from_bytes(blob[p + 1:p + size], "little", signed=True))
+        else:
+            raise RDBError(f"invalid listpack entry encoding {b:#x}")
+        p += size + (1 if size < 128 else 2 if size < 16383 else 3 if size < 2097151 else 4 if size < 268435455 else 5)
+    return items
+
+
+def lzf_decompress(data: bytes, length: int) -> bytes:
+    out = bytearray()
+    i, n = 0, len(data)
+    while i < n:
+        ctrl = data[i]
+        i += 1
+        if ctrl < 32:
+            # literal run of ctrl + 1 bytes
+            out += data[i:i + ctrl + 1]
+            i += ctrl + 1
+            continue
+        size = ctrl >> 5
+        if size == 7:
+            size += data[i]
+            i += 1
+        ref = len(out) - ((ctrl & 0x1F) << 8) - data[i] - 1
+        i += 1
+        for k in range(size + 2):
+            out.append(out[ref + k])
+    if len(out) != length:
+        raise RDBError("corrupt LZF compressed string")
+    return bytes(out)
+
+
+class RDBWriter:
+    """Writes a keyspace as an RDB file that redis and its tooling can read back.
+
+    The trailing CRC64 is written as zero, which redis treats as "checksum disabled"
+    (rdbchecksum no); computing it byte by byte in python would dominate save time.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.buffer += data
+        if len(self.buffer) >= WRITE_CHUNK:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def dump(self, db: Keyspace):
+        write = self.write
+        write(b"REDIS%04d" % RDB_VERSION)
+        for name, value in ((b"redis-ver", b"7.2.0"), (b"redis-bits", b"64"), (b"ctime", b"%d" % time.time())):
+            write(bytes((RDB_OPCODE_AUX,)) + dump_string(name) + dump_string(value))
+
+        now = now_ms()
+        expires = db.expires
+        write(bytes((RDB_OPCODE_SELECTDB,)) + dump_length(0))
+        write(bytes((RDB_OPCODE_RESIZEDB,)) + dump_length(dict.__len__(db)) + dump_length(len(expires)))
+        # strings are most keys, they are appended to the buffer directly instead of through write()
+        buffer = self.buffer
+        key = None
+        try:
+            for key, entry in dict.items(db):
+                deadline = expires.get(key) if expires else None
+                if deadline is not None:
+                    if deadline <= now:
+                        continue
+                    buffer += _EXPIRETIME_MS + _pack_u64(int(deadline))
+                if type(entry) is bytes or type(entry) is int:
+                    buffer += b"\x00" + dump_string(key) + dump_string(entry)
+                    if len(buffer) >= WRITE_CHUNK:
+                        self.flush()
+                else:
+                    self.write_object(key, entry)
+        except (struct.error, OverflowError) as e:
+            raise RDBError(f"can't encode key {key!r}: {e}") from e
+        write(bytes((RDB_OPCODE_EOF,)) + _pack_u64(0))
+        self.flush()
+
+    def write_object(self, key: bytes, entry):
+        write = self.write
+        if isinstance(entry, ListObject):
+            write(bytes((RDB_TYPE_LIST,)) + dump_string(key) + dump_length(len(entry)))
+            for value in entry:
+                write(dump_string(value))
+        elif isinstance(entry, SetObject):
+            if entry.encoding == "intset":
+                write(bytes((RDB_TYPE_SET_INTSET,)) + dump_string(key) + dump_string(self.intset(entry.value)))
+                return
+            write(bytes((RDB_TYPE_SET,)) + dump_string(key) + dump_length(len(entry)))
+            for member in entry:
+                write(dump_string(member))
+        elif isinstance(entry, HashObject):
+            write(bytes((RDB_TYPE_HASH,)) + dump_string(key) + dump_length(len(entry)))
+            for field, value in entry.items():
+                write(dump_string(field) + dump_string(value))
+        elif isinstance(entry, ZSetObject):
+            write(bytes((RDB_TYPE_ZSET_2,)) + dump_string(key) + dump_length(len(entry)))
+            # redis writes members from the tail so loading inserts at the head
+            node = entry.zsl.tail
+            while node is not None:
+                write(dump_string(node.member) + _pack_double(node.score))
+                node = node.backward
+        elif isinstance(entry, StreamObject):
+            write(bytes((RDB_TYPE_STREAM_LISTPACKS_3,)) + dump_string(key))
+            self.write_stream(entry)
+        else:
+            raise RDBError(f"can't save values of type {type(entry).__name__}")
+
+    def intset(self, numbers: array) -> bytes:
+        """intset blob: integer width, count, then the sorted integers little endian"""
+        low, high = (numbers[0], numbers[-1]) if numbers else (0, 0)
+        for width, typecode in ((2, "h"), (4, "i"), (8, "q")):
+            if -2**(width * 8 - 1) <= low and high < 2**(width * 8 - 1):
+                break
+        packed = array(typecode, numbers)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return width.to_bytes(4, "little") + len(numbers).to_bytes(4, "little") + packed.tobytes()
+
+    def write_stream(self, stream: StreamObject):
+        """Stream nodes as listpacks with a master entry, like t_stream.c lays them out"""
+        write = self.write
+        write(dump_length(len(stream.chunks)))
+        for chunk in stream.chunks:
+            master_id = chunk.ids[0]
+            master_fields = chunk.fields[0][::2]
+            items: List[Union[bytes, int]] = [len(chunk.ids), 0, len(master_fields), *master_fields, 0]
+            for id, fields in zip(chunk.ids, chunk.fields):
+                names = fields[::2]
+                ms_diff, seq_diff = id[0] - master_id[0], id[1] - master_id[1]
+                if names == master_fields:
+                    items += (STREAM_ITEM_FLAG_SAMEFIELDS, ms_diff, seq_diff, *fields[1::2], len(names) + 3)
+                else:
+                    items += (0, ms_diff, seq_diff, len(names), *fields, 2 * len(names) + 4)
+            listpack = encode_listpack(items)
+            key = _pack_stream_id(*master_id)
+            write(dump_length(len(key)) + key + dump_length(len(listpack)) + listpack)
+
+        first = stream.first()
+        first_id = first[0] if first is not None else (0, 0)
+        write(dump_length(len(stream)))
+        write(dump_length(stream.last_id[0]) + dump_length(stream.last_id[1]))
+        write(dump_length(first_id[0]) + dump_length(first_id[1]))
+        # max deleted entry ID and entries added aren't tracked: 0-0 and the current length
+        write(dump_length(0) + dump_length(0) + dump_length(len(stream)))
+
+        groups = stream.groups or {}
+        write(dump_length(len(groups)))
+        for group in groups.values():
+            write(dump_string(group.name))
+            write(dump_length(group.last_id[0]) + dump_length(group.last_id[1]))
+            # entries read is unknown, saved as the invalid marker (-1)
+            write(dump_length(2**64 - 1))
+            pel = sorted(group.pel.items())
+            write(dump_length(len(pel)))
+            for id, pending in pel:
+                write(_pack_stream_id(*id) + _pack_u64(int(pending.delivery_time)) + dump_length(pending.delivery_count))
+            write(dump_length(len(group.consumers)))
+            for consumer in group.consumers.values():
+                write(dump_string(consumer.name) + _pack_u64(int(consumer.seen_time)))
+                write(_pack_u64(consumer.active_time & 0xFFFFFFFFFFFFFFFF))
+                write(dump_length(len(consumer.pending)))
+                for id in sorted(consumer.pending):
+                    write(_pack_stream_id(*id))
+
+
+class RDBReader:
+    """Loads an RDB file into a keyspace. The file is mmapped and parsed in place, so
+    no read() calls or intermediate buffers are involved besides the values themselves."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def read(self, n: int) -> bytes:
+        start = self.pos
+        self.pos = start + n
+        if self.pos > len(self.data):
+            raise RDBError("unexpected end of file")
+        return self.data[start:self.pos]
+
+    def read_byte(self) -> int:
+        byte = self.data[self.pos]
+        self.pos += 1
+        return byte
+
+    def read_length(self) -> Tuple[int, bool]:
+        """(length, True if it is a special string encoding)"""
+        first = self.read_byte()
+        kind = first >> 6
+        if kind == 0:
+            return first & 0x3F, False
+        if kind == 1:
+            return ((first & 0x3F) << 8) | self.read_byte(), False
+        if kind == 3:
+            return first & 0x3F, True
+        if first == 0x80:
+            return int.from_bytes(self.read(4), "big"), False
+        if first == 0x81:
+            return int.from_bytes(self.read(8), "big"), False
+        raise RDBError(f"unknown length encoding {first:#x}")
+
+    def read_len(self) -> int:
+        return self.read_length()[0]
+
+    def read_string(self) -> bytes:
+        length, special = self.read_length()
+        if not special:
+            return self.read(length)
+        if length == RDB_ENC_INT8:
+            return b"%d" % int.from_bytes(self.read(1), "little", signed=True)
+        if length == RDB_ENC_INT16:
+            return b"%d" % int.from_bytes(self.read(2), "little", signed=True)
+        if length == RDB_ENC_INT32:
+            return b"%d" % int.from_bytes(self.read(4), "little", signed=True)
+        if length == RDB_ENC_LZF:
+            compressed, size = self.read_len(), self.read_len()
+            return lzf_decompress(self.read(compressed), size)
+        raise RDBError(f"unknown string encoding {length}")
+
+    def load(self, db: Keyspace) -> int:
+        """Load every key that hasn't expired yet, returns how many were loaded"""
+        if self.read(5) != b"REDIS":
+            raise RDBError("not an RDB file")
+        version = int(self.read(4))
+        if version > RDB_VERSION:
+            raise RDBError(f"can't load RDB format version {version}")
+
+        now = now_ms()
+        loaded = 0
+        deadline = None
+        data = self.data
+        # the cursor is kept in a local on the fast path and synced with self.pos around
+        # the slower reads
+        pos = self.pos
+        while True:
+            opcode = data[pos]
+            pos += 1
+            if opcode == RDB_TYPE_STRING and data[pos] < 64:
+                # fast path for most keys: a short key and a short or integer value
+                end = pos + 1 + data[pos]
+                key = data[pos + 1:end]
+                size = data[end]
+                if size < 64:
+                    pos = end + 1 + size
+                    entry = encode_string(data[end + 1:pos])
+                elif 0xC0 <= size <= 0xC2:
+                    pos = end + 1 + (1 << (size - 0xC0))
+                    entry = share_int(int.from_bytes(data[end + 1:pos], "little", signed=True))
+                else:
+                    self.pos = end
+                    entry = encode_string(self.read_string())
+                    pos = self.pos
+                if deadline is None:
+                    dict.__setitem__(db, key, entry)
+                    loaded += 1
+                    continue
+            else:
+                self.pos = pos
+                if opcode == RDB_OPCODE_EOF:
+                    # CRC64 of everything before it
+                    self.read(8)
+                    break
+                if opcode == RDB_OPCODE_EXPIRETIME_MS:
+                    deadline = int.from_bytes(self.read(8), "little")
+                elif opcode == RDB_OPCODE_EXPIRETIME:
+                    deadline = int.from_bytes(self.read(4), "little") * 1000
+                elif opcode >= RDB_OPCODE_SLOT_INFO:
+                    self.skip_opcode(opcode)
+                else:
+                    key = self.read_string()
+                    entry = encode_string(self.read_string()) if opcode == RDB_TYPE_STRING else self.read_object(opcode)
+                pos = self.pos
+                if opcode >= RDB_OPCODE_SLOT_INFO:
+                    continue
+
+            if deadline is not None and deadline <= now:
+                deadline = None
+                continue
+            dict.__setitem__(db, key, entry)
+            if deadline is not None:
+                db.set_expiry(key, deadline)
+                deadline = None
+            loaded += 1
+        return loaded
+
+    def skip_opcode(self, opcode: int):
+        """Skip metadata we don't use: db numbers, size hints, aux fields, LRU/LFU info"""
+        if opcode == RDB_OPCODE_SELECTDB:
+            self.read_len()
+        elif opcode == RDB_OPCODE_RESIZEDB:
+            self.read_len()
+            self.read_len()
+        elif opcode == RDB_OPCODE_AUX:
+            self.read_string()
+            self.read_string()
+        elif opcode == RDB_OPCODE_IDLE:
+            self.read_len()
+        elif opcode == RDB_OPCODE_FREQ:
+            self.read_byte()
+        elif opcode == RDB_OPCODE_SLOT_INFO:
+            for _ in range(3):
+                self.read_len()
+        else:
+            raise RDBError(f"unsupported RDB opcode {opcode}")
+
+    def read_object(self, rdb_type: int):
+        if rdb_type == RDB_TYPE_STRING:
+            return encode_string(self.read_string())
+        if rdb_type == RDB_TYPE_LIST:
+            return ListObject(self.read_string() for _ in range(self.read_len()))
+        if rdb_type == RDB_TYPE_LIST_QUICKLIST_2:
+            entry = ListObject()
+            for _ in range(self.read_len()):
+                container = self.read_len()
+                blob = self.read_string()
+                if container == QUICKLIST_NODE_CONTAINER_PLAIN:
+                    entry.append(blob)
+                else:
+                    entry.extend(string_bytes(item) for item in decode_listpack(blob))
+            return entry
+        if rdb_type == RDB_TYPE_SET:
+            return SetObject(self.read_string() for _ in range(self.read_len()))
+        if rdb_type == RDB_TYPE_SET_INTSET:
+            blob = self.read_string()
+            width, count = int.from_bytes(blob[:4], "little"), int.from_bytes(blob[4:8], "little")
+            numbers = array({2: "h", 4: "i", 8: "q"}[width], blob[8:8 + width * count])
+            if sys.byteorder == "big":
+                numbers.byteswap()
+            return SetObject(b"%d" % number for number in numbers)
+        if rdb_type == RDB_TYPE_SET_LISTPACK:
+            return SetObject(string_bytes(item) for item in decode_listpack(self.read_string()))
+        if rdb_type == RDB_TYPE_HASH:
+            entry = HashObject()
+            for _ in range(self.read_len()):
+                entry.set(self.read_string(), self.read_string())
+            return entry
+        if rdb_type == RDB_TYPE_HASH_LISTPACK:
+            entry = HashObject()
+            items = decode_listpack(self.read_string())
+            for i in range(0, len(items), 2):
+                entry.set(string_bytes(items[i]), string_bytes(items[i + 1]))
+            return entry
+        if rdb_type in (RDB_TYPE_ZSET, RDB_TYPE_ZSET_2):
+            entry = ZSetObject()
+            for _ in range(self.read_len()):
+                member = self.read_string()
+                if rdb_type == RDB_TYPE_ZSET_2:
+                    score = _unpack_double(self.read(8))[0]
+                else:
+                    # old format: the score as text with a one byte length
+                    score = float(self.read(self.read_byte()))
+                entry.add(member, score)
+            return entry
+        if rdb_type == RDB_TYPE_ZSET_LISTPACK:
+            entry = ZSetObject()
+            items = decode_listpack(self.read_string())
+            for i in range(0, len(items), 2):
+                entry.add(string_bytes(items[i]), float(string_bytes(items[i + 1])))
+            return entry
+        if rdb_type in (RDB_TYPE_STREAM_LISTPACKS, RDB_TYPE_STREAM_LISTPACKS_2, RDB_TYPE_STREAM_LISTPACKS_3):
+            return self.read_stream(rdb_type)
+        raise RDBError(f"can't load values of RDB type {rdb_type}")
+
+    def read_stream(self, rdb_type: int) -> StreamObject:
+        stream = StreamObject()
+        for _ in range(self.read_len()):
+            master_ms, master_seq = _unpack_stream_id(self.read_string())
+            items = decode_listpack(self.read_string())
+            count, deleted, num_master = items[0], items[1], items[2]
+            master_fields = [string_bytes(field) for field in items[3:3 + num_master]]
+            # skip the master entry terminator
+            p = 4 + num_master
+            for _ in range(count + deleted):
+                flags, ms, seq = items[p], master_ms + items[p + 1], master_seq + items[p + 2]
+                p += 3
+                if flags & STREAM_ITEM_FLAG_SAMEFIELDS:
+                    values = items[p:p + num_master]
+                    p += num_master
+                    fields = []
+                    for name, value in zip(master_fields, values):
+                        fields += (name, string_bytes(value))
+                else:
+                    num_fields = items[p]
+                    fields = [string_bytes(item) for item in items[p + 1:p + 1 + 2 * num_fields]]
+                    p += 1 + 2 * num_fields
+                # lp-count
+                p += 1
+                if not flags & STREAM_ITEM_FLAG_DELETED:
+                    stream.append((ms, seq), tuple(fields))
+
+        self.read_len()
+        stream.last_id = (self.read_len(), self.read_len())
+        if rdb_type >= RDB_TYPE_STREAM_LISTPACKS_2:
+            # first ID, max deleted entry ID, entries added
+            for _ in range(5):
+                self.read_len()
+
+        groups = self.read_len()
+        if groups:
+            stream.groups = {}
+        for _ in range(groups):
+            group = ConsumerGroup(self.read_string(), (self.read_len(), self.read_len()))
+            if rdb_type >= RDB_TYPE_STREAM_LISTPACKS_2:
+                self.read_len()
+            for _ in range(self.read_len()):
+                id = _unpack_stream_id(self.read(16))
+                pending = PendingEntry(None, int.from_bytes(self.read(8), "little"))
+                pending.delivery_count = self.read_len()
+                group.pel[id] = pending
+            group.pel_index = sorted(group.pel)
+            for _ in range(self.read_len()):
+                consumer = Consumer(self.read_string(), int.from_bytes(self.read(8), "little"))
+                if rdb_type >= RDB_TYPE_STREAM_LISTPACKS_3:
+                    consumer.active_time = int.from_bytes(self.read(8), "little", signed=True)
+                for _ in range(self.read_len()):
+                    id = _unpack_stream_id(self.read(16))
+                    pending = group.pel[id]
+                    pending.consumer = consumer
+                    consumer.pending[id] = pending
+                group.consumers[consumer.name] = consumer
+            stream.groups[group.name] = group
+        return stream
+
+
+def save(db: Keyspace, path: str):
+    """Write a snapshot to a temporary file and rename it over `path`, so a crash
+    mid-save never leaves a truncated snapshot behind"""
+    temp = os.path.join(os.path.dirname(path) or ".", f"temp-{os.getpid()}.rdb")
+    try:
+        with open(temp, "wb") as file:
+            RDBWriter(file).dump(db)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, path)
+    except Exception:
+        # a failed save leaves nothing behind in the directory
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+
+def load(db: Keyspace, path: str) -> Optional[int]:
+    """Load a snapshot into `db`, None when there is no file"""
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return RDBReader(data).load(db)
@@ -0,0 +1,523 @@
+import errno
+import secrets
+import selectors
+import socket
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from app import rdb
+from app.aof import encode_command
+from app.commands.base import Waiter
+from app.parser import PartialCommand, ProtocolError, RESPParser, RESPSerializer
+
+if TYPE_CHECKING:
+    from app.connection import ClientConnection
+    from app.main import Server
+
+# replicas acknowledge their offset this often, and retry a lost master link as often
+REPL_ACK_PERIOD = 1.0
+
+
+class ReplicationBacklog:
+    """The last `size` bytes of the replication stream, in a ring buffer.
+
+    Offsets count bytes since the stream started: `offset` is the number of bytes
+    appended so far, the backlog holds the ones at positions offset - histlen + 1 to
+    offset (1-based, like PSYNC offsets).
+    """
+
+    def __init__(self, size: int, offset: int = 0):
+        self.size = size
+        self.buffer = bytearray(size)
+        self.offset = offset
+        self.histlen = 0
+        # where the next byte is written
+        self.idx = 0
+
+    def append(self, data: bytes):
+        n = len(data)
+        self.offset += n
+        if n >= self.size:
+            self.buffer[:] = data[n - self.size:]
+            self.idx = 0
+            self.histlen = self.size
+            return
+        end = self.idx + n
+        if end <= self.size:
+            self.buffer[self.idx:end] = data
+        else:
+            split = self.size - self.idx
+            self.buffer[self.idx:] = data[:split]
+            self.buffer[:n - split] = data[split:]
+        self.idx = end % self.size
+        self.histlen = min(self.histlen + n, self.size)
+
+    def read_from(self, psync_offset: int) -> Optional[bytes]:
+        """The stream from byte `psync_offset` on, None when it left the backlog"""
+        first = self.offset - self.histlen + 1
+        if not first <= psync_offset <= self.offset + 1:
+            return None
+        length = self.offset + 1 - psync_offset
+        start = (self.idx - length) % self.size
+        if start + length <= self.size:
+            return bytes(self.buffer[start:start + length])
+        return bytes(self.buffer[start:]) + bytes(self.buffer[:start + length - self.size])
+
+
+class Replica:
+    """A client connection that turned into a replica with PSYNC.
+
+    A replica needing a full resync waits for a BGSAVE to start (wait_bgsave_start),
+    then buffers the stream executed after the fork until the snapshot is sent
+    (wait_bgsave_end), and from then on gets it as it is written (online).
+    """
+
+    __slots__ = ("conn", "state", "ack_offset", "listening_port", "pending")
+
+    def __init__(self, conn: "ClientConnection", listening_port: int):
+        self.conn = conn
+        self.state = "wait_bgsave_start"
+        self.ack_offset = 0
+        self.listening_port = listening_port
+        self.pending = bytearray()
+
+
+class Replication:
+    """Replication state of a server: the stream fed to its replicas when it is a
+    master, the link to its master when it is a replica.
+
+    A master appends every write command it propagates to the backlog and to the
+    output buffer of its online replicas, those are flushed once per event loop
+    iteration. A replica applies its master's stream as it is and proxies the same
+    bytes to its own backlog, so its offset is the master's and it can serve replicas
+    or partial resyncs of its own.
+    """
+
+    def __init__(self, server: "Server", backlog_size: int = 1024 * 1024):
+        self.server = server
+        self.backlog_size = backlog_size
+        self.replid = secrets.token_hex(20)
+        # created with the first replica, the stream isn't kept before anyone reads it
+        self.backlog: Optional[ReplicationBacklog] = None
+        self.replicas: List[Replica] = []
+        # WAIT callers: (offset to reach, replicas needed, waiter)
+        self.waiting: List[Tuple[int, int, Waiter]] = []
+        self.getack_requested = False
+        # (host, port) of the master when this server is a replica
+        self.master: Optional[Tuple[str, int]] = None
+        self.link: Optional[MasterLink] = None
+        # commands of a MULTI block from the master, applied at once when its EXEC
+        # arrives, possibly over a new link continuing the stream
+        self.transaction: Optional[List[List[bytes]]] = None
+        self.last_attempt = 0.0
+        self.last_ack = 0.0
+        server.persistence.on_bgsave_done = self.bgsave_done
+
+    @property
+    def offset(self) -> int:
+        return self.backlog.offset if self.backlog is not None else 0
+
+    @property
+    def feeding(self) -> bool:
+        """Whether write commands executed here go to a replication stream"""
+        return self.backlog is not None and self.master is None
+
+    def replicaof(self, host: str, port: int):
+        """Replicate from the given master, connecting from the next cron tick"""
+        self.master = (host, port)
+        self.server.db.replica = True
+
+    def feed(self, data: bytes):
+        """Append the encoded write commands executed by this master to the stream"""
+        if self.feeding:
+            self.append(data)
+
+    def append(self, data: bytes):
+        self.backlog.append(data)
+        for replica in self.replicas:
+            if replica.state == "online":
+                replica.conn.outbuf += data
+                self.server.pending_replies[replica.conn] = None
+            elif replica.state == "wait_bgsave_end":
+                replica.pending += data
+
+    # master side
+
+    def replconf(self, conn: "ClientConnection", args: List[bytes]) -> bytes:
+        """REPLCONF option value ...: settings sent by a replica during the handshake,
+        and the offset it acknowledges (ACK, which gets no reply)"""
+        if len(args) % 2 or not args:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'replconf' command")
+        for i in range(0, len(args), 2):
+            option, value = args[i].lower(), args[i + 1]
+            if option == b"ack":
+                if conn.replica is not None:
+                    try:
+                        conn.replica.ack_offset = max(conn.replica.ack_offset, int(value))
+                    except ValueError:
+                        pass
+                    self.check_waiting()
+                return b""
+            if option == b"listening-port":
+                try:
+                    conn.listening_port = int(value)
+                except ValueError:
+                    return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+            elif option != b"capa":
+                return RESPSerializer.serialize_error(f"ERR Unrecognized REPLCONF option: {option.decode(errors='replace')}")
+        return RESPSerializer.serialize_simple_string("OK")
+
+    def psync(self, conn: "ClientConnection", args: List[bytes]) -> bytes:
+        """PSYNC replid offset: continue from `offset` when the backlog still has it,
+        else start a full resync. The connection is a replica from here on"""
+        if len(args) != 2:
+            return RESPSerializer.serialize_error("ERR wrong number of arguments for 'psync' command")
+        if self.server.router is not None:
+            return RESPSerializer.serialize_error("ERR replication is not supported with --workers")
+        if self.master is not None and (self.link is None or self.link.state != "connected"):
+            return RESPSerializer.serialize_error("NOMASTERLINK Can't SYNC while not connected with my master")
+        try:
+            psync_offset = int(args[1])
+        except ValueError:
+            return RESPSerializer.serialize_error("ERR value is not an integer or out of range")
+
+        if conn.replica is not None:
+            self.remove(conn.replica)
+        replica = Replica(conn, conn.listening_port)
+        conn.replica = replica
+        self.replicas.append(replica)
+        if self.backlog is None:
+            self.backlog = ReplicationBacklog(self.backlog_size)
+
+        if args[0].decode(errors="replace") == self.replid:
+            stream = self.backlog.read_from(psync_offset)
+            if stream is not None:
+                replica.state = "online"
+                replica.ack_offset = psync_offset - 1
+                print(f"Partial resynchronization of replica {conn.addr}: {len(stream)} bytes")
+                return b"+CONTINUE %s\r\n%s" % (self.replid.encode(), stream)
+        print(f"Full resynchronization of replica {conn.addr}")
+        # the FULLRESYNC reply is queued once the snapshot is forked
+        self.start_bgsave()
+        return b""
+
+    def start_bgsave(self):
+        """Fork the snapshot for the replicas waiting for one, unless a child is running.
+        They are told the offset it was taken at, the stream resumes from there"""
+        waiting = [replica for replica in self.replicas if replica.state == "wait_bgsave_start"]
+        if not waiting or self.server.persistence.child_pid is not None:
+            return
+        try:
+            self.server.persistence.bgsave()
+        except OSError as e:
+            print(f"Can't fork the snapshot for replicas: {e}")
+            return
+        # the snapshot is the dataset at this offset, the stream after it is buffered
+        reply = b"+FULLRESYNC %s %d\r\n" % (self.replid.encode(), self.offset)
+        for replica in waiting:
+            replica.state = "wait_bgsave_end"
+            replica.pending.clear()
+            replica.conn.outbuf += reply
+            self.server.pending_replies[replica.conn] = None
+
+    def bgsave_done(self, ok: bool):
+        """Send the snapshot that just finished to the replicas waiting for it"""
+        waiting = [replica for replica in self.replicas if replica.state == "wait_bgsave_end"]
+        if not waiting:
+            return
+        data = None
+        if ok:
+            try:
+                with open(self.server.persistence.path, "rb") as file:
+                    data = file.read()
+            except OSError as e:
+                print(f"Can't read the snapshot for replicas: {e}")
+        for replica in waiting:
+            if data is None:
+                replica.conn.close()
+                continue
+            conn = replica.conn
+            conn.outbuf += b"$%d\r\n" % len(data)
+            conn.outbuf += data
+            conn.outbuf += replica.pending
+            replica.pending = bytearray()
+            replica.state = "online"
+            self.server.pending_replies[conn] = None
+
+    def remove(self, replica: Replica):
+        self.replicas.remove(replica)
+        self.check_waiting()
+
+    def acked(self, offset: int) -> int:
+        """Number of online replicas that acknowledged the stream up to `offset`"""
+        return sum(1 for replica in self.replicas if replica.state == "online" and replica.ack_offset >= offset)
+
+    def wait(self, numreplicas: int, timeout: float) -> bytes:
+        """WAIT: block until `numreplicas` replicas acknowledged every write made so far"""
+        offset = self.offset
+        acked = self.acked(offset)
+        if acked >= numreplicas:
+            return RESPSerializer.serialize_integer(acked)
+        self.getack_requested = True
+
+        def on_timeout() -> bytes:
+            self.waiting = [entry for entry in self.waiting if entry[2] is not waiter]
+            return RESPSerializer.serialize_integer(self.acked(offset))
+
+        waiter = Waiter(timeout, lambda: RESPSerializer.serialize_integer(self.acked(offset)), on_timeout)
+        self.waiting.append((offset, numreplicas, waiter))
+        return waiter
+
+    def check_waiting(self):
+        """Wake the WAIT callers whose replicas caught up"""
+        if not self.waiting:
+            return
+        waiting = []
+        for offset, numreplicas, waiter in self.waiting:
+            if self.acked(offset) >= numreplicas:
+                waiter.wake()
+            else:
+                waiting.append((offset, numreplicas, waiter))
+        self.waiting = waiting
+
+    def before_sleep(self):
+        """Ask the replicas for their offset once per event loop iteration, however many
+        clients called WAIT in it"""
+        if self.getack_requested:
+            self.getack_requested = False
+            self.feed(encode_command([b"REPLCONF", b"GETACK", b"*"]))
+
+    # replica side
+
+    def cron(self):
+        """Start the full resyncs waiting for a child to exit, and keep the link to the
+        master up and acknowledged"""
+        self.start_bgsave()
+        if self.master is None:
+            return
+        now = time.monotonic()
+        if self.link is None or self.link.closed:
+            if now - self.last_attempt >= REPL_ACK_PERIOD:
+                self.last_attempt = now
+                try:
+                    self.link = MasterLink(self.server, *self.master)
+                except OSError as e:
+                    print(f"Can't connect to master {self.master[0]}:{self.master[1]}: {e}")
+        elif self.link.state == "connected" and now - self.last_ack >= REPL_ACK_PERIOD:
+            self.last_ack = now
+            self.link.send_ack()
+
+    def full_sync(self, replid: str, offset: int, snapshot: bytes):
+        """Replace the dataset with the master's snapshot, the stream resumes at `offset`"""
+        db = self.server.db
+        db.clear()
+        keys = rdb.RDBReader(snapshot).load(db)
+        print(f"Full resynchronization from master: {keys} keys, offset {offset}")
+        self.replid = replid
+        self.backlog = ReplicationBacklog(self.backlog_size, offset)
+        self.transaction = None
+        # our own replicas were following a stream that no longer matches the dataset
+        for replica in list(self.replicas):
+            replica.conn.close()
+        persistence = self.server.persistence
+        if persistence.aof is not None:
+            try:
+                persistence.bgrewriteaof()
+            except OSError as e:
+                print(f"Can't rewrite the AOF after the full resync: {e}")
+
+    def role(self) -> list:
+        if self.master is None:
+            replicas = [
+                [replica.conn.addr[0].encode(), str(replica.listening_port).encode(), str(replica.ack_offset).encode()]
+                for replica in self.replicas if replica.state == "online"
+            ]
+            return [b"master", self.offset, replicas]
+        state = self.link.state if self.link is not None and not self.link.closed else "connect"
+        return [b"slave", self.master[0].encode(), self.master[1], state.encode(), self.offset if self.backlog else -1]
+
+
+class MasterLink:
+    """A replica's connection to its master.
+
+    The handshake is pipelined (PING, REPLCONF, PSYNC), then the snapshot of a full
+    resync is read, and from then on the stream is applied command by command, the
+    replies are dropped. A lost link is retried by Replication.cron with PSYNC, which
+    continues from the backlog after a short disconnect.
+    """
+
+    def __init__(self, server: "Server", host: str, port: int):
+        self.server = server
+        self.replication = server.replication
+        family, kind, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        self.sock = socket.socket(family, kind, proto)
+        self.sock.setblocking(False)
+        error = self.sock.connect_ex(address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self.sock.close()
+            raise OSError(error, errno.errorcode.get(error, "connect failed"))
+        # connecting -> handshake -> sync -> connected
+        self.state = "connecting"
+        self.inbuf = bytearray()
+        self.partial = PartialCommand()
+        self.outbuf = bytearray()
+        # replies to PING and REPLCONF still expected before the PSYNC one
+        self.handshake_replies = 0
+        self.sync_replid = ""
+        self.sync_offset = 0
+        self.snapshot_size: Optional[int] = None
+        self.closed = False
+        self.events = selectors.EVENT_WRITE
+        server.selector.register(self.sock, self.events, self)
+
+    def on_writable(self):
+        if self.state == "connecting":
+            error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                print(f"Can't connect to master: {errno.errorcode.get(error, error)}")
+                self.close()
+                return
+            self.state = "handshake"
+            replication = self.replication
+            replid, offset = ("?", -1) if replication.backlog is None else (replication.replid, replication.offset + 1)
+            for argv in (
+                [b"PING"],
+                [b"REPLCONF", b"listening-port", b"%d" % self.server.port],
+                [b"REPLCONF", b"capa", b"psync2"],
+                [b"PSYNC", replid.encode(), b"%d" % offset],
+            ):
+                self.outbuf += encode_command(argv)
+            self.handshake_replies = 3
+        self.flush()
+
+    def on_readable(self):
+        try:
+            raw = self.sock.recv(64 * 1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ConnectionError:
+            raw = b""
+
+        if not raw:
+            print("Connection with master lost")
+            self.close()
+            return
+
+        self.inbuf += raw
+        try:
+            self.process_input()
+        except (ProtocolError, rdb.RDBError, ValueError) as e:
+            print(f"Bad replication stream from master: {e}")
+            self.close()
+
+    def process_input(self):
+        pos = 0
+        while not self.closed:
+            if self.state == "handshake":
+                end = self.inbuf.find(b"\r\n", pos)
+                if end < 0:
+                    break
+                line = bytes(self.inbuf[pos:end])
+                pos = end + 2
+                if self.handshake_replies:
+                    self.handshake_replies -= 1
+                    if line[:1] == b"-":
+                        print(f"Master replied to the handshake with an error: {line.decode(errors='replace')}")
+                    continue
+                self.on_psync_reply(line)
+            elif self.state == "sync":
+                if self.snapshot_size is None:
+                    end = self.inbuf.find(b"\r\n", pos)
+                    if end < 0:
+                        break
+                    if self.inbuf[pos:pos + 1] != b"$":
+                        raise ValueError("expected the snapshot size")
+                    self.snapshot_size = int(self.inbuf[pos + 1:end])
+                    pos = end + 2
+                if len(self.inbuf) - pos < self.snapshot_size:
+                    break
+                snapshot = bytes(self.inbuf[pos:pos + self.snapshot_size])
+                pos += self.snapshot_size
+                self.snapshot_size = None
+                self.replication.full_sync(self.sync_replid, self.sync_offset, snapshot)
+                self.state = "connected"
+            else:
+                pos = self.apply(pos)
+                break
+        if pos:
+            del self.inbuf[:pos]
+
+    def on_psync_reply(self, line: bytes):
+        parts = line.decode(errors="replace").split()
+        if parts[0] == "+FULLRESYNC" and len(parts) == 3:
+            self.sync_replid, self.sync_offset = parts[1], int(parts[2])
+            self.state = "sync"
+        elif parts[0] == "+CONTINUE":
+            if len(parts) > 1:
+                self.replication.replid = parts[1]
+            print(f"Partial resynchronization from master at offset {self.replication.offset}")
+            self.state = "connected"
+        else:
+            print(f"Master refused PSYNC: {line.decode(errors='replace')}")
+            self.close()
+
+    def apply(self, pos: int) -> int:
+        """Execute the commands of the stream, returns the position after the last one"""
+        replication, handler, db = self.replication, self.server.cmd_handler, self.server.db
+        # master commands see the keys as the master saw them, expired or not
+        db.loading = True
+        try:
+            while True:
+                parsed = RESPParser.parse_command(self.inbuf, pos, self.partial)
+                if parsed is None:
+                    break
+                tokens, end = parsed
+                name = tokens[0].upper() if tokens else b""
+                if name == b"MULTI":
+                    replication.transaction = []
+                elif replication.transaction is not None:
+                    if name == b"EXEC":
+                        handler.execute_batch(replication.transaction)
+                        replication.transaction = None
+                    else:
+                        replication.transaction.append(tokens)
+                elif name == b"REPLCONF" and len(tokens) > 1 and tokens[1].upper() == b"GETACK":
+                    # the acknowledged offset doesn't include the GETACK itself
+                    self.send_ack()
+                else:
+                    response = handler.handle_command(tokens)
+                    if isinstance(response, Waiter):
+                        response.expire()
+                replication.append(bytes(self.inbuf[pos:end]))
+                pos = end
+        finally:
+            db.loading = False
+        return pos
+
+    def send_ack(self):
+        self.outbuf += encode_command([b"REPLCONF", b"ACK", b"%d" % self.replication.offset])
+        self.flush()
+
+    def flush(self):
+        if self.closed:
+            return
+        try:
+            while self.outbuf:
+                sent = self.sock.send(self.outbuf)
+                del self.outbuf[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except ConnectionError:
+            self.close()
+            return
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if self.outbuf else 0)
+        if events != self.events:
+            self.server.selector.modify(self.sock, events, self)
+            self.events = events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.server.selector.unregister(self.sock)
+        self.sock.close()
@@ -0,0 +1,175 @@
+import os
+import selectors
+import socket
+import tempfile
+from collections import deque
+from typing import Deque, List, Optional, TYPE_CHECKING
+from app.parser import RESPParser, RESPSerializer
+from app.commands.base import Waiter
+
+if TYPE_CHECKING:
+    from app.main import Server
+
+CLUSTER_SLOTS = 16384
+
+
+def _crc16_table() -> List[int]:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16(data: bytes) -> int:
+    """CRC16-CCITT (XMODEM), the checksum redis cluster uses for key slots"""
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def key_slot(key: bytes) -> int:
+    """Hash slot of a key, only the `{hash tag}` part is hashed when present"""
+    start = key.find(b"{")
+    if start >= 0:
+        end = key.find(b"}", start + 1)
+        if end > start + 1:
+            key = key[start + 1:end]
+    return crc16(key) % CLUSTER_SLOTS
+
+
+class CrossSlotError(Exception):
+    """The keys of one command are owned by different workers"""
+
+
+class ShardRouter:
+    """Maps keys to the worker process that owns them"""
+
+    def __init__(self, port: int, worker_id: int, workers: int):
+        self.port = port
+        self.worker_id = worker_id
+        self.workers = workers
+
+    def socket_path(self, worker_id: int) -> str:
+        """Unix socket a worker listens on for commands forwarded by its peers"""
+        return os.path.join(tempfile.gettempdir(), f"redis-clone-{self.port}-worker-{worker_id}.sock")
+
+    def owner(self, keys: List[bytes]) -> Optional[int]:
+        """Worker owning all `keys`, None for keyless commands"""
+        owner = None
+        for key in keys:
+            worker = key_slot(key) % self.workers
+            if owner is not None and worker != owner:
+                raise CrossSlotError("CROSSSLOT Keys in request don't hash to the same slot")
+            owner = worker
+        return owner
+
+
+class PeerLink:
+    """Connection from one client session to the worker owning the keys of its commands.
+
+    A forwarded command parks the client on a Waiter that is woken with the raw
+    reply bytes, so the peer's reply is relayed without being decoded.
+    """
+
+    def __init__(self, server: "Server", worker_id: int):
+        self.server = server
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(server.router.socket_path(worker_id))
+        self.sock.setblocking(False)
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        # one entry per reply still expected, None for replies that are dropped (HELLO,
+        # everything a forwarded transaction sends before EXEC)
+        self.pending: Deque[Optional[Waiter]] = deque()
+        self.protocol = 2
+        self.closed = False
+        self.events = selectors.EVENT_READ
+        server.selector.register(self.sock, self.events, self)
+
+    def forward(self, tokens: List[bytes], protocol: int) -> Waiter:
+        return self.forward_all([tokens], protocol)
+
+    def forward_all(self, commands: List[List[bytes]], protocol: int) -> Waiter:
+        """Forward commands in one write, only the reply of the last one is relayed
+        (a transaction: MULTI, the queued commands, EXEC)"""
+        if protocol != self.protocol:
+            # keep the peer session on the client's protocol, its HELLO reply is dropped
+            self.outbuf += RESPSerializer.serialize_array([b"HELLO", b"%d" % protocol])
+            self.pending.append(None)
+            self.protocol = protocol
+
+        waiter = Waiter(
+            None,
+            on_wake=lambda reply: reply,
+            on_timeout=lambda: None,  # no deadline, only expired when the client goes away
+        )
+        for tokens in commands[:-1]:
+            self.outbuf += RESPSerializer.serialize_array(tokens)
+            self.pending.append(None)
+        self.outbuf += RESPSerializer.serialize_array(commands[-1])
+        self.pending.append(waiter)
+        self.flush()
+        return waiter
+
+    def on_readable(self):
+        try:
+            raw = self.sock.recv(64 * 1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ConnectionError:
+            raw = b""
+
+        if not raw:
+            self.close()
+            return
+
+        self.inbuf += raw
+        pos = 0
+        while self.pending:
+            end = RESPParser.reply_end(self.inbuf, pos)
+            if end is None:
+                break
+            waiter = self.pending.popleft()
+            if waiter is not None:
+                waiter.wake(bytes(self.inbuf[pos:end]))
+            pos = end
+        del self.inbuf[:pos]
+
+    def on_writable(self):
+        self.flush()
+
+    def flush(self):
+        if self.closed:
+            return
+        try:
+            while self.outbuf:
+                sent = self.sock.send(self.outbuf)
+                del self.outbuf[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except ConnectionError:
+            self.close()
+            return
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if self.outbuf else 0)
+        if events != self.events:
+            self.server.selector.modify(self.sock, events, self)
+            self.events = events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.server.selector.unregister(self.sock)
+        self.sock.close()
+        while self.pending:
+            waiter = self.pending.popleft()
+            if waiter is not None:
+                waiter.wake(RESPSerializer.serialize_error("ERR worker connection lost"))
@@ -0,0 +1,149 @@
+"""Concurrent producers and consumers against a server: checks nothing is lost or
+duplicated and measures throughput, with --threaded and with the event loop.
+
+Producers RPUSH unique items, INCR a counter and XADD * to a stream, consumers drain
+the list with BLPOP and LPOP COUNT. Every item must be popped exactly once, the
+counter must match the pushes and stream IDs must be unique and increasing.
+
+Usage: python -m benchmarks.concurrent_clients [producers] [consumers] [items_per_producer]
+"""
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+from app.parser import RESPParser, RESPSerializer
+from tests.helpers import start_server, stop_server
+
+PORT = 6398
+
+
+class Client:
+    def __init__(self):
+        self.sock = socket.create_connection(("localhost", PORT))
+        self.buffer = bytearray()
+
+    def call(self, *args) -> bytes:
+        self.sock.sendall(RESPSerializer.serialize_array(list(args)))
+        while True:
+            end = RESPParser.reply_end(self.buffer)
+            if end is not None:
+                reply = bytes(self.buffer[:end])
+                del self.buffer[:end]
+                return reply
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("server closed the connection")
+            self.buffer += data
+
+    def call_array(self, *args) -> Optional[List[bytes]]:
+        """A reply that is an array of bulk strings, None for a null reply"""
+        reply = self.call(*args)
+        if reply in (b"*-1\r\n", b"$-1\r\n", b"_\r\n"):
+            return None
+        if reply[:1] == b"-":
+            raise RuntimeError(reply.decode())
+        return RESPParser.parse_command(reply)[0]
+
+    def close(self):
+        self.sock.close()
+
+
+def parse_id(reply: bytes) -> tuple:
+    """(ms, seq) of a stream ID bulk string reply"""
+    ms, seq = reply.split(b"\r\n")[1].split(b"-")
+    return int(ms), int(seq)
+
+
+def run(producers: int, consumers: int, items: int) -> float:
+    """Run the workload once, returns commands per second. Raises on a wrong result"""
+    produced_done = threading.Event()
+    popped: List[List[bytes]] = [[] for _ in range(consumers)]
+    commands = [0] * (producers + consumers)
+    stream_ids: List[List[tuple]] = [[] for _ in range(producers)]
+
+    def produce(p: int):
+        client = Client()
+        for i in range(items):
+            client.call("RPUSH", "queue", f"{p}:{i}")
+            client.call("INCR", "counter")
+            stream_ids[p].append(parse_id(client.call("XADD", "stream", "*", "p", str(p))))
+        commands[p] = 3 * items
+        client.close()
+
+    def consume(c: int):
+        client = Client()
+        calls = 0
+        while True:
+            # alternate a blocking single pop with a multi-element pop
+            if calls % 2:
+                reply = client.call_array("BLPOP", "queue", "0.05")
+                values = reply[1:] if reply else None
+            else:
+                values = client.call_array("LPOP", "queue", "10")
+            calls += 1
+            if values is None:
+                if produced_done.is_set() and client.call("LLEN", "queue") == b":0\r\n":
+                    break
+                continue
+            popped[c].extend(values)
+        commands[producers + c] = calls
+        client.close()
+
+    threads = [threading.Thread(target=produce, args=(p,)) for p in range(producers)]
+    threads += [threading.Thread(target=consume, args=(c,)) for c in range(consumers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads[:producers]:
+        thread.join()
+    produced_done.set()
+    for thread in threads[producers:]:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    counts = Counter(item for items_popped in popped for item in items_popped)
+    expected = {f"{p}:{i}".encode() for p in range(producers) for i in range(items)}
+    lost = expected - counts.keys()
+    duplicated = [item for item, count in counts.items() if count > 1]
+    unexpected = counts.keys() - expected
+    if lost or duplicated or unexpected:
+        raise AssertionError(
+            f"{len(lost)} lost, {len(duplicated)} duplicated, {len(unexpected)} unexpected items"
+        )
+
+    client = Client()
+    total = producers * items
+    counter = client.call("GET", "counter")
+    if counter != RESPSerializer.serialize_bulk_string(str(total)):
+        raise AssertionError(f"counter is {counter!r}, expected {total}")
+    length = client.call("XLEN", "stream")
+    client.close()
+    if length != RESPSerializer.serialize_integer(total):
+        raise AssertionError(f"stream has {length!r} entries, expected {total}")
+    # IDs are unique, and each producer saw its own grow
+    if len({id for ids in stream_ids for id in ids}) != total or any(ids != sorted(ids) for ids in stream_ids):
+        raise AssertionError("XADD * generated duplicated or decreasing IDs")
+    return sum(commands) / elapsed
+
+
+def main():
+    producers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    consumers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    items = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    for name, args in (("threaded", ["--threaded"]), ("event loop", [])):
+        # switch threads far more often than CPython's default 5ms, so unsynchronized
+        # multi-step commands would interleave
+        proc = start_server(PORT, *args, switch_interval=1e-6)
+        try:
+            throughput = run(producers, consumers, items)
+        finally:
+            stop_server(proc)
+        print(f"{name}: {producers} producers, {consumers} consumers, {producers * items} items: "
+              f"{throughput:,.0f} commands/s, nothing lost or duplicated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Latency of small LRANGE/LINDEX reads on a big list, and memory of small lists.
+
+Usage: python -m benchmarks.list_range [list_length]
+"""
+import sys
+import time
+import tracemalloc
+from app.commands.base import BlockingRegistry
+from app.commands.list import LIndexCommand, LRangeCommand, RPushCommand
+from app.keyspace import Keyspace
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db = Keyspace()
+    blocking_clients = BlockingRegistry()
+    rpush = RPushCommand(db=db, blocking_clients=blocking_clients)
+    lrange = LRangeCommand(db=db, blocking_clients=blocking_clients)
+    lindex = LIndexCommand(db=db, blocking_clients=blocking_clients)
+
+    values = [b"%d" % i for i in range(length)]
+    for i in range(0, length, 1000):
+        rpush.execute([b"big"] + values[i:i + 1000])
+
+    runs = 10_000
+    for name, command, args in (
+        ("LRANGE big 0 9", lrange, [b"big", b"0", b"9"]),
+        ("LRANGE big -10 -1", lrange, [b"big", b"-10", b"-1"]),
+        ("LINDEX big <middle>", lindex, [b"big", b"%d" % (length // 2)]),
+    ):
+        start = time.perf_counter()
+        for _ in range(runs):
+            command.execute(args)
+        print(f"{name}: {(time.perf_counter() - start) / runs * 1e6:.1f} us per call")
+
+    num_lists = 100_000
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(num_lists):
+        rpush.execute([b"small:%d" % i, b"a", b"b", b"c"])
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{num_lists} 3-element lists: {(after - before) / num_lists:.1f} bytes per key")
+
+
+if __name__ == "__main__":
+    main()
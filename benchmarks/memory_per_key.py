@@ -0,0 +1,31 @@
+"""Bytes of memory used per key for small string keys.
+
+Usage: python -m benchmarks.memory_per_key [num_keys]
+"""
+import sys
+import tracemalloc
+from app.commands.general import SetCommand
+from app.keyspace import Keyspace
+
+
+def main():
+    num_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    keys = [b"key:%d" % i for i in range(num_keys)]
+    values = [b"value:%d" % i for i in range(num_keys)]
+
+    db = Keyspace()
+    set_command = SetCommand(db=db)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for key, value in zip(keys, values):
+        set_command.execute([key, value])
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # key and value bytes are allocated by the caller (parser), only the keyspace overhead is counted
+    print(f"{num_keys} string keys: {(after - before) / num_keys:.1f} bytes of overhead per key")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,46 @@
+import signal
 import socket
-from typing import List
+import subprocess
+import sys
+import time
+from typing import List, Optional
 from app.parser import RESPSerializer
 
+
+def start_server(port: int, *args, switch_interval: Optional[float] = None) -> subprocess.Popen:
+    """
+    Start a server on `port` with extra command line `args` and wait until it accepts
+    connections. `switch_interval` runs it with sys.setswitchinterval(), so commands
+    that weren't serialized between threads would interleave.
+    """
+    if switch_interval is None:
+        cmd = [sys.executable, "-m", "app.main"]
+    else:
+        cmd = [
+            sys.executable, "-c",
+            f"import sys; sys.setswitchinterval({switch_interval}); from app.main import main; main()",
+        ]
+    proc = subprocess.Popen(
+        [*cmd, "--port", str(port), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    for _ in range(50):
+        try:
+            socket.create_connection(("localhost", port), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Server didn't start in time")
+
+
+def stop_server(proc: subprocess.Popen, crash: bool = False):
+    """Stop a server started by start_server, `crash` kills it with no chance to flush anything"""
+    proc.send_signal(signal.SIGKILL if crash else signal.SIGTERM)
+    proc.wait()
+
+
 def send_command(cmd: List, host="localhost", port=6379) -> bytes:
     """
     Send a command (text, not RESP) to the server and return raw RESP reply.
@@ -1,8 +1,8 @@
 import socket
 import time
 import pytest
-from tests.helpers import assert_command
-from app.parser import RESPSerializer
+from tests.helpers import assert_command, send_command
+from app.parser import PartialCommand, RESPParser, RESPSerializer
 
 @pytest.mark.parametrize("cmd,expected", [
     (["PING"], RESPSerializer.serialize_simple_string("PONG")),
@@ -74,7 +74,7 @@ def test_expiry(server):
     time.sleep(0.2)
     assert_command(
         ["GET", "set_expiry"],
-        b"_\r\n"  # Null bulk string in RESP3
+        b"$-1\r\n"  # Null bulk string in RESP2
     )
 
 
@@ -91,4 +91,184 @@ def test_type(server):
     assert_command(
         ["TYPE", "blah"],
         RESPSerializer.serialize_simple_string("none")
-    )
\ No newline at end of file
+    )
+
+
+def test_del(server):
+    print("\n[tester] Testing: DEL Command")
+    assert_command(["SET", "del_a", "1"], RESPSerializer.serialize_simple_string("OK"))
+    assert_command(["RPUSH", "del_b", "x"], RESPSerializer.serialize_integer(1))
+    assert_command(["DEL", "del_a", "del_b", "del_missing"], RESPSerializer.serialize_integer(2))
+    assert_command(["TYPE", "del_b"], RESPSerializer.serialize_simple_string("none"))
+    assert_command(["DEL"], RESPSerializer.serialize_error("ERR wrong number of arguments for 'del' command"))
+
+def test_many_idle_clients(server):
+    print("\n[tester] Testing: Many Idle Clients on the Event Loop")
+    clients = [socket.create_connection(("localhost", 6379)) for _ in range(500)]
+    expected = RESPSerializer.serialize_simple_string("PONG")
+
+    for s in clients[::50]:
+        s.sendall(RESPSerializer.serialize_array(["PING"]))
+        assert s.recv(1024) == expected
+
+    for s in clients:
+        s.close()
+
+
+def test_pipelining(server):
+    print("\n[tester] Testing: Pipelined Commands")
+    s = socket.create_connection(("localhost", 6379))
+    batch = b"".join(
+        RESPSerializer.serialize_array(cmd)
+        for cmd in (["SET", "pipe_k", "v1"], ["GET", "pipe_k"], ["PING"])
+    )
+    expected = (
+        RESPSerializer.serialize_simple_string("OK")
+        + RESPSerializer.serialize_bulk_string("v1")
+        + RESPSerializer.serialize_simple_string("PONG")
+    )
+    s.sendall(batch)
+
+    resp = b""
+    while len(resp) < len(expected):
+        resp += s.recv(1024)
+    assert resp == expected
+    s.close()
+
+
+def test_partial_frames_and_large_values(server):
+    print("\n[tester] Testing: Commands Split Across Reads")
+    value = "x" * 100_000
+    s = socket.create_connection(("localhost", 6379))
+    cmd = RESPSerializer.serialize_array(["SET", "big_k", value])
+    s.sendall(cmd[:7])
+    time.sleep(0.1)
+    s.sendall(cmd[7:])
+    assert s.recv(1024) == RESPSerializer.serialize_simple_string("OK")
+
+    expected = RESPSerializer.serialize_bulk_string(value)
+    s.sendall(RESPSerializer.serialize_array(["GET", "big_k"]))
+    resp = b""
+    while len(resp) < len(expected):
+        resp += s.recv(65536)
+    assert resp == expected
+    s.close()
+
+
+def test_parse_resumes_split_frames():
+    print("\n[tester] Testing: Parsing Resumes Where a Split Frame Stopped")
+    args = [b"RPUSH", b"k", b"", b"a\r\nb", b"x" * 300]
+    data = RESPSerializer.serialize_array(args) + RESPSerializer.serialize_array(["PING"])
+    buf, partial, commands = bytearray(), PartialCommand(), []
+    # one byte per read, the worst case for re-parsing
+    for i in range(len(data)):
+        buf += data[i:i + 1]
+        while (parsed := RESPParser.parse_command(buf, 0, partial)) is not None:
+            tokens, pos = parsed
+            commands.append(tokens)
+            del buf[:pos]
+    assert commands == [args, [b"PING"]] and not buf
+
+
+def test_binary_safe_values(server):
+    print("\n[tester] Testing: Binary-safe Keys and Values")
+    value = b"\x00\xff\r\n*2\r\n$3\r\nbin\xc3"
+    assert_command(
+        ["SET", b"bin\r\nkey", value],
+        RESPSerializer.serialize_simple_string("OK")
+    )
+    assert_command(
+        ["GET", b"bin\r\nkey"],
+        RESPSerializer.serialize_bulk_string(value)
+    )
+    assert_command(
+        ["SET", "empty_k", ""],
+        RESPSerializer.serialize_simple_string("OK")
+    )
+    assert_command(["GET", "empty_k"], b"$0\r\n\r\n")
+
+
+def test_hello_resp3(server):
+    print("\n[tester] Testing: HELLO / RESP3 Negotiation")
+    s = socket.create_connection(("localhost", 6379))
+
+    s.sendall(RESPSerializer.serialize_array(["GET", "hello_missing"]))
+    assert s.recv(1024) == b"$-1\r\n"
+
+    s.sendall(RESPSerializer.serialize_array(["HELLO", "3"]))
+    resp = s.recv(1024)
+    assert resp.startswith(b"%7\r\n")
+    assert b"$5\r\nproto\r\n:3\r\n" in resp
+
+    s.sendall(RESPSerializer.serialize_array(["GET", "hello_missing"]))
+    assert s.recv(1024) == b"_\r\n"
+
+    s.sendall(RESPSerializer.serialize_array(["XADD", "hello_stream", "1-1", "f", "v"]))
+    s.recv(1024)
+    s.sendall(RESPSerializer.serialize_array(["XRANGE", "hello_stream", "-", "+"]))
+    assert s.recv(1024) == b"*1\r\n*2\r\n$3\r\n1-1\r\n%1\r\n$1\r\nf\r\n$1\r\nv\r\n"
+
+    s.sendall(RESPSerializer.serialize_array(["HELLO", "4"]))
+    assert s.recv(1024).startswith(b"-NOPROTO")
+
+    s.sendall(RESPSerializer.serialize_array(["HELLO", "2"]))
+    assert s.recv(1024).startswith(b"*14\r\n")
+    s.sendall(RESPSerializer.serialize_array(["GET", "hello_missing"]))
+    assert s.recv(1024) == b"$-1\r\n"
+    s.close()
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["SET", "ttl_k", "v", "EX", "100"], RESPSerializer.serialize_simple_string("OK")),
+    (["TTL", "ttl_k"], RESPSerializer.serialize_integer(100)),
+    (["SET", "ttl_k", "v2", "KEEPTTL"], RESPSerializer.serialize_simple_string("OK")),
+    (["TTL", "ttl_k"], RESPSerializer.serialize_integer(100)),
+    (["PERSIST", "ttl_k"], RESPSerializer.serialize_integer(1)),
+    (["TTL", "ttl_k"], RESPSerializer.serialize_integer(-1)),
+    (["PERSIST", "ttl_k"], RESPSerializer.serialize_integer(0)),
+    (["EXPIRE", "ttl_k", "50", "XX"], RESPSerializer.serialize_integer(0)),
+    (["EXPIRE", "ttl_k", "50", "NX"], RESPSerializer.serialize_integer(1)),
+    (["EXPIRE", "ttl_k", "40", "GT"], RESPSerializer.serialize_integer(0)),
+    (["PEXPIRE", "ttl_k", "20000", "LT"], RESPSerializer.serialize_integer(1)),
+    (["TTL", "ttl_k"], RESPSerializer.serialize_integer(20)),
+    (["SET", "ttl_k", "v3"], RESPSerializer.serialize_simple_string("OK")),
+    (["TTL", "ttl_k"], RESPSerializer.serialize_integer(-1)),
+    (["TTL", "ttl_missing"], RESPSerializer.serialize_integer(-2)),
+    (["PTTL", "ttl_missing"], RESPSerializer.serialize_integer(-2)),
+    (["EXPIRE", "ttl_missing", "10"], RESPSerializer.serialize_integer(0)),
+    (["SET", "ttl_k", "v", "PXAT", "1"], RESPSerializer.serialize_simple_string("OK")),
+    (["GET", "ttl_k"], b"$-1\r\n"),
+    (["SET", "ttl_k", "v", "EX", "0"], RESPSerializer.serialize_error("ERR invalid expire time in 'set' command")),
+    (["SET", "ttl_k", "v", "EX", "1", "PX", "1"], RESPSerializer.serialize_error("ERR syntax error")),
+    (["SET", "ttl_nx", "v", "NX"], RESPSerializer.serialize_simple_string("OK")),
+    (["SET", "ttl_nx", "v", "NX"], b"$-1\r\n"),
+    (["SET", "ttl_xx", "v", "XX"], b"$-1\r\n"),
+    # deadlines must fit an int64 of milliseconds, snapshots can't store more
+    (["SET", "ttl_big", "v", "EX", "99999999999999999"], RESPSerializer.serialize_error("ERR invalid expire time in 'set' command")),
+    (["SET", "ttl_big", "v", "PXAT", "9223372036854775808"], RESPSerializer.serialize_error("ERR value is not an integer or out of range")),
+    (["SET", "ttl_big", "v"], RESPSerializer.serialize_simple_string("OK")),
+    (["EXPIRE", "ttl_big", "99999999999999999"], RESPSerializer.serialize_error("ERR invalid expire time in 'expire' command")),
+    (["PEXPIRE", "ttl_big", "9223372036854775807"], RESPSerializer.serialize_error("ERR invalid expire time in 'pexpire' command")),
+    (["EXPIREAT", "ttl_big", "-99999999999999999"], RESPSerializer.serialize_error("ERR invalid expire time in 'expireat' command")),
+    (["TTL", "ttl_big"], RESPSerializer.serialize_integer(-1)),
+])
+def test_expire_commands(server, cmd, expected):
+    print("\n[tester] Testing: TTL Commands and SET Expire Options")
+    assert_command(cmd, expected)
+
+
+def test_expired_key_type(server):
+    print("\n[tester] Testing: TYPE of an Expired Key")
+    assert_command(["SET", "type_exp", "v", "PX", "50"], RESPSerializer.serialize_simple_string("OK"))
+    time.sleep(0.1)
+    assert_command(["TYPE", "type_exp"], RESPSerializer.serialize_simple_string("none"))
+
+
+def test_active_expiry(server):
+    print("\n[tester] Testing: Active Expiry Reclaims Keys Nobody Reads")
+    before = int(send_command(["DBSIZE"])[1:-2])
+    for i in range(20):
+        send_command(["SET", f"active_exp_{i}", "v", "PX", "100"])
+    assert send_command(["DBSIZE"]) == RESPSerializer.serialize_integer(before + 20)
+    time.sleep(0.5)
+    assert send_command(["DBSIZE"]) == RESPSerializer.serialize_integer(before)
@@ -89,7 +89,7 @@ def test_remove_element(server):
     )
     assert_command(
         ["LPOP", "fool"],
-        b"_\r\n"   # null bulk string
+        b"$-1\r\n"   # null bulk string
     )
 
 
@@ -176,7 +176,7 @@ def test_blocking_retrieval_with_timeout(server):
     s1.sendall(RESPSerializer.serialize_array(["BLPOP", "blfoo1", "1"]))
     time.sleep(1.1)
     resp1 = s1.recv(1024)
-    assert resp1 == b"_\r\n"  # null when timeout expires
+    assert resp1 == b"*-1\r\n"  # null array when timeout expires
 
     s1.sendall(RESPSerializer.serialize_array(["BLPOP", "blfoo1", "1"]))
     time.sleep(0.5)
@@ -184,3 +184,190 @@ def test_blocking_retrieval_with_timeout(server):
     resp1 = s1.recv(1024)
     assert resp1 == RESPSerializer.serialize_array(["blfoo1", "a"])
     s1.close()
+
+
+def test_blocking_pop_multiple_keys(server):
+    print("\n[tester] Testing BLPOP/BRPOP over several keys, LPUSH wakeups and float timeouts")
+    assert_command(["RPUSH", "bmk2", "x", "y"], RESPSerializer.serialize_integer(2))
+    # first non empty key in argument order
+    assert_command(["BLPOP", "bmk1", "bmk2", "0"], RESPSerializer.serialize_array(["bmk2", "x"]))
+    assert_command(["BRPOP", "bmk1", "bmk2", "0"], RESPSerializer.serialize_array(["bmk2", "y"]))
+    # the emptied key is removed
+    assert_command(["TYPE", "bmk2"], RESPSerializer.serialize_simple_string("none"))
+
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["BRPOP", "bmk1", "bmk2", "0"]))
+    time.sleep(0.5)
+    assert_command(["LPUSH", "bmk2", "a"], RESPSerializer.serialize_integer(0))
+    assert s1.recv(1024) == RESPSerializer.serialize_array(["bmk2", "a"])
+
+    s1.sendall(RESPSerializer.serialize_array(["BLPOP", "bmk1", "0.2"]))
+    time.sleep(0.5)
+    assert s1.recv(1024) == RESPSerializer.serialize_null_array()
+    # a timed out BLPOP doesn't leave an empty list behind
+    assert_command(["TYPE", "bmk1"], RESPSerializer.serialize_simple_string("none"))
+    s1.close()
+
+    assert_command(["BLPOP", "bmk1", "-1"], RESPSerializer.serialize_error("ERR timeout is negative"))
+    assert_command(["BLPOP", "bmk1", "abc"], RESPSerializer.serialize_error("ERR timeout is not a float or out of range"))
+
+
+def test_blocking_pop_fairness(server):
+    print("\n[tester] Testing FIFO order of clients blocked on different keys")
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["BLPOP", "fair1", "fair2", "0"]))
+    time.sleep(0.3)
+    s2 = socket.create_connection(("localhost", 6379))
+    s2.sendall(RESPSerializer.serialize_array(["BLPOP", "fair2", "0"]))
+    time.sleep(0.3)
+
+    # s1 blocked first, it gets the value even though s2 only waits on this key
+    assert_command(["RPUSH", "fair2", "a"], RESPSerializer.serialize_integer(0))
+    assert s1.recv(1024) == RESPSerializer.serialize_array(["fair2", "a"])
+    assert_command(["RPUSH", "fair1", "b"], RESPSerializer.serialize_integer(1))
+    assert_command(["RPUSH", "fair2", "c"], RESPSerializer.serialize_integer(0))
+    assert s2.recv(1024) == RESPSerializer.serialize_array(["fair2", "c"])
+    s1.close()
+    s2.close()
+
+
+def test_blmove_blmpop(server):
+    print("\n[tester] Testing BLMOVE and BLMPOP")
+    assert_command(["RPUSH", "bmv_src", "a", "b"], RESPSerializer.serialize_integer(2))
+    assert_command(["BLMOVE", "bmv_src", "bmv_dst", "RIGHT", "LEFT", "0"], RESPSerializer.serialize_bulk_string("b"))
+    assert_command(["LRANGE", "bmv_dst", "0", "-1"], RESPSerializer.serialize_array(["b"]))
+
+    # a blocked BLMOVE feeds a client blocked on its destination
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["BLPOP", "bmv_chain", "0"]))
+    s2 = socket.create_connection(("localhost", 6379))
+    s2.sendall(RESPSerializer.serialize_array(["BLMOVE", "bmv_empty", "bmv_chain", "LEFT", "RIGHT", "0"]))
+    time.sleep(0.5)
+    assert_command(["RPUSH", "bmv_empty", "z"], RESPSerializer.serialize_integer(0))
+    assert s2.recv(1024) == RESPSerializer.serialize_bulk_string("z")
+    assert s1.recv(1024) == RESPSerializer.serialize_array(["bmv_chain", "z"])
+    assert_command(["TYPE", "bmv_chain"], RESPSerializer.serialize_simple_string("none"))
+
+    s2.sendall(RESPSerializer.serialize_array(["BLMOVE", "bmv_empty", "bmv_chain", "LEFT", "RIGHT", "0.1"]))
+    time.sleep(0.4)
+    assert s2.recv(1024) == RESPSerializer.serialize_bulk_string(None)
+    s1.close()
+    s2.close()
+
+    assert_command(["RPUSH", "bmp2", "a", "b", "c"], RESPSerializer.serialize_integer(3))
+    assert_command(
+        ["BLMPOP", "0", "2", "bmp1", "bmp2", "RIGHT", "COUNT", "2"],
+        RESPSerializer.serialize_array(["bmp2", ["c", "b"]])
+    )
+    assert_command(
+        ["BLMPOP", "0", "0", "bmp1", "LEFT"],
+        RESPSerializer.serialize_error("ERR numkeys should be greater than 0")
+    )
+
+
+def test_blocked_client_that_cannot_be_served(server):
+    print("\n[tester] Testing clients blocked behind a BLMOVE into a key of another type")
+    assert_command(["SET", "bwt_dst", "str"], RESPSerializer.serialize_simple_string("OK"))
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["BLMOVE", "bwt_src", "bwt_dst", "LEFT", "LEFT", "0"]))
+    time.sleep(0.3)
+    s2 = socket.create_connection(("localhost", 6379))
+    s2.sendall(RESPSerializer.serialize_array(["BLPOP", "bwt_src", "0"]))
+    time.sleep(0.3)
+
+    # the BLMOVE stays blocked, the BLPOP after it gets the value
+    assert_command(["RPUSH", "bwt_src", "x"], RESPSerializer.serialize_integer(0))
+    assert s2.recv(1024) == RESPSerializer.serialize_array(["bwt_src", "x"])
+    assert_command(["LLEN", "bwt_src"], RESPSerializer.serialize_integer(0))
+
+    # and is served once the destination can take the value
+    assert_command(["DEL", "bwt_dst"], RESPSerializer.serialize_integer(1))
+    assert_command(["RPUSH", "bwt_src", "y"], RESPSerializer.serialize_integer(0))
+    assert s1.recv(1024) == RESPSerializer.serialize_bulk_string("y")
+    assert_command(["LRANGE", "bwt_dst", "0", "-1"], RESPSerializer.serialize_array(["y"]))
+    s1.close()
+    s2.close()
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["RPUSH", "lidx", "a", "b", "c", "d"], RESPSerializer.serialize_integer(4)),
+    (["LINDEX", "lidx", "1"], RESPSerializer.serialize_bulk_string("b")),
+    (["LINDEX", "lidx", "-1"], RESPSerializer.serialize_bulk_string("d")),
+    (["LINDEX", "lidx", "4"], RESPSerializer.serialize_bulk_string(None)),
+    (["LSET", "lidx", "-2", "C"], RESPSerializer.serialize_simple_string("OK")),
+    (["LSET", "lidx", "10", "x"], RESPSerializer.serialize_error("ERR index out of range")),
+    (["LSET", "lidx_missing", "0", "x"], RESPSerializer.serialize_error("ERR no such key")),
+    (["LINSERT", "lidx", "BEFORE", "b", "a2"], RESPSerializer.serialize_integer(5)),
+    (["LINSERT", "lidx", "AFTER", "d", "e"], RESPSerializer.serialize_integer(6)),
+    (["LINSERT", "lidx", "AFTER", "zz", "e"], RESPSerializer.serialize_integer(-1)),
+    (["LINSERT", "lidx_missing", "AFTER", "a", "e"], RESPSerializer.serialize_integer(0)),
+    (["LRANGE", "lidx", "0", "-1"], RESPSerializer.serialize_array(["a", "a2", "b", "C", "d", "e"])),
+    (["LTRIM", "lidx", "1", "-2"], RESPSerializer.serialize_simple_string("OK")),
+    (["LRANGE", "lidx", "0", "-1"], RESPSerializer.serialize_array(["a2", "b", "C", "d"])),
+    (["LTRIM", "lidx", "5", "10"], RESPSerializer.serialize_simple_string("OK")),
+    (["TYPE", "lidx"], RESPSerializer.serialize_simple_string("none")),
+])
+def test_list_index_commands(server, cmd, expected):
+    print("\n[tester] Testing LINDEX, LSET, LINSERT and LTRIM")
+    assert_command(cmd, expected)
+
+
+def test_big_list_ranges(server):
+    print("\n[tester] Testing index access on a list spanning several chunks")
+    values = [str(i) for i in range(1000)]
+    s = socket.create_connection(("localhost", 6379))
+    s.sendall(RESPSerializer.serialize_array(["RPUSH", "lbig"] + values))
+    assert s.recv(1024) == RESPSerializer.serialize_integer(1000)
+    s.sendall(RESPSerializer.serialize_array(["LPUSH", "lbig", "-1", "-2"]))
+    assert s.recv(1024) == RESPSerializer.serialize_integer(1002)
+    s.close()
+    values = ["-2", "-1"] + values
+
+    assert_command(["LRANGE", "lbig", "125", "134"], RESPSerializer.serialize_array(values[125:135]))
+    assert_command(["LRANGE", "lbig", "-3", "-1"], RESPSerializer.serialize_array(values[-3:]))
+    assert_command(["LINDEX", "lbig", "500"], RESPSerializer.serialize_bulk_string(values[500]))
+    assert_command(["LINSERT", "lbig", "BEFORE", "300", "x"], RESPSerializer.serialize_integer(1003))
+    values.insert(302, "x")
+    assert_command(["LRANGE", "lbig", "300", "305"], RESPSerializer.serialize_array(values[300:306]))
+    assert_command(["LTRIM", "lbig", "250", "-250"], RESPSerializer.serialize_simple_string("OK"))
+    assert_command(["LLEN", "lbig"], RESPSerializer.serialize_integer(len(values[250:-249])))
+    assert_command(["LINDEX", "lbig", "0"], RESPSerializer.serialize_bulk_string(values[250]))
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["RPUSHX", "lops", "a"], RESPSerializer.serialize_integer(0)),
+    (["LPUSHX", "lops", "a"], RESPSerializer.serialize_integer(0)),
+    (["RPUSH", "lops", "a", "b", "a", "c", "a", "d"], RESPSerializer.serialize_integer(6)),
+    (["LPUSHX", "lops", "z"], RESPSerializer.serialize_integer(7)),
+    (["RPUSHX", "lops", "a"], RESPSerializer.serialize_integer(8)),
+    # z a b a c a d a
+    (["LPOS", "lops", "a"], RESPSerializer.serialize_integer(1)),
+    (["LPOS", "lops", "a", "RANK", "2"], RESPSerializer.serialize_integer(3)),
+    (["LPOS", "lops", "a", "RANK", "-1"], RESPSerializer.serialize_integer(7)),
+    (["LPOS", "lops", "a", "COUNT", "0"], RESPSerializer.serialize_array([1, 3, 5, 7])),
+    (["LPOS", "lops", "a", "COUNT", "2", "RANK", "-1"], RESPSerializer.serialize_array([7, 5])),
+    (["LPOS", "lops", "a", "COUNT", "0", "MAXLEN", "4"], RESPSerializer.serialize_array([1, 3])),
+    (["LPOS", "lops", "x"], RESPSerializer.serialize_bulk_string(None)),
+    (["LPOS", "lops", "a", "RANK", "0"], RESPSerializer.serialize_error(
+        "ERR RANK can't be zero: use 1 to start from the first match, 2 from the second ... or use negative to start from the end of the list"
+    )),
+    (["LREM", "lops", "-2", "a"], RESPSerializer.serialize_integer(2)),
+    (["LRANGE", "lops", "0", "-1"], RESPSerializer.serialize_array(["z", "a", "b", "a", "c", "d"])),
+    (["LREM", "lops", "0", "a"], RESPSerializer.serialize_integer(2)),
+    (["RPOP", "lops"], RESPSerializer.serialize_bulk_string("d")),
+    (["RPOP", "lops", "2"], RESPSerializer.serialize_array(["c", "b"])),
+    (["LPOP", "lops", "1"], RESPSerializer.serialize_array(["z"])),
+    (["RPOP", "lops", "1"], RESPSerializer.serialize_null_array()),
+    (["RPOP", "lops", "-1"], RESPSerializer.serialize_error("ERR value is out of range, must be positive")),
+    (["RPUSH", "lops2", "a", "b", "c"], RESPSerializer.serialize_integer(3)),
+    (["LMOVE", "lops2", "lops3", "RIGHT", "LEFT"], RESPSerializer.serialize_bulk_string("c")),
+    (["LMOVE", "lops2", "lops2", "LEFT", "RIGHT"], RESPSerializer.serialize_bulk_string("a")),
+    (["LRANGE", "lops2", "0", "-1"], RESPSerializer.serialize_array(["b", "a"])),
+    (["LMOVE", "lops_missing", "lops3", "LEFT", "RIGHT"], RESPSerializer.serialize_bulk_string(None)),
+    (["LMPOP", "2", "lops_missing", "lops2", "LEFT", "COUNT", "5"], RESPSerializer.serialize_array(["lops2", ["b", "a"]])),
+    (["LMPOP", "1", "lops2", "LEFT"], RESPSerializer.serialize_null_array()),
+    (["TYPE", "lops2"], RESPSerializer.serialize_simple_string("none")),
+])
+def test_list_commands(server, cmd, expected):
+    print("\n[tester] Testing RPOP, LMPOP, LREM, LPOS, LMOVE, RPUSHX/LPUSHX")
+    assert_command(cmd, expected)
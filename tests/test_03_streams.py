@@ -2,8 +2,11 @@ from tests.helpers import assert_command
 from app.parser import RESPSerializer
 import pytest
 import time
+import socket
 from unittest.mock import patch
-from app.commands.stream import XAddCommand
+from app.commands.base import propagation
+from app.commands.stream import XAddCommand, XTrimCommand
+from app.keyspace import Keyspace
 
 def test_xadd(server):
     print("\n[tester] Testing XADD Command")
@@ -132,3 +135,262 @@ def test_xread_streams(server, setup_commands, xread_cmd, expected):
     
     print("\n[tester] Testing XREAD STREAMS command")
     assert_command(xread_cmd, expected)
+
+
+def test_xread_block(server):
+    print("\n[tester] Testing XREAD BLOCK")
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["XREAD", "BLOCK", "0", "STREAMS", "stream_blk", "0-1"]))
+    time.sleep(0.5)
+    assert_command(["XADD", "stream_blk", "0-2", "temp", "96"], RESPSerializer.serialize_bulk_string("0-2"))
+    assert s1.recv(1024) == RESPSerializer.serialize_array([["stream_blk", [["0-2", ["temp", "96"]]]]])
+    s1.close()
+
+
+def test_xrange_across_chunks(server):
+    print("\n[tester] Testing XRANGE/XREAD on a stream spanning several chunks")
+    s = socket.create_connection(("localhost", 6379))
+    batch = b"".join(
+        RESPSerializer.serialize_array(["XADD", "stream_long", f"{i}-1", "n", str(i)])
+        for i in range(1, 251)
+    )
+    expected = b"".join(RESPSerializer.serialize_bulk_string(f"{i}-1") for i in range(1, 251))
+    s.sendall(batch)
+    resp = b""
+    while len(resp) < len(expected):
+        resp += s.recv(65536)
+    assert resp == expected
+    s.close()
+    
+    assert_command(
+        ["XRANGE", "stream_long", "99-1", "101"],
+        RESPSerializer.serialize_array([[f"{i}-1", ["n", str(i)]] for i in (99, 100, 101)])
+    )
+    assert_command(
+        ["XREAD", "STREAMS", "stream_long", "248-1"],
+        RESPSerializer.serialize_array([["stream_long", [[f"{i}-1", ["n", str(i)]] for i in (249, 250)]]])
+    )
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["XADD", "stream_page", "1-0", "a", "1"], RESPSerializer.serialize_bulk_string("1-0")),
+    (["XADD", "stream_page", "2-0", "b", "2"], RESPSerializer.serialize_bulk_string("2-0")),
+    (["XADD", "stream_page", "3-0", "c", "3"], RESPSerializer.serialize_bulk_string("3-0")),
+
+    # COUNT stops after n entries
+    (["XRANGE", "stream_page", "-", "+", "COUNT", "2"], RESPSerializer.serialize_array([
+        ["1-0", ["a", "1"]],
+        ["2-0", ["b", "2"]]
+    ])),
+    (["XRANGE", "stream_page", "-", "+", "COUNT", "0"], RESPSerializer.serialize_array([])),
+
+    # exclusive start continues after the last ID of the previous page
+    (["XRANGE", "stream_page", "(2-0", "+", "COUNT", "2"], RESPSerializer.serialize_array([
+        ["3-0", ["c", "3"]]
+    ])),
+    (["XRANGE", "stream_page", "-", "(3-0"], RESPSerializer.serialize_array([
+        ["1-0", ["a", "1"]],
+        ["2-0", ["b", "2"]]
+    ])),
+
+    # XREVRANGE takes end first and returns newest first
+    (["XREVRANGE", "stream_page", "+", "-"], RESPSerializer.serialize_array([
+        ["3-0", ["c", "3"]],
+        ["2-0", ["b", "2"]],
+        ["1-0", ["a", "1"]]
+    ])),
+    (["XREVRANGE", "stream_page", "(3-0", "-", "COUNT", "1"], RESPSerializer.serialize_array([
+        ["2-0", ["b", "2"]]
+    ])),
+    (["XRANGE", "stream_page", "-", "+", "LIMIT", "1"], RESPSerializer.serialize_error("ERR syntax error")),
+
+    # XREAD COUNT
+    (["XREAD", "COUNT", "1", "STREAMS", "stream_page", "1-0"], RESPSerializer.serialize_array([
+        ["stream_page", [["2-0", ["b", "2"]]]]
+    ])),
+])
+def test_stream_count(server, cmd, expected):
+    print("\n[tester] Testing XRANGE/XREVRANGE/XREAD COUNT")
+    assert_command(cmd, expected)
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["XGROUP", "CREATE", "stream_grp", "g1", "$"], RESPSerializer.serialize_error(
+        "ERR The XGROUP subcommand requires the key to exist. "
+        "Note that for CREATE you may want to use the MKSTREAM option to create an empty stream automatically."
+    )),
+    (["XGROUP", "CREATE", "stream_grp", "g1", "$", "MKSTREAM"], RESPSerializer.serialize_simple_string("OK")),
+    (["XGROUP", "CREATE", "stream_grp", "g1", "0"], RESPSerializer.serialize_error("BUSYGROUP Consumer Group name already exists")),
+    (["XADD", "stream_grp", "1-0", "a", "1"], RESPSerializer.serialize_bulk_string("1-0")),
+    (["XADD", "stream_grp", "2-0", "b", "2"], RESPSerializer.serialize_bulk_string("2-0")),
+    (["XADD", "stream_grp", "3-0", "c", "3"], RESPSerializer.serialize_bulk_string("3-0")),
+
+    # every entry is delivered to one consumer only
+    (["XREADGROUP", "GROUP", "g1", "alice", "COUNT", "2", "STREAMS", "stream_grp", ">"], RESPSerializer.serialize_array([
+        ["stream_grp", [["1-0", ["a", "1"]], ["2-0", ["b", "2"]]]]
+    ])),
+    (["XREADGROUP", "GROUP", "g1", "bob", "STREAMS", "stream_grp", ">"], RESPSerializer.serialize_array([
+        ["stream_grp", [["3-0", ["c", "3"]]]]
+    ])),
+    (["XREADGROUP", "GROUP", "g1", "bob", "STREAMS", "stream_grp", ">"], RESPSerializer.serialize_null_array()),
+    (["XREADGROUP", "GROUP", "missing", "bob", "STREAMS", "stream_grp", ">"], RESPSerializer.serialize_error(
+        "NOGROUP No such key 'stream_grp' or consumer group 'missing' in XREADGROUP with GROUP option"
+    )),
+
+    # history of a consumer's own pending entries
+    (["XREADGROUP", "GROUP", "g1", "alice", "STREAMS", "stream_grp", "0"], RESPSerializer.serialize_array([
+        ["stream_grp", [["1-0", ["a", "1"]], ["2-0", ["b", "2"]]]]
+    ])),
+    (["XPENDING", "stream_grp", "g1"], RESPSerializer.serialize_array([
+        3, "1-0", "3-0", [["alice", "2"], ["bob", "1"]]
+    ])),
+    (["XACK", "stream_grp", "g1", "1-0", "3-0", "9-0"], RESPSerializer.serialize_integer(2)),
+    (["XACK", "stream_grp", "g1", "1-0"], RESPSerializer.serialize_integer(0)),
+    (["XPENDING", "stream_grp", "g1"], RESPSerializer.serialize_array([
+        1, "2-0", "2-0", [["alice", "1"]]
+    ])),
+
+    # idle entries move to another consumer
+    (["XCLAIM", "stream_grp", "g1", "bob", "0", "2-0", "JUSTID"], RESPSerializer.serialize_array(["2-0"])),
+    (["XAUTOCLAIM", "stream_grp", "g1", "carol", "0", "0"], RESPSerializer.serialize_array([
+        "0-0", [["2-0", ["b", "2"]]], []
+    ])),
+    (["XPENDING", "stream_grp", "g1", "-", "+", "10", "bob"], RESPSerializer.serialize_array([])),
+    (["XGROUP", "DELCONSUMER", "stream_grp", "g1", "carol"], RESPSerializer.serialize_integer(1)),
+    (["XPENDING", "stream_grp", "g1"], RESPSerializer.serialize_array([0, None, None, None])),
+
+    # NOACK is an option before STREAMS, not any argument spelled like it
+    (["XGROUP", "CREATE", "noack", "g1", "0", "MKSTREAM"], RESPSerializer.serialize_simple_string("OK")),
+    (["XADD", "noack", "1-0", "a", "1"], RESPSerializer.serialize_bulk_string("1-0")),
+    (["XADD", "noack", "2-0", "b", "2"], RESPSerializer.serialize_bulk_string("2-0")),
+    (["XREADGROUP", "GROUP", "g1", "alice", "COUNT", "1", "STREAMS", "noack", ">"], RESPSerializer.serialize_array([
+        ["noack", [["1-0", ["a", "1"]]]]
+    ])),
+    (["XREADGROUP", "GROUP", "g1", "bob", "NOACK", "STREAMS", "noack", ">"], RESPSerializer.serialize_array([
+        ["noack", [["2-0", ["b", "2"]]]]
+    ])),
+    (["XPENDING", "noack", "g1"], RESPSerializer.serialize_array([1, "1-0", "1-0", [["alice", "1"]]])),
+])
+def test_consumer_groups(server, cmd, expected):
+    print("\n[tester] Testing stream consumer groups")
+    assert_command(cmd, expected)
+
+
+def test_xreadgroup_block(server):
+    print("\n[tester] Testing XREADGROUP BLOCK")
+    assert_command(["XGROUP", "CREATE", "stream_grp_blk", "g1", "$", "MKSTREAM"], RESPSerializer.serialize_simple_string("OK"))
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["XREADGROUP", "GROUP", "g1", "c1", "BLOCK", "0", "STREAMS", "stream_grp_blk", ">"]))
+    time.sleep(0.5)
+    assert_command(["XADD", "stream_grp_blk", "0-1", "temp", "96"], RESPSerializer.serialize_bulk_string("0-1"))
+    assert s1.recv(1024) == RESPSerializer.serialize_array([["stream_grp_blk", [["0-1", ["temp", "96"]]]]])
+    s1.close()
+    assert_command(["XPENDING", "stream_grp_blk", "g1"], RESPSerializer.serialize_array([1, "0-1", "0-1", [["c1", "1"]]]))
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["XADD", "stream_trim", "NOMKSTREAM", "1-0", "a", "1"], RESPSerializer.serialize_bulk_string(None)),
+    (["XLEN", "stream_trim"], RESPSerializer.serialize_integer(0)),
+    (["XADD", "stream_trim", "1-0", "a", "1"], RESPSerializer.serialize_bulk_string("1-0")),
+    (["XADD", "stream_trim", "2-0", "b", "2"], RESPSerializer.serialize_bulk_string("2-0")),
+    (["XADD", "stream_trim", "MAXLEN", "2", "3-0", "c", "3"], RESPSerializer.serialize_bulk_string("3-0")),
+    (["XLEN", "stream_trim"], RESPSerializer.serialize_integer(2)),
+    (["XRANGE", "stream_trim", "-", "+"], RESPSerializer.serialize_array([
+        ["2-0", ["b", "2"]],
+        ["3-0", ["c", "3"]]
+    ])),
+    (["XADD", "stream_trim", "MINID", "=", "4", "4-0", "d", "4"], RESPSerializer.serialize_bulk_string("4-0")),
+    (["XLEN", "stream_trim"], RESPSerializer.serialize_integer(1)),
+
+    # ~ only drops whole chunks, a stream that fits one chunk is left alone
+    (["XADD", "stream_trim", "5-0", "e", "5"], RESPSerializer.serialize_bulk_string("5-0")),
+    (["XTRIM", "stream_trim", "MAXLEN", "~", "1"], RESPSerializer.serialize_integer(0)),
+    (["XTRIM", "stream_trim", "MAXLEN", "1", "LIMIT", "10"], RESPSerializer.serialize_error(
+        "ERR syntax error, LIMIT cannot be used without the special ~ option"
+    )),
+    (["XTRIM", "stream_trim", "MAXLEN", "-1"], RESPSerializer.serialize_error("ERR The MAXLEN argument must be >= 0.")),
+    (["XTRIM", "stream_trim", "MAXLEN", "1"], RESPSerializer.serialize_integer(1)),
+
+    (["XDEL", "stream_trim", "5-0", "9-0"], RESPSerializer.serialize_integer(1)),
+    (["XLEN", "stream_trim"], RESPSerializer.serialize_integer(0)),
+    # IDs keep growing after entries were deleted
+    (["XADD", "stream_trim", "5-0", "e", "5"], RESPSerializer.serialize_error(
+        "ERR The ID specified in XADD is equal or smaller than the target stream top item"
+    )),
+])
+def test_stream_trimming(server, cmd, expected):
+    print("\n[tester] Testing XADD MAXLEN/MINID, XTRIM, XDEL and XLEN")
+    assert_command(cmd, expected)
+
+
+def test_xtrim_approx_chunks(server):
+    print("\n[tester] Testing XTRIM ~ on a stream spanning several chunks")
+    s = socket.create_connection(("localhost", 6379))
+    batch = b"".join(
+        RESPSerializer.serialize_array(["XADD", "stream_trim_long", f"{i}-1", "n", str(i)])
+        for i in range(1, 251)
+    )
+    expected = b"".join(RESPSerializer.serialize_bulk_string(f"{i}-1") for i in range(1, 251))
+    s.sendall(batch)
+    resp = b""
+    while len(resp) < len(expected):
+        resp += s.recv(65536)
+    s.close()
+    
+    assert_command(["XTRIM", "stream_trim_long", "MAXLEN", "~", "120"], RESPSerializer.serialize_integer(100))
+    assert_command(["XLEN", "stream_trim_long"], RESPSerializer.serialize_integer(150))
+
+
+def test_approx_trim_propagates_exact_threshold():
+    print("\n[tester] Testing that ~ trims are logged as the threshold they reached")
+    def run(db, command, *args):
+        commands = []
+        token = propagation.set(commands)
+        try:
+            command(db, {}).execute([arg.encode() for arg in args])
+        finally:
+            propagation.reset(token)
+        return commands
+    
+    # the master's chunks end up [40, 100, 50], a replica loading it gets [100, 90]
+    master, replica = Keyspace(), Keyspace()
+    for i in range(1, 251):
+        run(master, XAddCommand, "s", f"{i}-1", "n", str(i))
+    run(master, XTrimCommand, "s", "MAXLEN", "190")
+    for i in range(61, 251):
+        run(replica, XAddCommand, "s", f"{i}-1", "n", str(i))
+    
+    commands = run(master, XAddCommand, "s", "MAXLEN", "~", "150", "251-1", "n", "251")
+    assert commands == [[b"XADD", b"s", b"MAXLEN", b"=", b"151", b"251-1", b"n", b"251"]]
+    run(replica, XAddCommand, *(arg.decode() for arg in commands[0][1:]))
+    assert len(master[b"s"]) == len(replica[b"s"]) == 151
+    
+    commands = run(master, XTrimCommand, "s", "MINID", "~", "201-1")
+    assert commands == [[b"XTRIM", b"s", b"MINID", b"=", b"201-1"]]
+    assert run(master, XTrimCommand, "s", "MAXLEN", "~", "1000") == []
+
+
+def test_xread_block_dollar(server):
+    print("\n[tester] Testing XREAD BLOCK with $ and readers blocked on different IDs")
+    assert_command(["XADD", "stream_dollar", "1-0", "a", "1"], RESPSerializer.serialize_bulk_string("1-0"))
+    # `$` without BLOCK never returns anything
+    assert_command(["XREAD", "STREAMS", "stream_dollar", "$"], RESPSerializer.serialize_array([["stream_dollar", []]]))
+    
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["XREAD", "BLOCK", "0", "STREAMS", "stream_dollar", "$"]))
+    s2 = socket.create_connection(("localhost", 6379))
+    s2.sendall(RESPSerializer.serialize_array(["XREAD", "BLOCK", "0", "STREAMS", "stream_dollar", "5-0"]))
+    time.sleep(0.5)
+    
+    assert_command(["XADD", "stream_dollar", "2-0", "b", "2"], RESPSerializer.serialize_bulk_string("2-0"))
+    assert s1.recv(1024) == RESPSerializer.serialize_array([["stream_dollar", [["2-0", ["b", "2"]]]]])
+    # the second reader waits for an ID above 5-0
+    s2.settimeout(0.3)
+    with pytest.raises(socket.timeout):
+        s2.recv(1024)
+    
+    assert_command(["XADD", "stream_dollar", "6-0", "c", "3"], RESPSerializer.serialize_bulk_string("6-0"))
+    s2.settimeout(2)
+    assert s2.recv(1024) == RESPSerializer.serialize_array([["stream_dollar", [["6-0", ["c", "3"]]]]])
+    s1.close()
+    s2.close()
@@ -0,0 +1,89 @@
+import socket
+import time
+import pytest
+from tests.helpers import send_command, start_server, stop_server
+from app.parser import RESPParser, RESPSerializer
+from app.sharding import key_slot
+
+PORT = 6390
+WORKERS = 3
+
+
+@pytest.fixture(scope="module")
+def workers():
+    proc = start_server(PORT, "--workers", str(WORKERS))
+    yield
+    stop_server(proc)
+
+
+def test_keys_visible_from_any_worker(workers):
+    print("\n[tester] Testing: Sharded Workers Forward Commands to the Key Owner")
+    # every connection lands on an arbitrary worker
+    for i in range(100):
+        assert send_command(["SET", f"wk{i}", f"v{i}"], port=PORT) == RESPSerializer.serialize_simple_string("OK")
+    for i in range(100):
+        assert send_command(["GET", f"wk{i}"], port=PORT) == RESPSerializer.serialize_bulk_string(f"v{i}")
+
+
+def test_cross_slot_keys(workers):
+    print("\n[tester] Testing: Multi-key Commands Across Workers")
+    keys = ["xs0"]
+    i = 1
+    while key_slot(f"xs{i}".encode()) % WORKERS == key_slot(b"xs0") % WORKERS:
+        i += 1
+    keys.append(f"xs{i}")
+
+    assert send_command(["XREAD", "STREAMS", *keys, "0", "0"], port=PORT).startswith(b"-CROSSSLOT")
+    assert send_command(["XREAD", "STREAMS", "{xs}a", "{xs}b", "0", "0"], port=PORT) == RESPSerializer.serialize_array([
+        ["{xs}a", []], ["{xs}b", []]
+    ])
+
+
+def test_forwarded_blocking_pop(workers):
+    print("\n[tester] Testing: Blocking Pop Through a Forwarding Worker")
+    s1 = socket.create_connection(("localhost", PORT))
+    s1.sendall(RESPSerializer.serialize_array(["BLPOP", "wq", "0"]))
+    time.sleep(0.3)
+    send_command(["RPUSH", "wq", "job"], port=PORT)
+    assert s1.recv(1024) == RESPSerializer.serialize_array(["wq", "job"])
+    s1.close()
+
+
+def test_transactions_across_workers(workers):
+    print("\n[tester] Testing: Transactions Run on the Worker Owning Their Keys")
+    keys = ["tx0"]
+    i = 1
+    while key_slot(f"tx{i}".encode()) % WORKERS == key_slot(b"tx0") % WORKERS:
+        i += 1
+    keys.append(f"tx{i}")
+    ok, queued = RESPSerializer.serialize_simple_string("OK"), RESPSerializer.serialize_simple_string("QUEUED")
+
+    sock = socket.create_connection(("localhost", PORT))
+
+    def call(*args) -> bytes:
+        sock.sendall(RESPSerializer.serialize_array(list(args)))
+        buffer = bytearray()
+        while (end := RESPParser.reply_end(buffer)) is None:
+            buffer += sock.recv(65536)
+        return bytes(buffer[:end])
+
+    try:
+        assert call("MULTI") == ok
+        assert call("SET", keys[0], "a") == queued
+        assert call("SET", keys[1], "b") == queued
+        assert call("EXEC").startswith(b"-CROSSSLOT")
+
+        assert call("WATCH", "{tx}a") == ok
+        assert call("MULTI") == ok
+        assert call("INCR", "{tx}a") == queued
+        assert call("INCR", "{tx}b") == queued
+        assert call("EXEC") == b"*2\r\n:1\r\n:1\r\n"
+
+        assert call("WATCH", "{tx}a") == ok
+        assert send_command(["INCR", "{tx}a"], port=PORT) == RESPSerializer.serialize_integer(2)
+        assert call("MULTI") == ok
+        assert call("INCR", "{tx}a") == queued
+        assert call("EXEC") == RESPSerializer.serialize_null_array()
+        assert send_command(["GET", "{tx}a"], port=PORT) == RESPSerializer.serialize_bulk_string("2")
+    finally:
+        sock.close()
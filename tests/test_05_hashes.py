@@ -0,0 +1,70 @@
+import pytest
+from tests.helpers import assert_command, send_command
+from app.parser import RESPSerializer
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["HSET", "hfoo", "name", "ann", "age", "31"], RESPSerializer.serialize_integer(2)),
+    (["HSET", "hfoo", "name", "bob", "city", "rome"], RESPSerializer.serialize_integer(1)),
+    (["HGET", "hfoo", "name"], RESPSerializer.serialize_bulk_string("bob")),
+    (["HGET", "hfoo", "missing"], RESPSerializer.serialize_bulk_string(None)),
+    (["HGET", "hmissing", "name"], RESPSerializer.serialize_bulk_string(None)),
+    (["HMGET", "hfoo", "age", "missing", "city"], RESPSerializer.serialize_array(["31", None, "rome"])),
+    (["HINCRBY", "hfoo", "age", "-2"], RESPSerializer.serialize_integer(29)),
+    (["HINCRBY", "hfoo", "visits", "5"], RESPSerializer.serialize_integer(5)),
+    (["HINCRBY", "hfoo", "name", "1"], RESPSerializer.serialize_error("ERR hash value is not an integer")),
+    (["HINCRBY", "hfoo", "visits", "9223372036854775807"], RESPSerializer.serialize_error(
+        "ERR increment or decrement would overflow"
+    )),
+    (["HGETALL", "hfoo"], RESPSerializer.serialize_array(["name", "bob", "age", "29", "city", "rome", "visits", "5"])),
+    (["HGETALL", "hmissing"], RESPSerializer.serialize_array([])),
+    (["OBJECT", "ENCODING", "hfoo"], RESPSerializer.serialize_bulk_string("listpack")),
+    (["HDEL", "hfoo", "age", "city", "missing"], RESPSerializer.serialize_integer(2)),
+    (["HSCAN", "hfoo", "0"], RESPSerializer.serialize_array(["0", ["name", "bob", "visits", "5"]])),
+    (["HSCAN", "hfoo", "0", "MATCH", "v*", "NOVALUES"], RESPSerializer.serialize_array(["0", ["visits"]])),
+    (["HDEL", "hfoo", "name", "visits"], RESPSerializer.serialize_integer(2)),
+    (["TYPE", "hfoo"], RESPSerializer.serialize_simple_string("none")),
+    (["HSET", "hfoo", "odd"], RESPSerializer.serialize_error("ERR wrong number of arguments for 'hset' command")),
+    (["RPUSH", "hlist", "a"], RESPSerializer.serialize_integer(1)),
+    (["HGET", "hlist", "a"], RESPSerializer.serialize_error("WRONGTYPE Operation against a key holding the wrong kind of value")),
+])
+def test_hash_commands(server, cmd, expected):
+    print("\n[tester] Testing hash commands")
+    assert_command(cmd, expected)
+
+
+def test_hash_encoding_promotion(server):
+    print("\n[tester] Testing promotion of big hashes to a hashtable")
+    assert_command(["HSET", "hbig", "f", "v"], RESPSerializer.serialize_integer(1))
+    assert_command(["HSET", "hbig", "long", "x" * 65], RESPSerializer.serialize_integer(1))
+    assert_command(["OBJECT", "ENCODING", "hbig"], RESPSerializer.serialize_bulk_string("hashtable"))
+    assert_command(["HGET", "hbig", "long"], RESPSerializer.serialize_bulk_string("x" * 65))
+
+    fields = []
+    for i in range(129):
+        fields += [f"f{i}", str(i)]
+    assert_command(["HSET", "hmany"] + fields, RESPSerializer.serialize_integer(129))
+    assert_command(["OBJECT", "ENCODING", "hmany"], RESPSerializer.serialize_bulk_string("hashtable"))
+
+    # a dict encoded hash is scanned in pages until the cursor is back to 0
+    seen, cursor = [], "0"
+    while True:
+        reply = send_command(["HSCAN", "hmany", cursor, "COUNT", "50", "NOVALUES"])
+        lines = reply.split(b"\r\n")
+        cursor = lines[2].decode()
+        seen += [line.decode() for line in lines[5::2] if line]
+        if cursor == "0":
+            break
+    assert sorted(seen) == sorted(f"f{i}" for i in range(129))
+
+    # fields deleted mid scan don't make the cursor skip the ones that stay
+    seen, cursor = [], "0"
+    while True:
+        reply = send_command(["HSCAN", "hmany", cursor, "COUNT", "50", "NOVALUES"])
+        lines = reply.split(b"\r\n")
+        cursor = lines[2].decode()
+        seen += [line.decode() for line in lines[5::2] if line]
+        if cursor == "0":
+            break
+        send_command(["HDEL", "hmany"] + [f"f{i}" for i in range(0, 129, 2)])
+    assert set(f"f{i}" for i in range(1, 129, 2)) <= set(seen)
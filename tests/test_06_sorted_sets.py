@@ -0,0 +1,93 @@
+import socket
+import time
+import pytest
+from tests.helpers import assert_command, send_command
+from app.parser import RESPSerializer
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["ZADD", "zfoo", "1", "a", "2", "b", "3", "c", "2", "bb"], RESPSerializer.serialize_integer(4)),
+    (["ZADD", "zfoo", "1", "a"], RESPSerializer.serialize_integer(0)),
+    (["ZCARD", "zfoo"], RESPSerializer.serialize_integer(4)),
+    (["ZSCORE", "zfoo", "bb"], RESPSerializer.serialize_bulk_string("2")),
+    (["ZRANGE", "zfoo", "0", "-1"], RESPSerializer.serialize_array(["a", "b", "bb", "c"])),
+    (["ZRANGE", "zfoo", "1", "2", "WITHSCORES"], RESPSerializer.serialize_array(["b", "2", "bb", "2"])),
+    (["ZRANGE", "zfoo", "0", "1", "REV"], RESPSerializer.serialize_array(["c", "bb"])),
+    (["ZRANGE", "zfoo", "(1", "+inf", "BYSCORE", "LIMIT", "1", "2"], RESPSerializer.serialize_array(["bb", "c"])),
+    (["ZRANGE", "zfoo", "+inf", "(1", "BYSCORE", "REV", "LIMIT", "1", "-1"], RESPSerializer.serialize_array(["bb", "b"])),
+    (["ZRANGE", "zfoo", "[b", "(c", "BYLEX"], RESPSerializer.serialize_array(["b", "bb"])),
+    (["ZRANGE", "zfoo", "-", "+", "BYLEX", "LIMIT", "0", "2"], RESPSerializer.serialize_array(["a", "b"])),
+    (["ZRANGEBYSCORE", "zfoo", "-inf", "2", "WITHSCORES", "LIMIT", "1", "1"], RESPSerializer.serialize_array(["b", "2"])),
+    (["ZRANK", "zfoo", "c"], RESPSerializer.serialize_integer(3)),
+    (["ZRANK", "zfoo", "c", "WITHSCORE"], RESPSerializer.serialize_array([3, "3"])),
+    (["ZREVRANK", "zfoo", "c"], RESPSerializer.serialize_integer(0)),
+    (["ZRANK", "zfoo", "missing"], RESPSerializer.serialize_bulk_string(None)),
+    (["ZINCRBY", "zfoo", "1.5", "a"], RESPSerializer.serialize_bulk_string("2.5")),
+    (["ZADD", "zfoo", "INCR", "GT", "-1", "a"], RESPSerializer.serialize_bulk_string(None)),
+    (["ZADD", "zfoo", "CH", "XX", "10", "a", "5", "zz"], RESPSerializer.serialize_integer(1)),
+    (["ZADD", "zfoo", "LT", "CH", "20", "a", "0", "c"], RESPSerializer.serialize_integer(1)),
+    (["ZREM", "zfoo", "c", "missing"], RESPSerializer.serialize_integer(1)),
+    (["ZPOPMIN", "zfoo"], RESPSerializer.serialize_array(["b", "2"])),
+    (["ZPOPMAX", "zfoo", "5"], RESPSerializer.serialize_array(["a", "10", "bb", "2"])),
+    (["TYPE", "zfoo"], RESPSerializer.serialize_simple_string("none")),
+    (["ZPOPMIN", "zfoo"], RESPSerializer.serialize_array([])),
+    (["ZADD", "zfoo", "nan", "a"], RESPSerializer.serialize_error("ERR value is not a valid float")),
+    (["ZADD", "zfoo", "NX", "XX", "1", "a"], RESPSerializer.serialize_error(
+        "ERR XX and NX options at the same time are not compatible"
+    )),
+    (["ZADD", "zfoo", "GT", "NX", "1", "a"], RESPSerializer.serialize_error(
+        "ERR GT, LT, and/or NX options at the same time are not compatible"
+    )),
+    (["ZADD", "zfoo", "INCR", "1", "a", "2", "b"], RESPSerializer.serialize_error(
+        "ERR INCR option supports a single increment-element pair"
+    )),
+    (["ZRANGE", "zfoo", "0", "1", "LIMIT", "0", "1"], RESPSerializer.serialize_error(
+        "ERR syntax error, LIMIT is only supported in combination with either BYSCORE or BYLEX"
+    )),
+    (["ZRANGE", "zfoo", "x", "1", "BYSCORE"], RESPSerializer.serialize_error("ERR min or max is not a float")),
+    (["ZRANGE", "zfoo", "x", "+", "BYLEX"], RESPSerializer.serialize_error("ERR min or max not valid string range item")),
+    (["RPUSH", "zlist", "a"], RESPSerializer.serialize_integer(1)),
+    (["ZADD", "zlist", "1", "a"], RESPSerializer.serialize_error(
+        "WRONGTYPE Operation against a key holding the wrong kind of value"
+    )),
+])
+def test_sorted_set_commands(server, cmd, expected):
+    print("\n[tester] Testing sorted set commands")
+    assert_command(cmd, expected)
+
+
+def test_sorted_set_big(server):
+    print("\n[tester] Testing ranks and ranges over a big sorted set")
+    args = ["ZADD", "zbig"]
+    for i in range(2000):
+        args += [str(i % 500), "m%04d" % i]
+    assert_command(args, RESPSerializer.serialize_integer(2000))
+    # equal scores are ordered by member
+    assert_command(["ZRANGE", "zbig", "0", "3"], RESPSerializer.serialize_array(["m0000", "m0500", "m1000", "m1500"]))
+    assert_command(["ZRANK", "zbig", "m0001"], RESPSerializer.serialize_integer(4))
+    assert_command(["ZRANGE", "zbig", "(498", "499", "BYSCORE"], RESPSerializer.serialize_array(
+        ["m0499", "m0999", "m1499", "m1999"]
+    ))
+    assert_command(["ZRANGE", "zbig", "-1", "-1"], RESPSerializer.serialize_array(["m1999"]))
+    assert_command(["ZRANGEBYSCORE", "zbig", "10", "20", "LIMIT", "40", "10"], RESPSerializer.serialize_array(
+        ["m0020", "m0520", "m1020", "m1520"]
+    ))
+
+
+def test_bzpopmin(server):
+    print("\n[tester] Testing BZPOPMIN/BZPOPMAX")
+    assert_command(["ZADD", "bz2", "1", "a", "2", "b"], RESPSerializer.serialize_integer(2))
+    assert_command(["BZPOPMIN", "bz1", "bz2", "0"], RESPSerializer.serialize_array(["bz2", "a", "1"]))
+    assert_command(["BZPOPMAX", "bz1", "bz2", "0"], RESPSerializer.serialize_array(["bz2", "b", "2"]))
+
+    s1 = socket.create_connection(("localhost", 6379))
+    s1.sendall(RESPSerializer.serialize_array(["BZPOPMIN", "bz1", "bz2", "0"]))
+    time.sleep(0.5)
+    assert_command(["ZADD", "bz2", "7", "x"], RESPSerializer.serialize_integer(1))
+    assert s1.recv(1024) == RESPSerializer.serialize_array(["bz2", "x", "7"])
+    assert send_command(["TYPE", "bz2"]) == RESPSerializer.serialize_simple_string("none")
+
+    s1.sendall(RESPSerializer.serialize_array(["BZPOPMAX", "bz1", "0.2"]))
+    time.sleep(0.4)
+    assert s1.recv(1024) == RESPSerializer.serialize_null_array()
+    s1.close()
@@ -0,0 +1,83 @@
+import pytest
+from tests.helpers import assert_command, send_command
+from app.parser import RESPSerializer
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["SADD", "sfoo", "3", "1", "2", "1"], RESPSerializer.serialize_integer(3)),
+    (["SADD", "sfoo", "-5"], RESPSerializer.serialize_integer(1)),
+    (["OBJECT", "ENCODING", "sfoo"], RESPSerializer.serialize_bulk_string("intset")),
+    # intsets are kept sorted
+    (["SMEMBERS", "sfoo"], RESPSerializer.serialize_array(["-5", "1", "2", "3"])),
+    (["SCARD", "sfoo"], RESPSerializer.serialize_integer(4)),
+    (["SISMEMBER", "sfoo", "2"], RESPSerializer.serialize_integer(1)),
+    (["SISMEMBER", "sfoo", "02"], RESPSerializer.serialize_integer(0)),
+    (["SMISMEMBER", "sfoo", "1", "9", "x"], RESPSerializer.serialize_array([1, 0, 0])),
+    (["SADD", "sbar", "2", "3", "4"], RESPSerializer.serialize_integer(3)),
+    (["SINTER", "sfoo", "sbar"], RESPSerializer.serialize_array(["2", "3"])),
+    (["SINTER", "sfoo", "smissing"], RESPSerializer.serialize_array([])),
+    (["SDIFF", "sfoo", "sbar", "smissing"], RESPSerializer.serialize_array(["-5", "1"])),
+    (["SUNIONSTORE", "sdest", "sfoo", "sbar"], RESPSerializer.serialize_integer(5)),
+    (["SMEMBERS", "sdest"], RESPSerializer.serialize_array(["-5", "1", "2", "3", "4"])),
+    (["SINTERSTORE", "sdest", "sfoo", "smissing"], RESPSerializer.serialize_integer(0)),
+    (["TYPE", "sdest"], RESPSerializer.serialize_simple_string("none")),
+    (["SDIFFSTORE", "sdest", "sbar", "sfoo"], RESPSerializer.serialize_integer(1)),
+    (["SMEMBERS", "sdest"], RESPSerializer.serialize_array(["4"])),
+    (["SSCAN", "sfoo", "0", "MATCH", "-*"], RESPSerializer.serialize_array(["0", ["-5"]])),
+    (["SREM", "sfoo", "-5", "1", "missing"], RESPSerializer.serialize_integer(2)),
+    (["SADD", "sfoo", "tag"], RESPSerializer.serialize_integer(1)),
+    (["OBJECT", "ENCODING", "sfoo"], RESPSerializer.serialize_bulk_string("hashtable")),
+    (["SISMEMBER", "sfoo", "2"], RESPSerializer.serialize_integer(1)),
+    (["SREM", "sfoo", "2", "3", "tag"], RESPSerializer.serialize_integer(3)),
+    (["TYPE", "sfoo"], RESPSerializer.serialize_simple_string("none")),
+    (["SPOP", "sfoo"], RESPSerializer.serialize_bulk_string(None)),
+    (["SRANDMEMBER", "sfoo", "3"], RESPSerializer.serialize_array([])),
+    (["SPOP", "sbar", "-1"], RESPSerializer.serialize_error("ERR value is out of range, must be positive")),
+    (["SRANDMEMBER", "sbar", "-9223372036854775808"], RESPSerializer.serialize_error("ERR value is out of range")),
+    (["SRANDMEMBER", "sbar", "9223372036854775808"], RESPSerializer.serialize_error("ERR value is out of range")),
+    (["RPUSH", "slist", "a"], RESPSerializer.serialize_integer(1)),
+    (["SINTER", "sbar", "slist"], RESPSerializer.serialize_error(
+        "WRONGTYPE Operation against a key holding the wrong kind of value"
+    )),
+])
+def test_set_commands(server, cmd, expected):
+    print("\n[tester] Testing set commands")
+    assert_command(cmd, expected)
+
+
+def test_set_random_members(server):
+    print("\n[tester] Testing SRANDMEMBER and SPOP")
+    members = ["a", "b", "c", "d"]
+    assert_command(["SADD", "srand", *members], RESPSerializer.serialize_integer(4))
+
+    resp = send_command(["SRANDMEMBER", "srand"])
+    assert resp in [RESPSerializer.serialize_bulk_string(m) for m in members]
+
+    # distinct members for a positive count, repeats allowed for a negative one
+    resp = send_command(["SRANDMEMBER", "srand", "10"])
+    assert resp.startswith(b"*4\r\n") and all(m.encode() in resp for m in members)
+    assert send_command(["SRANDMEMBER", "srand", "-10"]).startswith(b"*10\r\n")
+
+    resp = send_command(["SPOP", "srand", "3"])
+    assert resp.startswith(b"*3\r\n")
+    assert_command(["SCARD", "srand"], RESPSerializer.serialize_integer(1))
+
+    # a hashtable encoded set hands out distinct members for small and large counts
+    assert_command(["SADD", "srandbig", *[f"m{i}" for i in range(100)]], RESPSerializer.serialize_integer(100))
+    for count in (5, 80):
+        resp = send_command(["SRANDMEMBER", "srandbig", str(count)])
+        picked = resp.split(b"\r\n")[2::2]
+        assert resp.startswith(b"*%d\r\n" % count) and len(set(picked)) == count
+    resp = send_command(["SPOP", "srandbig"])
+    assert resp.startswith(b"$") and resp != RESPSerializer.serialize_bulk_string(None)
+    assert_command(["SCARD", "srandbig"], RESPSerializer.serialize_integer(99))
+
+
+def test_set_intset_promotion(server):
+    print("\n[tester] Testing conversion of big integer sets to a hashtable")
+    assert_command(["SADD", "sbig", *[str(i) for i in range(512)]], RESPSerializer.serialize_integer(512))
+    assert_command(["OBJECT", "ENCODING", "sbig"], RESPSerializer.serialize_bulk_string("intset"))
+    assert_command(["SADD", "sbig", "512"], RESPSerializer.serialize_integer(1))
+    assert_command(["OBJECT", "ENCODING", "sbig"], RESPSerializer.serialize_bulk_string("hashtable"))
+    assert_command(["SCARD", "sbig"], RESPSerializer.serialize_integer(513))
+    assert_command(["SISMEMBER", "sbig", "511"], RESPSerializer.serialize_integer(1))
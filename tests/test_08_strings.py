@@ -0,0 +1,75 @@
+import pytest
+from tests.helpers import assert_command, send_command
+from app.parser import RESPSerializer
+
+
+@pytest.mark.parametrize("cmd,expected", [
+    (["SET", "scount", "10"], RESPSerializer.serialize_simple_string("OK")),
+    (["OBJECT", "ENCODING", "scount"], RESPSerializer.serialize_bulk_string("int")),
+    (["INCR", "scount"], RESPSerializer.serialize_integer(11)),
+    (["INCRBY", "scount", "-21"], RESPSerializer.serialize_integer(-10)),
+    (["DECR", "scount"], RESPSerializer.serialize_integer(-11)),
+    (["DECRBY", "scount", "4"], RESPSerializer.serialize_integer(-15)),
+    (["GET", "scount"], RESPSerializer.serialize_bulk_string("-15")),
+    (["INCR", "snew"], RESPSerializer.serialize_integer(1)),
+    (["INCRBYFLOAT", "scount", "0.25"], RESPSerializer.serialize_bulk_string("-14.75")),
+    (["INCRBYFLOAT", "scount", "-0.25"], RESPSerializer.serialize_bulk_string("-15")),
+    (["INCRBY", "scount", "x"], RESPSerializer.serialize_error("ERR value is not an integer or out of range")),
+    (["INCRBYFLOAT", "scount", "x"], RESPSerializer.serialize_error("ERR value is not a valid float")),
+    (["SET", "smax", "9223372036854775807"], RESPSerializer.serialize_simple_string("OK")),
+    (["INCR", "smax"], RESPSerializer.serialize_error("ERR increment or decrement would overflow")),
+    (["SET", "stext", "hello"], RESPSerializer.serialize_simple_string("OK")),
+    (["OBJECT", "ENCODING", "stext"], RESPSerializer.serialize_bulk_string("embstr")),
+    (["INCR", "stext"], RESPSerializer.serialize_error("ERR value is not an integer or out of range")),
+    (["APPEND", "stext", " world"], RESPSerializer.serialize_integer(11)),
+    (["STRLEN", "stext"], RESPSerializer.serialize_integer(11)),
+    (["GETRANGE", "stext", "0", "4"], RESPSerializer.serialize_bulk_string("hello")),
+    (["GETRANGE", "stext", "-5", "-1"], RESPSerializer.serialize_bulk_string("world")),
+    (["GETRANGE", "stext", "5", "1"], RESPSerializer.serialize_bulk_string("")),
+    (["SETRANGE", "stext", "6", "redis"], RESPSerializer.serialize_integer(11)),
+    (["SETRANGE", "spad", "3", "x"], RESPSerializer.serialize_integer(4)),
+    (["GET", "spad"], RESPSerializer.serialize_bulk_string(b"\x00\x00\x00x")),
+    (["SETRANGE", "stext", "-1", "x"], RESPSerializer.serialize_error("ERR offset is out of range")),
+    (["GETDEL", "stext"], RESPSerializer.serialize_bulk_string("hello redis")),
+    (["GETDEL", "stext"], RESPSerializer.serialize_bulk_string(None)),
+    (["SETNX", "snx", "1"], RESPSerializer.serialize_integer(1)),
+    (["SETNX", "snx", "2"], RESPSerializer.serialize_integer(0)),
+    (["MSET", "sm1", "a", "sm2", "2"], RESPSerializer.serialize_simple_string("OK")),
+    (["MSETNX", "sm2", "x", "sm3", "y"], RESPSerializer.serialize_integer(0)),
+    (["MSETNX", "sm3", "y", "sm4", "z"], RESPSerializer.serialize_integer(1)),
+    (["RPUSH", "slst", "a"], RESPSerializer.serialize_integer(1)),
+    (["MGET", "sm1", "sm2", "smissing", "slst", "sm4"], RESPSerializer.serialize_array(["a", "2", None, None, "z"])),
+    (["INCR", "slst"], RESPSerializer.serialize_error(
+        "WRONGTYPE Operation against a key holding the wrong kind of value"
+    )),
+    (["MSET", "sm1"], RESPSerializer.serialize_error("ERR wrong number of arguments for 'mset' command")),
+])
+def test_string_commands(server, cmd, expected):
+    print("\n[tester] Testing string commands")
+    assert_command(cmd, expected)
+
+
+def test_string_ttl(server):
+    print("\n[tester] Testing TTLs of counters and GETEX")
+    assert_command(["SET", "sttl", "1", "EX", "100"], RESPSerializer.serialize_simple_string("OK"))
+    # INCR and APPEND keep the TTL, SET discards it
+    assert_command(["INCR", "sttl"], RESPSerializer.serialize_integer(2))
+    assert_command(["APPEND", "sttl", "0"], RESPSerializer.serialize_integer(2))
+    assert_command(["TTL", "sttl"], RESPSerializer.serialize_integer(100))
+
+    assert_command(["GETEX", "sttl", "PX", "5000"], RESPSerializer.serialize_bulk_string("20"))
+    assert 4000 < int(send_command(["PTTL", "sttl"])[1:-2]) <= 5000
+    assert_command(["GETEX", "sttl", "PERSIST"], RESPSerializer.serialize_bulk_string("20"))
+    assert_command(["TTL", "sttl"], RESPSerializer.serialize_integer(-1))
+    assert_command(["GETEX", "sttl", "EX", "0"], RESPSerializer.serialize_error(
+        "ERR invalid expire time in 'getex' command"
+    ))
+    assert_command(["GETEX", "smissing", "EX", "10"], RESPSerializer.serialize_bulk_string(None))
+    # deadlines past an int64 of milliseconds are refused like SET's
+    assert_command(["GETEX", "sttl", "EX", "99999999999999999"], RESPSerializer.serialize_error(
+        "ERR invalid expire time in 'getex' command"
+    ))
+    assert_command(["GETEX", "sttl", "PXAT", "9223372036854775808"], RESPSerializer.serialize_error(
+        "ERR value is not an integer or out of range"
+    ))
+    assert_command(["TTL", "sttl"], RESPSerializer.serialize_integer(-1))
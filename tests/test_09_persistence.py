@@ -0,0 +1,100 @@
+import time
+import pytest
+from tests.helpers import send_command, start_server, stop_server
+from app import rdb
+from app.keyspace import Keyspace
+from app.parser import RESPSerializer
+
+PORT = 6391
+
+
+def command(cmd):
+    return send_command(cmd, port=PORT)
+
+
+def fill(count: int = 100):
+    for i in range(count):
+        assert command(["SET", f"pkey{i}", str(i)]) == RESPSerializer.serialize_simple_string("OK")
+    assert command(["SET", "ptext", "hello world"]) == RESPSerializer.serialize_simple_string("OK")
+    assert command(["SET", "pttl", "v", "EX", "1000"]) == RESPSerializer.serialize_simple_string("OK")
+    assert command(["SET", "pgone", "v", "PX", "1"]) == RESPSerializer.serialize_simple_string("OK")
+    assert command(["RPUSH", "plist", "a", "b", "3"]) == RESPSerializer.serialize_integer(3)
+    assert command(["HSET", "phash", "f", "v"]) == RESPSerializer.serialize_integer(1)
+    assert command(["SADD", "pset", "1", "2"]) == RESPSerializer.serialize_integer(2)
+    assert command(["ZADD", "pzset", "1.5", "a", "-2", "b"]) == RESPSerializer.serialize_integer(2)
+    assert command(["XADD", "pstream", "1-1", "f", "v"]) == RESPSerializer.serialize_bulk_string("1-1")
+    assert command(["XGROUP", "CREATE", "pstream", "g", "0"]) == RESPSerializer.serialize_simple_string("OK")
+    command(["XREADGROUP", "GROUP", "g", "alice", "STREAMS", "pstream", ">"])
+
+
+def check(count: int = 100):
+    assert command(["DBSIZE"]) == RESPSerializer.serialize_integer(count + 7)
+    for i in range(count):
+        assert command(["GET", f"pkey{i}"]) == RESPSerializer.serialize_bulk_string(str(i))
+    assert command(["OBJECT", "ENCODING", "pkey1"]) == RESPSerializer.serialize_bulk_string("int")
+    assert command(["GET", "ptext"]) == RESPSerializer.serialize_bulk_string("hello world")
+    assert 990 < int(command(["TTL", "pttl"])[1:-2]) <= 1000
+    assert command(["TYPE", "pgone"]) == RESPSerializer.serialize_simple_string("none")
+    assert command(["LRANGE", "plist", "0", "-1"]) == RESPSerializer.serialize_array(["a", "b", "3"])
+    assert command(["HGET", "phash", "f"]) == RESPSerializer.serialize_bulk_string("v")
+    assert command(["OBJECT", "ENCODING", "pset"]) == RESPSerializer.serialize_bulk_string("intset")
+    assert command(["ZRANGE", "pzset", "0", "-1", "WITHSCORES"]) == RESPSerializer.serialize_array(
+        ["b", "-2", "a", "1.5"]
+    )
+    assert command(["XRANGE", "pstream", "-", "+"]) == RESPSerializer.serialize_array([["1-1", ["f", "v"]]])
+    pending = command(["XPENDING", "pstream", "g"])
+    assert pending.startswith(b"*4\r\n:1\r\n") and b"alice" in pending
+
+
+def test_save_and_reload(tmp_path):
+    print("\n[tester] Testing: SAVE Snapshot Survives a Restart")
+    proc = start_server(PORT, "--dir", str(tmp_path))
+    try:
+        fill()
+        assert command(["SAVE"]) == RESPSerializer.serialize_simple_string("OK")
+        assert abs(int(command(["LASTSAVE"])[1:-2]) - time.time()) < 5
+    finally:
+        stop_server(proc)
+    assert (tmp_path / "dump.rdb").read_bytes().startswith(b"REDIS0011")
+
+    proc = start_server(PORT, "--dir", str(tmp_path))
+    try:
+        check()
+    finally:
+        stop_server(proc)
+
+
+def test_bgsave(tmp_path):
+    print("\n[tester] Testing: BGSAVE Writes the Snapshot From a Child Process")
+    proc = start_server(PORT, "--dir", str(tmp_path))
+    try:
+        fill()
+        assert command(["BGSAVE"]) == RESPSerializer.serialize_simple_string("Background saving started")
+        # keep serving while the child writes
+        assert command(["SET", "pafter", "x"]) == RESPSerializer.serialize_simple_string("OK")
+        for _ in range(50):
+            if (tmp_path / "dump.rdb").exists():
+                break
+            time.sleep(0.1)
+        assert command(["BGSAVE", "NOW"]) == RESPSerializer.serialize_error("ERR syntax error")
+    finally:
+        stop_server(proc)
+
+    proc = start_server(PORT, "--dir", str(tmp_path))
+    try:
+        check()
+        # written after the fork, not part of the snapshot
+        assert command(["GET", "pafter"]) == RESPSerializer.serialize_bulk_string(None)
+    finally:
+        stop_server(proc)
+
+
+def test_failed_save_leaves_no_temp_file(tmp_path):
+    print("\n[tester] Testing: A Save That Can't Encode a Key Fails Cleanly")
+    db = Keyspace()
+    db[b"k"] = b"v"
+    # past what the format stores, commands refuse such deadlines
+    db.set_expiry(b"k", 2**64)
+    with pytest.raises(rdb.RDBError):
+        rdb.save(db, str(tmp_path / "dump.rdb"))
+    assert list(tmp_path.iterdir()) == []
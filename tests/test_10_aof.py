@@ -0,0 +1,144 @@
+import socket
+import threading
+import time
+from tests.helpers import send_command, start_server, stop_server
+from app.parser import RESPSerializer
+
+PORT = 6392
+
+
+def start_aof_server(dir, fsync: str = "always"):
+    return start_server(PORT, "--dir", str(dir), "--appendonly", "yes", "--appendfsync", fsync)
+
+
+def command(cmd):
+    return send_command(cmd, port=PORT)
+
+
+def test_aof_survives_a_crash(tmp_path):
+    print("\n[tester] Testing: AOF Replays Every Acknowledged Write After a Crash")
+    proc = start_aof_server(tmp_path)
+    try:
+        assert command(["SET", "acount", "1"]) == RESPSerializer.serialize_simple_string("OK")
+        assert command(["INCRBY", "acount", "41"]) == RESPSerializer.serialize_integer(42)
+        assert command(["SET", "attl", "v", "EX", "1000"]) == RESPSerializer.serialize_simple_string("OK")
+        assert command(["PEXPIRE", "acount", "500000"]) == RESPSerializer.serialize_integer(1)
+        assert command(["SET", "ashort", "v", "PX", "50"]) == RESPSerializer.serialize_simple_string("OK")
+        time.sleep(0.1)
+        # the expired string must not come back when the list is replayed
+        assert command(["RPUSH", "ashort", "x"]) == RESPSerializer.serialize_integer(1)
+        assert command(["SADD", "aset", "1", "2", "3", "4"]) == RESPSerializer.serialize_integer(4)
+        command(["SPOP", "aset", "2"])
+        members = command(["SMEMBERS", "aset"])
+        stream_id = command(["XADD", "astream", "*", "f", "v"])
+        assert command(["XGROUP", "CREATE", "astream", "g", "0"]) == RESPSerializer.serialize_simple_string("OK")
+        command(["XREADGROUP", "GROUP", "g", "alice", "STREAMS", "astream", ">"])
+        assert command(["ZADD", "azset", "1", "a", "2", "b"]) == RESPSerializer.serialize_integer(2)
+        assert command(["DEL", "azset"]) == RESPSerializer.serialize_integer(1)
+
+        # a blocked pop served by another client's push is logged as a plain pop
+        reply = []
+        blocked = threading.Thread(target=lambda: reply.append(command(["BLPOP", "aqueue", "5"])))
+        blocked.start()
+        time.sleep(0.2)
+        assert command(["RPUSH", "aqueue", "a", "b"]) == RESPSerializer.serialize_integer(1)
+        blocked.join()
+        assert reply == [RESPSerializer.serialize_array(["aqueue", "a"])]
+    finally:
+        stop_server(proc, crash=True)
+
+    proc = start_aof_server(tmp_path)
+    try:
+        assert command(["GET", "acount"]) == RESPSerializer.serialize_bulk_string("42")
+        assert 490 < int(command(["TTL", "acount"])[1:-2]) <= 500
+        assert 990 < int(command(["TTL", "attl"])[1:-2]) <= 1000
+        assert command(["LRANGE", "ashort", "0", "-1"]) == RESPSerializer.serialize_array(["x"])
+        assert command(["TTL", "ashort"]) == RESPSerializer.serialize_integer(-1)
+        assert command(["SMEMBERS", "aset"]) == members
+        assert command(["XRANGE", "astream", "-", "+"]).startswith(b"*1\r\n*2\r\n" + stream_id)
+        assert command(["XPENDING", "astream", "g"]).startswith(b"*4\r\n:1\r\n")
+        assert command(["TYPE", "azset"]) == RESPSerializer.serialize_simple_string("none")
+        assert command(["LRANGE", "aqueue", "0", "-1"]) == RESPSerializer.serialize_array(["b"])
+    finally:
+        stop_server(proc, crash=True)
+
+
+def test_bgrewriteaof(tmp_path):
+    print("\n[tester] Testing: BGREWRITEAOF Compacts the Log")
+    proc = start_aof_server(tmp_path, fsync="everysec")
+    try:
+        for i in range(200):
+            command(["INCR", "rcount"])
+        assert command(["BGREWRITEAOF"]) == RESPSerializer.serialize_simple_string(
+            "Background append only file rewriting started"
+        )
+        # written while the child runs, appended to its output once it's done
+        assert command(["RPUSH", "rlist", "a"]) == RESPSerializer.serialize_integer(1)
+        aof = tmp_path / "appendonly.aof"
+        for _ in range(50):
+            if aof.read_bytes().startswith(b"REDIS") and b"rlist" in aof.read_bytes():
+                break
+            time.sleep(0.1)
+        assert b"INCR" not in aof.read_bytes()
+        assert command(["RPUSH", "rlist", "b"]) == RESPSerializer.serialize_integer(2)
+        # everysec: on disk within about a second
+        time.sleep(1.5)
+    finally:
+        stop_server(proc, crash=True)
+
+    proc = start_aof_server(tmp_path, fsync="everysec")
+    try:
+        assert command(["GET", "rcount"]) == RESPSerializer.serialize_bulk_string("200")
+        assert command(["LRANGE", "rlist", "0", "-1"]) == RESPSerializer.serialize_array(["a", "b"])
+    finally:
+        stop_server(proc, crash=True)
+
+
+def test_truncated_aof(tmp_path):
+    print("\n[tester] Testing: A Command Cut Short at the End of the AOF Is Dropped")
+    proc = start_aof_server(tmp_path)
+    try:
+        assert command(["SET", "tkey", "v"]) == RESPSerializer.serialize_simple_string("OK")
+    finally:
+        stop_server(proc, crash=True)
+    with open(tmp_path / "appendonly.aof", "ab") as file:
+        file.write(b"*3\r\n$3\r\nSET\r\n$4\r\ntk")
+
+    proc = start_aof_server(tmp_path)
+    try:
+        assert command(["GET", "tkey"]) == RESPSerializer.serialize_bulk_string("v")
+        assert command(["SET", "tkey2", "w"]) == RESPSerializer.serialize_simple_string("OK")
+    finally:
+        stop_server(proc, crash=True)
+    proc = start_aof_server(tmp_path)
+    try:
+        assert command(["GET", "tkey2"]) == RESPSerializer.serialize_bulk_string("w")
+    finally:
+        stop_server(proc, crash=True)
+
+
+def test_aof_transaction(tmp_path):
+    print("\n[tester] Testing: Transactions Are Logged Whole and Half-Written Ones Dropped")
+    proc = start_aof_server(tmp_path)
+    try:
+        sock = socket.create_connection(("localhost", PORT))
+        for cmd in (["MULTI"], ["SET", "ta", "1"], ["INCR", "ta"], ["EXEC"]):
+            sock.sendall(RESPSerializer.serialize_array(cmd))
+            sock.recv(1024)
+        sock.close()
+        assert command(["GET", "ta"]) == RESPSerializer.serialize_bulk_string("2")
+    finally:
+        stop_server(proc, crash=True)
+    data = (tmp_path / "appendonly.aof").read_bytes()
+    assert data.index(b"MULTI") < data.index(b"INCR") < data.index(b"EXEC")
+    # a crash in the middle of writing a transaction
+    with open(tmp_path / "appendonly.aof", "ab") as file:
+        file.write(b"*1\r\n$5\r\nMULTI\r\n*3\r\n$3\r\nSET\r\n$2\r\ntb\r\n$1\r\nx\r\n")
+
+    proc = start_aof_server(tmp_path)
+    try:
+        assert command(["GET", "ta"]) == RESPSerializer.serialize_bulk_string("2")
+        assert command(["GET", "tb"]) == RESPSerializer.serialize_bulk_string(None)
+    finally:
+        stop_server(proc, crash=True)
+    assert (tmp_path / "appendonly.aof").read_bytes() == data
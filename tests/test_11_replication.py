@@ -0,0 +1,182 @@
+import socket
+import threading
+import time
+from tests.helpers import send_command, start_server, stop_server
+from app.parser import RESPSerializer
+
+MASTER_PORT = 6393
+REPLICA_PORT = 6394
+PROXY_PORT = 6396
+
+
+def master(cmd):
+    return send_command(cmd, port=MASTER_PORT)
+
+
+def replica(cmd):
+    return send_command(cmd, port=REPLICA_PORT)
+
+
+def wait_connected(timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if b"connected" in replica(["ROLE"]):
+            return
+        time.sleep(0.05)
+    raise AssertionError("replica didn't connect to its master")
+
+
+class Proxy:
+    """Relays the replica's link to the master, so tests can cut it short and look
+    at what the master sent"""
+
+    def __init__(self):
+        self.listener = socket.create_server(("localhost", PROXY_PORT))
+        self.sockets = []
+        self.from_master = bytearray()
+        self.refusing = False
+        self.lock = threading.Lock()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            if self.refusing:
+                client.close()
+                continue
+            upstream = socket.create_connection(("localhost", MASTER_PORT))
+            with self.lock:
+                self.sockets += [client, upstream]
+            threading.Thread(target=self.relay, args=(client, upstream, False), daemon=True).start()
+            threading.Thread(target=self.relay, args=(upstream, client, True), daemon=True).start()
+
+    def relay(self, source: socket.socket, sink: socket.socket, record: bool):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if record:
+                    with self.lock:
+                        self.from_master += data
+                sink.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, sink):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def disconnect(self):
+        """Drop the link and refuse the replica's reconnections until `resume`"""
+        self.refusing = True
+        with self.lock:
+            for sock in self.sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.sockets.clear()
+            self.from_master.clear()
+
+    def resume(self):
+        self.refusing = False
+
+    def close(self):
+        self.disconnect()
+        self.listener.close()
+
+
+def test_full_sync_and_propagation(tmp_path):
+    print("\n[tester] Testing: Replica Loads the Master's Snapshot, Then Follows Its Writes")
+    (tmp_path / "master").mkdir()
+    (tmp_path / "replica").mkdir()
+    master_proc = start_server(MASTER_PORT, "--dir", str(tmp_path / "master"))
+    replica_proc = None
+    try:
+        assert master(["SET", "rkey", "1"]) == RESPSerializer.serialize_simple_string("OK")
+        assert master(["RPUSH", "rlist", "a", "b"]) == RESPSerializer.serialize_integer(2)
+        assert master(["SET", "rttl", "v", "EX", "1000"]) == RESPSerializer.serialize_simple_string("OK")
+        # nobody replicates yet
+        assert master(["WAIT", "0", "0"]) == RESPSerializer.serialize_integer(0)
+
+        replica_proc = start_server(
+            REPLICA_PORT, "--dir", str(tmp_path / "replica"), "--replicaof", "localhost", str(MASTER_PORT)
+        )
+        wait_connected()
+        assert replica(["GET", "rkey"]) == RESPSerializer.serialize_bulk_string("1")
+        assert replica(["LRANGE", "rlist", "0", "-1"]) == RESPSerializer.serialize_array(["a", "b"])
+        assert 990 < int(replica(["TTL", "rttl"])[1:-2]) <= 1000
+
+        assert master(["INCRBY", "rkey", "41"]) == RESPSerializer.serialize_integer(42)
+        assert master(["XADD", "rstream", "*", "f", "v"]).startswith(b"$")
+        assert master(["SADD", "rset", "1", "2", "3"]) == RESPSerializer.serialize_integer(3)
+        assert master(["SPOP", "rset"]).startswith(b"$")
+        assert master(["SET", "rshort", "v", "PX", "100"]) == RESPSerializer.serialize_simple_string("OK")
+        with socket.create_connection(("localhost", MASTER_PORT)) as sock:
+            for cmd in (["MULTI"], ["SET", "rtx", "a"], ["APPEND", "rtx", "b"], ["EXEC"]):
+                sock.sendall(RESPSerializer.serialize_array(cmd))
+                sock.recv(1024)
+        assert master(["WAIT", "1", "2000"]) == RESPSerializer.serialize_integer(1)
+
+        assert replica(["GET", "rkey"]) == RESPSerializer.serialize_bulk_string("42")
+        assert replica(["XRANGE", "rstream", "-", "+"]) == master(["XRANGE", "rstream", "-", "+"])
+        assert replica(["SMEMBERS", "rset"]) == master(["SMEMBERS", "rset"])
+        assert replica(["GET", "rtx"]) == RESPSerializer.serialize_bulk_string("ab")
+        assert replica(["SET", "rkey", "0"]) == RESPSerializer.serialize_error(
+            "READONLY You can't write against a read only replica."
+        )
+        assert replica(["WAIT", "0", "0"]).startswith(b"-ERR")
+
+        # the replica doesn't expire keys itself but hides them until the master's DEL
+        time.sleep(0.2)
+        assert replica(["GET", "rshort"]) == RESPSerializer.serialize_bulk_string(None)
+        master(["GET", "rshort"])
+        assert master(["WAIT", "1", "2000"]) == RESPSerializer.serialize_integer(1)
+        assert replica(["DBSIZE"]) == master(["DBSIZE"])
+
+        role = master(["ROLE"])
+        assert role.startswith(b"*3\r\n$6\r\nmaster\r\n") and b"%d" % REPLICA_PORT in role
+    finally:
+        if replica_proc is not None:
+            stop_server(replica_proc)
+        stop_server(master_proc)
+
+
+def test_partial_resync(tmp_path):
+    print("\n[tester] Testing: Short Disconnects Resume From the Backlog")
+    (tmp_path / "master").mkdir()
+    (tmp_path / "replica").mkdir()
+    master_proc = start_server(MASTER_PORT, "--dir", str(tmp_path / "master"), "--repl-backlog-size", "1024")
+    proxy = Proxy()
+    replica_proc = start_server(REPLICA_PORT, "--dir", str(tmp_path / "replica"), "--replicaof", f"localhost {PROXY_PORT}")
+    try:
+        wait_connected()
+        assert master(["SET", "pkey", "0"]) == RESPSerializer.serialize_simple_string("OK")
+        assert master(["WAIT", "1", "2000"]) == RESPSerializer.serialize_integer(1)
+
+        # writes made while the link is down fit in the backlog
+        proxy.disconnect()
+        for i in range(1, 11):
+            assert master(["SET", "pkey", str(i)]) == RESPSerializer.serialize_simple_string("OK")
+        proxy.resume()
+        assert master(["WAIT", "1", "5000"]) == RESPSerializer.serialize_integer(1)
+        assert replica(["GET", "pkey"]) == RESPSerializer.serialize_bulk_string("10")
+        assert b"+CONTINUE" in proxy.from_master and b"+FULLRESYNC" not in proxy.from_master
+
+        # too many to fit: the replica starts over from a snapshot
+        proxy.disconnect()
+        assert master(["SET", "pbig", "x" * 2048]) == RESPSerializer.serialize_simple_string("OK")
+        proxy.resume()
+        assert master(["WAIT", "1", "5000"]) == RESPSerializer.serialize_integer(1)
+        assert replica(["STRLEN", "pbig"]) == RESPSerializer.serialize_integer(2048)
+        assert b"+FULLRESYNC" in proxy.from_master
+    finally:
+        proxy.close()
+        stop_server(replica_proc)
+        stop_server(master_proc)
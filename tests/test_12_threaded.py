@@ -0,0 +1,91 @@
+import socket
+import threading
+import pytest
+from tests.helpers import send_command, start_server, stop_server
+from app.parser import RESPParser, RESPSerializer
+
+PORT = 6397
+
+
+@pytest.fixture(scope="module")
+def threaded():
+    # frequent thread switches, so commands that weren't serialized would interleave
+    proc = start_server(PORT, "--threaded", switch_interval=1e-6)
+    yield
+    stop_server(proc)
+
+
+def call(sock: socket.socket, buffer: bytearray, *args) -> bytes:
+    sock.sendall(RESPSerializer.serialize_array(list(args)))
+    while (end := RESPParser.reply_end(buffer)) is None:
+        buffer += sock.recv(65536)
+    reply = bytes(buffer[:end])
+    del buffer[:end]
+    return reply
+
+
+def test_concurrent_producers_and_consumers(threaded):
+    print("\n[tester] Testing: Threaded Clients Neither Lose Nor Duplicate Items")
+    producers, consumers, items = 4, 4, 250
+    done = threading.Event()
+    popped = [[] for _ in range(consumers)]
+
+    def produce(p: int):
+        with socket.create_connection(("localhost", PORT)) as sock:
+            buffer = bytearray()
+            for i in range(items):
+                call(sock, buffer, "RPUSH", "tqueue", f"{p}:{i}")
+                call(sock, buffer, "INCR", "tcounter")
+
+    def consume(c: int):
+        with socket.create_connection(("localhost", PORT)) as sock:
+            buffer = bytearray()
+            while True:
+                reply = call(sock, buffer, "LPOP", "tqueue", "5")
+                if reply == b"*-1\r\n":
+                    reply = call(sock, buffer, "BLPOP", "tqueue", "0.05")
+                    if reply == b"*-1\r\n":
+                        if done.is_set() and call(sock, buffer, "LLEN", "tqueue") == b":0\r\n":
+                            return
+                        continue
+                    popped[c].append(RESPParser.parse_command(reply)[0][1])
+                else:
+                    popped[c].extend(RESPParser.parse_command(reply)[0])
+
+    threads = [threading.Thread(target=produce, args=(p,)) for p in range(producers)]
+    threads += [threading.Thread(target=consume, args=(c,)) for c in range(consumers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads[:producers]:
+        thread.join()
+    done.set()
+    for thread in threads[producers:]:
+        thread.join()
+
+    items_popped = sorted(item for values in popped for item in values)
+    assert items_popped == sorted(f"{p}:{i}".encode() for p in range(producers) for i in range(items))
+    assert send_command(["GET", "tcounter"], port=PORT) == RESPSerializer.serialize_bulk_string(
+        str(producers * items)
+    )
+
+
+def test_concurrent_xadd_ids(threaded):
+    print("\n[tester] Testing: Threaded XADD * Generates Unique Increasing IDs")
+    ids = [[] for _ in range(4)]
+
+    def add(n: int):
+        with socket.create_connection(("localhost", PORT)) as sock:
+            buffer = bytearray()
+            for _ in range(200):
+                ids[n].append(call(sock, buffer, "XADD", "tstream", "*", "f", "v"))
+
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    parsed = [[tuple(map(int, reply.split(b"\r\n")[1].split(b"-"))) for reply in replies] for replies in ids]
+    assert all(replies == sorted(replies) for replies in parsed)
+    assert len({id for replies in parsed for id in replies}) == 800
+    assert send_command(["XLEN", "tstream"], port=PORT) == RESPSerializer.serialize_integer(800)
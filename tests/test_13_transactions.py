@@ -0,0 +1,147 @@
+import socket
+import threading
+import time
+from tests.helpers import send_command
+from app.parser import RESPParser, RESPSerializer
+
+OK = RESPSerializer.serialize_simple_string("OK")
+QUEUED = RESPSerializer.serialize_simple_string("QUEUED")
+
+
+class Client:
+    """A connection kept open across calls, transactions and watches belong to it"""
+
+    def __init__(self):
+        self.sock = socket.create_connection(("localhost", 6379))
+        self.buffer = bytearray()
+
+    def __call__(self, *args) -> bytes:
+        self.sock.sendall(RESPSerializer.serialize_array(list(args)))
+        while (end := RESPParser.reply_end(self.buffer)) is None:
+            self.buffer += self.sock.recv(65536)
+        reply = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        return reply
+
+    def close(self):
+        self.sock.close()
+
+
+def test_multi_exec(server):
+    print("\n[tester] Testing: MULTI Queues Commands and EXEC Runs Them")
+    client = Client()
+    try:
+        assert client("MULTI") == OK
+        assert client("SET", "tx:a", "1") == QUEUED
+        assert client("INCR", "tx:a") == QUEUED
+        assert client("LPUSH", "tx:a", "x") == QUEUED
+        # blocking commands don't block inside a transaction
+        assert client("BLPOP", "tx:empty", "5") == QUEUED
+        assert send_command(["GET", "tx:a"]) == RESPSerializer.serialize_bulk_string(None)
+        assert client("EXEC") == b"".join([
+            b"*4\r\n",
+            OK,
+            RESPSerializer.serialize_integer(2),
+            RESPSerializer.serialize_error("WRONGTYPE Operation against a key holding the wrong kind of value"),
+            RESPSerializer.serialize_null_array(),
+        ])
+        assert client("GET", "tx:a") == RESPSerializer.serialize_bulk_string("2")
+
+        assert client("MULTI") == OK
+        assert client("SET", "tx:a", "3") == QUEUED
+        assert client("DISCARD") == OK
+        assert client("GET", "tx:a") == RESPSerializer.serialize_bulk_string("2")
+
+        assert client("EXEC") == RESPSerializer.serialize_error("ERR EXEC without MULTI")
+        assert client("DISCARD") == RESPSerializer.serialize_error("ERR DISCARD without MULTI")
+        assert client("MULTI") == OK
+        assert client("MULTI") == RESPSerializer.serialize_error("ERR MULTI calls can not be nested")
+        assert client("WATCH", "tx:a") == RESPSerializer.serialize_error("ERR WATCH inside MULTI is not allowed")
+        assert client("EXEC") == b"*0\r\n"
+    finally:
+        client.close()
+
+
+def test_exec_abort(server):
+    print("\n[tester] Testing: Commands Rejected While Queuing Abort EXEC")
+    client = Client()
+    try:
+        assert client("MULTI") == OK
+        assert client("SET", "tx:b", "1") == QUEUED
+        assert client("NOSUCHCOMMAND") == RESPSerializer.serialize_error("ERR unknown command - NOSUCHCOMMAND")
+        assert client("SET", "tx:b") == RESPSerializer.serialize_error("ERR wrong number of arguments for 'set' command")
+        assert client("EXEC") == RESPSerializer.serialize_error(
+            "EXECABORT Transaction discarded because of previous errors."
+        )
+        assert client("GET", "tx:b") == RESPSerializer.serialize_bulk_string(None)
+    finally:
+        client.close()
+
+
+def test_watch(server):
+    print("\n[tester] Testing: WATCH Aborts EXEC When a Watched Key Changed")
+    client, other = Client(), Client()
+    try:
+        assert client("SET", "tx:w", "1") == OK
+        assert client("WATCH", "tx:w") == OK
+        assert other("INCR", "tx:w") == RESPSerializer.serialize_integer(2)
+        assert client("MULTI") == OK
+        assert client("SET", "tx:w", "10") == QUEUED
+        assert client("EXEC") == RESPSerializer.serialize_null_array()
+        assert client("GET", "tx:w") == RESPSerializer.serialize_bulk_string("2")
+
+        # EXEC unwatched everything, writes to other keys don't matter
+        assert client("WATCH", "tx:w", "tx:other") == OK
+        assert other("SET", "tx:unrelated", "x") == OK
+        assert client("MULTI") == OK
+        assert client("SET", "tx:w", "10") == QUEUED
+        assert client("EXEC") == b"*1\r\n" + OK
+        assert client("GET", "tx:w") == RESPSerializer.serialize_bulk_string("10")
+
+        assert client("WATCH", "tx:w") == OK
+        assert client("UNWATCH") == OK
+        assert other("DEL", "tx:w") == RESPSerializer.serialize_integer(1)
+        assert client("MULTI") == OK
+        assert client("SET", "tx:w", "11") == QUEUED
+        assert client("EXEC") == b"*1\r\n" + OK
+    finally:
+        client.close()
+        other.close()
+
+
+def test_watch_served_blocked_client(server):
+    print("\n[tester] Testing: WATCH Sees Writes Made by Serving a Blocked Client")
+    client, blocked, pusher = Client(), Client(), Client()
+    try:
+        reply = []
+        thread = threading.Thread(
+            target=lambda: reply.append(blocked("BLMOVE", "tx:src", "tx:dst", "LEFT", "RIGHT", "5"))
+        )
+        thread.start()
+        assert client("WATCH", "tx:dst") == OK
+        time.sleep(0.2)
+        # the push into tx:src wakes BLMOVE, which writes the watched tx:dst
+        assert pusher("RPUSH", "tx:src", "v") == RESPSerializer.serialize_integer(0)
+        thread.join()
+        assert reply == [RESPSerializer.serialize_bulk_string("v")]
+        assert client("MULTI") == OK
+        assert client("LPOP", "tx:dst") == QUEUED
+        assert client("EXEC") == RESPSerializer.serialize_null_array()
+    finally:
+        client.close()
+        blocked.close()
+        pusher.close()
+
+
+def test_watch_expired_key(server):
+    print("\n[tester] Testing: A Watched Key Expiring Aborts EXEC")
+    client = Client()
+    try:
+        assert client("SET", "tx:e", "v", "PX", "50") == OK
+        assert client("WATCH", "tx:e") == OK
+        time.sleep(0.1)
+        assert client("MULTI") == OK
+        assert client("SET", "tx:e", "w") == QUEUED
+        assert client("EXEC") == RESPSerializer.serialize_null_array()
+    finally:
+        client.close()